@@ -1,9 +1,12 @@
 from flask import Flask, jsonify
 from .extensions import db, cors, migrate, jwt, mail, init_extensions
-from .models import User, OAuthCredentials, MediaItem, RankingSession, MediaRanking
+from .models import User, OAuthCredentials, MediaItem, RankingSession, MediaRanking, UserTopPicks
 from .services import GoogleService, LLMBasedRankingService
 from .api import auth_bp, routes_bp
 from .config import Config
+from .cli import register_commands
+from .json_provider import init_json_provider
+from .compression import init_compression
 from typing import Type
 import logging
 
@@ -25,6 +28,8 @@ def create_app(config_class: Type[Config] = Config, test_config: dict = None) ->
 
     # Initialize extensions
     init_extensions(app)
+    init_json_provider(app)
+    init_compression(app)
     
     # Configure JWT
     app.config['JWT_SECRET_KEY'] = Config.SECRET_KEY
@@ -66,6 +71,7 @@ def create_app(config_class: Type[Config] = Config, test_config: dict = None) ->
     with app.app_context():
         from flask_migrate import Migrate
         migrate = Migrate(app, db)
+    register_commands(app)
     logger.info("Flask app created and configured.")
     return app
 
@@ -74,7 +80,7 @@ __all__ = [
     'db', 'cors', 'migrate', 'jwt', 'mail',
     
     # Models
-    'User', 'OAuthCredentials', 'MediaItem', 'RankingSession', 'MediaRanking',
+    'User', 'OAuthCredentials', 'MediaItem', 'RankingSession', 'MediaRanking', 'UserTopPicks',
     
     # Services
     'GoogleService', 'LLMBasedRankingService',
@@ -0,0 +1,52 @@
+import hashlib
+import logging
+from functools import wraps
+from typing import Any, Callable
+
+from flask import request, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+
+from app.api.negotiation import negotiated_mimetype
+from app.extensions import db
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def user_data_etag(user_id: int) -> str:
+    """
+    Build the weak ETag for the current request from the user's change counter.
+    The request path, query string and negotiated format (JSON or MessagePack) are folded in,
+    so every page, filter and representation gets its own tag.
+
+    Args:
+        user_id (int): The current user's ID.
+    Returns:
+        str: The ETag value (without the W/ prefix and quotes).
+    """
+    version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar_one_or_none()
+    digest = hashlib.sha1(f"{request.full_path} {negotiated_mimetype()}".encode('utf-8')).hexdigest()[:12]
+    return f"v{version or 0}-{digest}"
+
+
+def conditional_on_user_data(view: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator for JWT-protected GET endpoints whose response depends only on the user's
+    media and ranking data. Answers a matching If-None-Match with 304 after a single
+    primary-key lookup, before the view loads or serializes any rows.
+    Must be applied below @jwt_required().
+    """
+    @wraps(view)
+    def decorated(*args: Any, **kwargs: Any) -> Any:
+        etag = user_data_etag(get_jwt_identity())
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated
@@ -0,0 +1,88 @@
+import logging
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from flask import Response, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from app.config import Config
+from app.services.idempotency_service import (
+    IdempotencyService, IdempotencyKeyReusedError, IdempotencyKeyInProgressError
+)
+
+logger = logging.getLogger(__name__)
+
+idempotency_service = IdempotencyService(
+    ttl_seconds=Config.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=Config.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=Config.IDEMPOTENCY_WAIT_SECONDS,
+)
+
+
+# Seconds a client is asked to wait before retrying a long-running request still in progress
+LONG_RUNNING_RETRY_AFTER = 5
+
+
+def idempotent(
+    skip: Optional[Callable[[], bool]] = None,
+    long_running: bool = False,
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator for JWT-protected write endpoints that honours an Idempotency-Key header:
+    the first request with a key runs (its claim renewed until it finishes) and its response
+    is stored; repeats of the same request get the stored response (with Idempotent-Replayed:
+    true), and repeats that arrive while it is still running wait for it instead of running
+    again. A key reused for a different request is rejected with 422. Error responses (5xx)
+    and exceptions release the key so the client can retry. Requests without the header are
+    unaffected. Must be applied below @jwt_required().
+
+    Args:
+        skip (callable, optional): Returns True for requests that ignore the key, e.g.
+            streamed requests whose body should not be buffered to fingerprint it.
+        long_running (bool): For endpoints that can run for minutes: repeats arriving while the
+            request runs get 202 with Retry-After at once, instead of waiting and then 409.
+    """
+    def decorator(view: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(view)
+        def decorated(*args: Any, **kwargs: Any) -> Any:
+            key = request.headers.get('Idempotency-Key')
+            if not key or (skip is not None and skip()):
+                return view(*args, **kwargs)
+            if len(key) > IdempotencyService.MAX_KEY_LENGTH:
+                return jsonify({'error': f'Idempotency-Key must be at most {IdempotencyService.MAX_KEY_LENGTH} characters'}), 400
+
+            user_id = get_jwt_identity()
+            fingerprint = IdempotencyService.fingerprint(request.method, request.full_path, request.get_data(cache=True))
+            try:
+                token, stored = idempotency_service.begin(user_id, key, fingerprint, wait=not long_running)
+            except IdempotencyKeyReusedError as e:
+                return jsonify({'error': str(e)}), 422
+            except IdempotencyKeyInProgressError as e:
+                if long_running:
+                    response = make_response(jsonify({'status': 'in_progress', 'message': str(e)}), 202)
+                    response.headers['Retry-After'] = str(LONG_RUNNING_RETRY_AFTER)
+                else:
+                    response = make_response(jsonify({'error': str(e)}), 409)
+                    response.headers['Retry-After'] = '1'
+                return response
+            if stored is not None:
+                response = Response(stored.response_body, status=stored.response_status,
+                                    mimetype=stored.response_mimetype)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                with idempotency_service.lease(user_id, key, token):
+                    response = make_response(view(*args, **kwargs))
+            except Exception:
+                idempotency_service.release(user_id, key, token)
+                raise
+            if response.is_streamed or response.status_code >= 500:
+                # Streamed bodies are not buffered to be stored; let a retry run again
+                idempotency_service.release(user_id, key, token)
+            else:
+                idempotency_service.complete(user_id, key, token, response.status_code, response.mimetype,
+                                             response.get_data())
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,62 @@
+import logging
+from typing import Any
+
+from flask import Response, current_app, jsonify, request
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Offered in order of preference when the client accepts several equally
+_OFFERS = (JSON_MIMETYPE, MSGPACK_MIMETYPE, 'application/x-msgpack')
+
+
+def negotiated_mimetype() -> str:
+    """
+    Pick the response format for the current request from its Accept header.
+    JSON is used unless the client prefers MessagePack and msgpack is installed.
+
+    Returns:
+        str: JSON_MIMETYPE or MSGPACK_MIMETYPE.
+    """
+    best = request.accept_mimetypes.best_match(_OFFERS, default=JSON_MIMETYPE)
+    if best != JSON_MIMETYPE and msgpack is not None:
+        return MSGPACK_MIMETYPE
+    return JSON_MIMETYPE
+
+
+def packb(obj: Any) -> bytes:
+    """
+    Encode obj as MessagePack. Types MessagePack does not handle natively (datetimes, Decimal, ...)
+    go through the app's JSON default hook, so both formats carry the same values.
+
+    Args:
+        obj: The object to encode.
+    Returns:
+        bytes: The MessagePack document.
+    """
+    return msgpack.packb(obj, default=current_app.json.default, use_bin_type=True)
+
+
+def negotiated_response(obj: Any) -> Response:
+    """
+    Build a 200 response for a list endpoint in the format negotiated via Accept: MessagePack
+    keeps repeated keys and numbers compact, otherwise the body is JSON as from jsonify.
+    Compression (see app.compression) is applied afterwards to either format.
+
+    Args:
+        obj: The response payload.
+    Returns:
+        Response: The encoded response, with Vary: Accept.
+    """
+    if negotiated_mimetype() == MSGPACK_MIMETYPE:
+        response = current_app.response_class(packb(obj), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(obj)
+    response.vary.add('Accept')
+    return response
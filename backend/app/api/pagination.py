@@ -0,0 +1,208 @@
+import json
+import base64
+import binascii
+import logging
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from dateutil.parser import isoparse
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+
+def _cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key of the last row on a page as an opaque, URL-safe cursor.
+
+    Args:
+        values (sequence): The keyset values, e.g. (creation_time, id).
+    Returns:
+        str: The cursor.
+    """
+    raw = json.dumps([_cursor_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The cursor from the query string.
+        size (int): Expected number of keyset values.
+    Returns:
+        list: The raw keyset values (datetimes remain ISO strings, see parse_cursor_time).
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_cursor_time(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a timestamp keyset value from a decoded cursor.
+
+    Args:
+        value (str, optional): ISO-8601 timestamp or None.
+    Returns:
+        datetime or None: The timestamp.
+    Raises:
+        ValueError: If the value is not a timestamp.
+    """
+    if value is None:
+        return None
+    try:
+        return isoparse(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_time(name: str) -> Optional[datetime]:
+    """
+    Read an ISO-8601 timestamp query parameter.
+
+    Args:
+        name (str): The parameter name.
+    Returns:
+        datetime or None: The timestamp (naive values are taken as UTC), or None when absent.
+    Raises:
+        ValueError: If the value is not a timestamp.
+    """
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        value = isoparse(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO-8601 timestamp')
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def parse_limit(default: int, maximum: int) -> int:
+    """
+    Read the 'limit' query parameter.
+
+    Args:
+        default (int): Page size when 'limit' is absent.
+        maximum (int): Largest page size allowed.
+    Returns:
+        int: The page size.
+    Raises:
+        ValueError: If 'limit' is not a positive integer.
+    """
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_fields(allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Read the 'fields' query parameter (comma-separated sparse fieldset).
+
+    Args:
+        allowed (iterable): Field names the client may request.
+    Returns:
+        list or None: Requested fields in request order, or None for all fields.
+    Raises:
+        ValueError: If an unknown field is requested.
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_list(name: str, maximum: int, convert: Callable[[str], Any] = str) -> List[Any]:
+    """
+    Read a comma-separated list query parameter, dropping duplicates but keeping order.
+
+    Args:
+        name (str): The parameter name.
+        maximum (int): Largest number of values allowed.
+        convert (callable): Applied to each value, e.g. int.
+    Returns:
+        list: The converted values, empty when the parameter is absent.
+    Raises:
+        ValueError: If a value cannot be converted or there are too many values.
+    """
+    raw = request.args.get(name)
+    if not raw:
+        return []
+    try:
+        values = list(dict.fromkeys(convert(value.strip()) for value in raw.split(',') if value.strip()))
+    except ValueError:
+        raise ValueError(f'{name} contains an invalid value')
+    if len(values) > maximum:
+        raise ValueError(f'{name} accepts at most {maximum} values')
+    return values
+
+
+def parse_embed(allowed: Iterable[str]) -> List[str]:
+    """
+    Read the 'embed' query parameter (comma-separated related resources to include).
+
+    Args:
+        allowed (iterable): Names the client may embed.
+    Returns:
+        list: Requested names, empty when nothing is embedded.
+    Raises:
+        ValueError: If an unknown name is requested.
+    """
+    raw = request.args.get('embed')
+    if not raw:
+        return []
+    embed = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in embed if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown embed: {', '.join(unknown)}")
+    return embed
+
+
+def parse_bool(name: str, default: Optional[bool] = None) -> Optional[bool]:
+    """
+    Read a boolean query parameter.
+
+    Args:
+        name (str): The parameter name.
+        default (bool, optional): Value when the parameter is absent.
+    Returns:
+        bool or None: The parsed value.
+    Raises:
+        ValueError: If the value is not a recognised boolean.
+    """
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return default
+    if raw.lower() in ('1', 'true', 'yes'):
+        return True
+    if raw.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'{name} must be true or false')
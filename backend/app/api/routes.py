@@ -1,53 +1,441 @@
-from flask import Blueprint, jsonify, request, redirect, url_for
+from flask import Blueprint, Response, jsonify, request, redirect, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
-from sqlalchemy import desc
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import desc, or_, select, tuple_
 import json
 from googleapiclient.discovery import build
-from typing import Any
+from itertools import chain
+from typing import Any, List
 import logging
 
 from app.extensions import db
 from app.models import User, OAuthCredentials, MediaItem, RankingSession, MediaRanking
+from app.models.serializers import compile_row_serializer, select_columns, serialize_rows
 from app.services.google_service import GoogleService
 from app.services.llm_ranking_service import LLMBasedRankingService
+from app.services.ranking_estimator import RankingEstimator
+from app.services.media_ingest_service import MediaIngestService
+from app.services.json_stream import iter_json_array, iter_ndjson
+from app.services.top_picks_service import TopPicksService
+from app.services.ranking_session_service import RankingSessionService, UnknownMediaItemsError
+from app.services.change_feed_service import ChangeFeedService
+from app.services.media_search_service import MediaSearchService
+from app.services.timeline_service import TimelineService
+from app.services.media_bulk_service import MediaBulkService
+from app.services.export_service import ExportService
+from app.services.library_stats_service import LibraryStatsService
+from app.services.score_sketch_service import ScoreSketchService, percentiles
+from app.services.resilience import breaker_states
 from app.config import Config
+from app.api.etags import conditional_on_user_data
+from app.api.idempotency import idempotent
+from app.api.negotiation import negotiated_response
+from app.api.pagination import (
+    decode_cursor, encode_cursor, parse_bool, parse_cursor_time, parse_embed, parse_fields, parse_limit, parse_list,
+    parse_time,
+)
 
 # Initialize services
 ranking_service = LLMBasedRankingService()
+media_ingest_service = MediaIngestService(chunk_size=Config.MEDIA_UPSERT_CHUNK_SIZE)
+top_picks_service = TopPicksService(limit=Config.TOP_PICKS_LIMIT)
+change_feed_service = ChangeFeedService(settle_seconds=Config.SYNC_SETTLE_SECONDS)
+media_search_service = MediaSearchService()
+timeline_service = TimelineService()
+media_bulk_service = MediaBulkService(max_ids=Config.MEDIA_BULK_MAX_IDS)
+export_service = ExportService(chunk_size=Config.EXPORT_CHUNK_SIZE)
+library_stats_service = LibraryStatsService()
+score_sketch_service = ScoreSketchService()
+ranking_session_service = RankingSessionService(
+    ranking_service,
+    max_items=Config.RANKING_MAX_SESSION_ITEMS,
+    concurrency=Config.RANKING_CONCURRENCY,
+    rate_limit=Config.RANKING_RATE_LIMIT,
+    top_picks_limit=Config.TOP_PICKS_LIMIT,
+)
 
 routes_bp = Blueprint('routes', __name__)
 
+# Ranking columns returned by GET /api/media/items?embed=latest_ranking
+EMBED_RANKING_FIELDS = (
+    'id', 'ranking_session_id', 'technical_score', 'aesthetic_score', 'combined_score',
+    'analysis_type', 'analyzed_at',
+)
+# Largest number of tags a ranking list can be filtered on
+MAX_TAG_FILTERS = 20
+# Media item columns embedded in a session's ranking list with ?embed=media_item
+EMBED_MEDIA_FIELDS = (
+    'id', 'google_media_id', 'base_url', 'thumbnail_url', 'filename', 'mime_type', 'creation_time',
+    'width', 'height',
+)
+
 logger = logging.getLogger(__name__)
 
+def _requested_media_item_ids(data: Any) -> List[int]:
+    """
+    Extract media item IDs from a request body.
+    Accepts either 'media_item_ids' (list of IDs) or 'media_items' (list of objects with 'id').
+    Args:
+        data: The parsed JSON body.
+    Returns:
+        list: The requested media item IDs, in request order.
+    Raises:
+        ValueError: If an ID is missing or not an integer.
+    """
+    if not isinstance(data, dict):
+        return []
+    if data.get('media_item_ids') is not None:
+        raw_ids = data['media_item_ids']
+    else:
+        raw_ids = [item.get('id') if isinstance(item, dict) else item for item in data.get('media_items') or []]
+    try:
+        return [int(item_id) for item_id in raw_ids]
+    except (TypeError, ValueError):
+        raise ValueError('media item IDs must be integers')
+
+def _parse_decimal(raw: Any, message: str) -> Any:
+    """
+    Parse an optional decimal query or cursor value.
+    Args:
+        raw: The raw value (None or empty for absent).
+        message (str): Error message if the value is not a finite number.
+    Returns:
+        Decimal or None: The value.
+    Raises:
+        ValueError: If the value is not a finite number.
+    """
+    if raw is None or raw == '':
+        return None
+    try:
+        value = Decimal(str(raw))
+    except InvalidOperation:
+        raise ValueError(message)
+    if not value.is_finite():
+        raise ValueError(message)
+    return value
+
+def _select_media_items(output_fields: List[str], embed: List[str]) -> Any:
+    """
+    Build a core select of media item columns, optionally joined to each item's latest ranking.
+    Args:
+        output_fields (list): Media item columns, selected first and in this order.
+        embed (list): Embedded resources; 'latest_ranking' appends EMBED_RANKING_FIELDS.
+    Returns:
+        Select: The query, without filters.
+    """
+    query = select(*select_columns(MediaItem, output_fields))
+    if 'latest_ranking' in embed:
+        query = query.add_columns(*select_columns(MediaRanking, EMBED_RANKING_FIELDS)).outerjoin(
+            MediaRanking, MediaRanking.id == MediaItem.latest_ranking_id
+        )
+    return query
+
+def _serialize_media_rows(
+    rows: List[Any], output_fields: List[str], embed: List[str], ranking_offset: int, user_id: int
+) -> List[Any]:
+    """
+    Serialize rows selected with _select_media_items.
+    Args:
+        rows (list): The result rows.
+        output_fields (list): Media item keys to return (the first columns of each row).
+        embed (list): Embedded resources requested.
+        ranking_offset (int): Position of the first embedded ranking column.
+        user_id (int): The owning user, whose score sketches give each embedded ranking's 'percentiles'.
+    Returns:
+        list: One dict per row.
+    """
+    items = serialize_rows(MediaItem, output_fields, rows)
+    if 'latest_ranking' in embed and rows:
+        serialize_ranking = compile_row_serializer(MediaRanking, EMBED_RANKING_FIELDS, ranking_offset)
+        digests = score_sketch_service.digests(user_id)
+        for item, row in zip(items, rows):
+            ranking = serialize_ranking(row) if row[ranking_offset] is not None else None
+            if ranking is not None:
+                ranking['percentiles'] = percentiles(digests, ranking)
+            item['latest_ranking'] = ranking
+    return items
+
 # Health check endpoint
 @routes_bp.route('/api/health')
 def health_check() -> Any:
     """
-    Health check endpoint.
+    Health check endpoint. Reports 'degraded' while any outbound dependency's circuit is open.
     Returns:
-        JSON response with status.
+        JSON response with status and circuit breaker states.
     """
-    return jsonify({"status": "healthy"})
+    breakers = breaker_states()
+    degraded = any(breaker['state'] == 'open' for breaker in breakers.values())
+    return jsonify({"status": "degraded" if degraded else "healthy", "circuit_breakers": breakers})
 
 # --- Media endpoints (Picker-based) ---
 @routes_bp.route('/api/media/items', methods=['GET'])
 @jwt_required()
+@conditional_on_user_data
 def get_media_items() -> Any:
     """
-    Get all media items for the current user.
+    Get one page of the current user's media items, newest first.
+    Query params:
+        limit: Page size (default MEDIA_PAGE_SIZE, max MEDIA_MAX_PAGE_SIZE).
+        cursor: next_cursor from the previous page.
+        is_deleted: Filter on the soft-delete flag (default false).
+        ai_status: Comma-separated ai_status values to include.
+        created_from: Only items created at or after this ISO-8601 time (e.g. a timeline bucket's start).
+        created_to: Only items created before this ISO-8601 time.
+        fields: Comma-separated sparse fieldset; only these columns (plus id) are loaded and returned.
+        embed: 'latest_ranking' adds each item's current score through one join on latest_ranking_id,
+            with 'percentiles' placing each score among all of the user's scores.
     Returns:
-        JSON response with all media items or error.
+        JSON response with 'items' and 'next_cursor' (null on the last page) or error.
     """
     try:
         user_id = get_jwt_identity()
-        items = MediaItem.query.filter_by(user_id=user_id).all()
+        try:
+            limit = parse_limit(Config.MEDIA_PAGE_SIZE, Config.MEDIA_MAX_PAGE_SIZE)
+            fields = parse_fields(MediaItem.API_FIELDS)
+            embed = parse_embed(('latest_ranking',))
+            is_deleted = parse_bool('is_deleted', False)
+            created_from = parse_time('created_from')
+            created_to = parse_time('created_to')
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, 2) if cursor else None
+            after_time = parse_cursor_time(after[0]) if after else None
+            after_id = int(after[1]) if after else None
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        output_fields = list(dict.fromkeys(['id'] + fields)) if fields else list(MediaItem.API_FIELDS)
+        # The keyset columns are always loaded (after the output columns) so the next cursor can be built
+        load_fields = list(dict.fromkeys(output_fields + ['creation_time']))
+        creation_time_index = load_fields.index('creation_time')
+        query = _select_media_items(load_fields, embed).where(MediaItem.user_id == user_id)
+        if is_deleted is not None:
+            query = query.where(MediaItem.is_deleted.is_(is_deleted))
+        ai_status = [status for status in request.args.get('ai_status', '').split(',') if status]
+        if ai_status:
+            query = query.where(MediaItem.ai_status.in_(ai_status))
+        if created_from is not None:
+            query = query.where(MediaItem.creation_time >= created_from)
+        if created_to is not None:
+            query = query.where(MediaItem.creation_time < created_to)
+        if after:
+            if after_time is not None:
+                query = query.where(or_(
+                    tuple_(MediaItem.creation_time, MediaItem.id) < (after_time, after_id),
+                    MediaItem.creation_time.is_(None)
+                ))
+            else:
+                query = query.where(MediaItem.creation_time.is_(None), MediaItem.id < after_id)
+        query = query.order_by(MediaItem.creation_time.desc().nulls_last(), MediaItem.id.desc()).limit(limit + 1)
+        rows = db.session.execute(query).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][creation_time_index], rows[-1][0]])
+        items = _serialize_media_rows(rows, output_fields, embed, len(load_fields), user_id)
         logger.info(f"Fetched {len(items)} media items for user_id={user_id}")
-        return jsonify([item.to_dict() for item in items])
+        return negotiated_response({'items': items, 'next_cursor': next_cursor})
     except Exception as e:
         logger.error(f"Failed to get media items: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@routes_bp.route('/api/media/items/batch', methods=['GET'])
+@jwt_required()
+@conditional_on_user_data
+def multi_get_media_items() -> Any:
+    """
+    Get several of the current user's media items with one query.
+    Query params:
+        ids: Comma-separated media item IDs, or
+        google_media_ids: Comma-separated Google media IDs (exactly one of the two, at most MEDIA_MULTI_GET_MAX_IDS).
+        fields: Comma-separated sparse fieldset (the lookup key is always included).
+        embed: 'latest_ranking' adds each item's current score.
+    Returns:
+        JSON response with 'items' in request order, where a missing item is {<key>: value, 'not_found': true},
+        and 'not_found' listing the missing keys; or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        try:
+            ids = parse_list('ids', Config.MEDIA_MULTI_GET_MAX_IDS, int)
+            google_media_ids = parse_list('google_media_ids', Config.MEDIA_MULTI_GET_MAX_IDS)
+            if bool(ids) == bool(google_media_ids):
+                raise ValueError('Pass exactly one of ids or google_media_ids')
+            fields = parse_fields(MediaItem.API_FIELDS)
+            embed = parse_embed(('latest_ranking',))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        key, requested = ('id', ids) if ids else ('google_media_id', google_media_ids)
+        output_fields = list(dict.fromkeys([key] + fields)) if fields else list(MediaItem.API_FIELDS)
+        query = _select_media_items(output_fields, embed).where(
+            MediaItem.user_id == user_id, MediaItem.is_deleted.is_(False), getattr(MediaItem, key).in_(requested)
+        )
+        rows = db.session.execute(query).all()
+        found = dict(zip((row[output_fields.index(key)] for row in rows),
+                         _serialize_media_rows(rows, output_fields, embed, len(output_fields), user_id)))
+        items = [found.get(value) or {key: value, 'not_found': True} for value in requested]
+        not_found = [value for value in requested if value not in found]
+        logger.info(f"Multi-get fetched {len(found)}/{len(requested)} media items for user_id={user_id}")
+        return negotiated_response({'items': items, 'not_found': not_found})
+    except Exception as e:
+        logger.error(f"Failed to multi-get media items: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/media/items/bulk', methods=['POST'])
+@jwt_required()
+def bulk_media_operation() -> Any:
+    """
+    Apply one operation to many of the current user's media items with a single statement.
+    Body:
+        operation: 'soft_delete', 'restore', 'hard_delete', 'add_tags' or 'remove_tags'.
+        ids: Media item IDs (at most MEDIA_BULK_MAX_IDS).
+        tags: Tags for add_tags/remove_tags.
+    Returns:
+        JSON response with 'operation', 'requested' and 'affected' (items actually changed), or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        operation = data.get('operation')
+        try:
+            ids = _requested_media_item_ids({'media_item_ids': data.get('ids') or []})
+            tags = data.get('tags') or []
+            if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+                raise ValueError('tags must be a list of strings')
+            affected = media_bulk_service.apply(user_id, operation, ids, tags)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        return jsonify({'operation': operation, 'requested': len(set(ids)), 'affected': affected})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to apply bulk media operation: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/media/export', methods=['GET'])
+@jwt_required()
+def export_media_items() -> Any:
+    """
+    Download the current user's media items with all their ranking scores, one row per
+    (item, ranking). The body is streamed with chunked transfer encoding while rows are read
+    from a server-side cursor, so exports of any size use constant memory.
+    Query params:
+        format: 'ndjson' (default), 'csv' or 'parquet' (requires pyarrow).
+    Returns:
+        The streamed file as an attachment, or JSON error.
+    """
+    user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'ndjson')
+    try:
+        export_service.validate(export_format)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    logger.info(f"Starting {export_format} export for user_id={user_id}")
+    return Response(
+        stream_with_context(export_service.stream(export_format, user_id)),
+        mimetype=ExportService.MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="media-export.{export_format}"'},
+    )
+
+@routes_bp.route('/api/media/search', methods=['GET'])
+@jwt_required()
+@conditional_on_user_data
+def search_media_items() -> Any:
+    """
+    Search the current user's media items, best match first.
+    Query params:
+        q: Words that must all appear in the filename or description; an item whose tags
+           (or latest ranking's tags) include one of the words also matches, and scores higher.
+        tags: Comma-separated tags the item or its latest ranking must all have (q and/or tags required).
+        limit: Page size (default MEDIA_PAGE_SIZE, max MEDIA_MAX_PAGE_SIZE).
+        cursor: next_cursor from the previous page.
+        fields: Comma-separated sparse fieldset (id is always included).
+        embed: 'latest_ranking' adds each item's current score.
+    Returns:
+        JSON response with 'items' (each with a 'search_score') and 'next_cursor' (null on the last page), or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        try:
+            limit = parse_limit(Config.MEDIA_PAGE_SIZE, Config.MEDIA_MAX_PAGE_SIZE)
+            tags = parse_list('tags', MAX_TAG_FILTERS)
+            fields = parse_fields(MediaItem.API_FIELDS)
+            embed = parse_embed(('latest_ranking',))
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, 2) if cursor else None
+            position = (float(after[0]), int(after[1])) if after else None
+            results, position = media_search_service.search(user_id, request.args.get('q'), tags, limit, position)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        output_fields = list(dict.fromkeys(['id'] + fields)) if fields else list(MediaItem.API_FIELDS)
+        rows = db.session.execute(
+            _select_media_items(output_fields, embed).where(
+                MediaItem.user_id == user_id,
+                MediaItem.is_deleted.is_(False),
+                MediaItem.id.in_([item_id for item_id, _ in results]),
+            )
+        ).all() if results else []
+        found = dict(zip((row[0] for row in rows), _serialize_media_rows(rows, output_fields, embed, len(output_fields), user_id)))
+        items = []
+        for item_id, score in results:
+            # Skip items deleted between the search and the load
+            if item_id in found:
+                items.append({**found[item_id], 'search_score': score})
+        next_cursor = encode_cursor(position) if position else None
+        return negotiated_response({'items': items, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Failed to search media items: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/media/timeline', methods=['GET'])
+@jwt_required()
+@conditional_on_user_data
+def get_media_timeline() -> Any:
+    """
+    Histogram of the current user's media items by creation time, for a timeline scrubber.
+    Jump into a bucket with GET /api/media/items?created_from=<start>&created_to=<next start>.
+    Query params:
+        granularity: 'day', 'month' (default) or 'year'; buckets are in UTC.
+        from: Only count items created at or after this ISO-8601 time.
+        to: Only count items created before this ISO-8601 time.
+    Returns:
+        JSON response with 'granularity', 'buckets' (newest first, each {'start', 'count'}),
+        'total' and 'undated', or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        try:
+            granularity = request.args.get('granularity', 'month')
+            start = parse_time('from')
+            end = parse_time('to')
+            histogram = timeline_service.histogram(user_id, granularity, start, end)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'granularity': granularity, **histogram})
+    except Exception as e:
+        logger.error(f"Failed to get media timeline: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/media/stats', methods=['GET'])
+@jwt_required()
+@conditional_on_user_data
+def get_media_stats() -> Any:
+    """
+    Library statistics for the current user's dashboard, read from counters that are kept up
+    to date on every write instead of being recounted from the media tables.
+    Returns:
+        JSON response with 'items' (live, deleted, ranked, unranked, by_ai_status), 'sessions'
+        and 'rankings' (total, by_status) and 'score_histogram' (completed ranking scores in
+        unit-wide buckets, each {'min', 'max', 'count'}), or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        return jsonify(library_stats_service.summary(user_id))
+    except Exception as e:
+        logger.error(f"Failed to get media stats: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @routes_bp.route('/api/media/items/<int:item_id>', methods=['GET'])
 @jwt_required()
 def get_media_item(item_id: int) -> Any:
@@ -60,7 +448,7 @@ def get_media_item(item_id: int) -> Any:
     """
     try:
         user_id = get_jwt_identity()
-        item = MediaItem.query.filter_by(id=item_id, user_id=user_id).first()
+        item = MediaItem.query.filter_by(id=item_id, user_id=user_id, is_deleted=False).first()
         if not item:
             logger.warning(f"Media item {item_id} not found for user_id={user_id}")
             return jsonify({'error': 'Media item not found'}), 404
@@ -84,10 +472,8 @@ def create_media_item() -> Any:
         if not data or not data.get('base_url') or not data.get('google_media_id'):
             logger.warning(f"Missing base_url or google_media_id in create_media_item for user_id={user_id}")
             return jsonify({'error': 'base_url and google_media_id are required'}), 400
-        item = MediaItem(
-            user_id=user_id,
+        values = dict(
             base_url=data['base_url'],
-            google_media_id=data['google_media_id'],
             filename=data.get('filename'),
             mime_type=data.get('mime_type'),
             description=data.get('description', ''),
@@ -95,7 +481,16 @@ def create_media_item() -> Any:
             width=data.get('width'),
             height=data.get('height')
         )
-        db.session.add(item)
+        # A deleted item with the same google_media_id is restored instead of duplicated
+        item = MediaItem.query.filter_by(user_id=user_id, google_media_id=data['google_media_id'], is_deleted=True).first()
+        if item:
+            for column, value in values.items():
+                setattr(item, column, value)
+            item.is_deleted = False
+        else:
+            item = MediaItem(user_id=user_id, google_media_id=data['google_media_id'], **values)
+            db.session.add(item)
+        User.bump_data_version(user_id)
         db.session.commit()
         logger.info(f"Created media item {item.id} for user_id={user_id}")
         return jsonify(item.to_dict()), 201
@@ -116,7 +511,7 @@ def update_media_item(item_id: int) -> Any:
     """
     try:
         user_id = get_jwt_identity()
-        item = MediaItem.query.filter_by(id=item_id, user_id=user_id).first()
+        item = MediaItem.query.filter_by(id=item_id, user_id=user_id, is_deleted=False).first()
         if not item:
             logger.warning(f"Media item {item_id} not found for user_id={user_id}")
             return jsonify({'error': 'Media item not found'}), 404
@@ -131,6 +526,8 @@ def update_media_item(item_id: int) -> Any:
             item.google_media_id = data['google_media_id']
         if data.get('filename'):
             item.filename = data['filename']
+        TopPicksService.invalidate(user_id)
+        User.bump_data_version(user_id)
         db.session.commit()
         logger.info(f"Updated media item {item_id} for user_id={user_id}")
         return jsonify(item.to_dict())
@@ -143,7 +540,8 @@ def update_media_item(item_id: int) -> Any:
 @jwt_required()
 def delete_media_item(item_id: int) -> Any:
     """
-    Delete a media item for the current user.
+    Delete a media item for the current user. The row is kept with is_deleted set, so the
+    changes feed can report it as a tombstone; picking the item again restores it.
     Args:
         item_id (int): The media item ID.
     Returns:
@@ -151,11 +549,13 @@ def delete_media_item(item_id: int) -> Any:
     """
     try:
         user_id = get_jwt_identity()
-        item = MediaItem.query.filter_by(id=item_id, user_id=user_id).first()
+        item = MediaItem.query.filter_by(id=item_id, user_id=user_id, is_deleted=False).first()
         if not item:
             logger.warning(f"Media item {item_id} not found for user_id={user_id}")
             return jsonify({'error': 'Media item not found'}), 404
-        db.session.delete(item)
+        item.is_deleted = True
+        TopPicksService.invalidate(user_id)
+        User.bump_data_version(user_id)
         db.session.commit()
         logger.info(f"Deleted media item {item_id} for user_id={user_id}")
         return jsonify({'message': 'Media item deleted successfully'})
@@ -166,45 +566,112 @@ def delete_media_item(item_id: int) -> Any:
 
 @routes_bp.route('/api/photos/top-picks')
 @jwt_required()
+@conditional_on_user_data
 def get_top_picks() -> Any:
     """
-    Get top 20 photos from the latest completed ranking session for the current user.
+    Get the top photos from the latest completed ranking session for the current user.
+    Served from the user's materialized top picks (see TopPicksService). Each photo's
+    'percentile' places its combined score among all the user's scores (from the score sketch).
     Returns:
         JSON response with top photos.
     """
-    user_id = get_jwt_identity()
-    latest_session = RankingSession.query.filter(
-        RankingSession.user_id == user_id,
-        RankingSession.completed_at.isnot(None)
-    ).order_by(desc(RankingSession.completed_at)).first()
-    if not latest_session:
-        return jsonify({'photos': []})
-    top_rankings = MediaRanking.query.filter_by(
-        ranking_session_id=latest_session.id
-    ).order_by(desc(MediaRanking.combined_score)).limit(20).all()
-    results = []
-    for ranking in top_rankings:
-        media_item = db.session.get(MediaItem, ranking.media_item_id)
-        if media_item and not media_item.is_deleted:
-            results.append({
-                'google_media_id': media_item.google_media_id,
-                'base_url': media_item.base_url,
-                'combined_score': float(ranking.combined_score),
-                'tags': ranking.tags_json or [],
-                'width': media_item.width,
-                'height': media_item.height
-            })
-    return jsonify({'photos': results})
+    try:
+        user_id = get_jwt_identity()
+        digests = score_sketch_service.digests(user_id)
+        photos = [{**photo, 'percentile': percentiles(digests, photo)['combined']} for photo in top_picks_service.get(user_id)]
+        logger.info(f"Fetched {len(photos)} top picks for user_id={user_id}")
+        return negotiated_response({'photos': photos})
+    except Exception as e:
+        logger.error(f"Failed to get top picks: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/sync/changes', methods=['GET'])
+@jwt_required()
+def get_changes() -> Any:
+    """
+    Delta-sync feed: media items and rankings inserted, updated or deleted after a cursor.
+    Query params:
+        since: next_cursor from the previous call (omit for a full initial sync).
+        limit: Rows per resource (default MEDIA_PAGE_SIZE, max MEDIA_MAX_PAGE_SIZE).
+    Returns:
+        JSON response with 'media_items', 'deleted_media_item_ids' (soft- and hard-deleted items), 'rankings',
+        'next_cursor' and 'has_more' (call again immediately while true), or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        try:
+            limit = parse_limit(Config.MEDIA_PAGE_SIZE, Config.MEDIA_MAX_PAGE_SIZE)
+            since = request.args.get('since')
+            if since:
+                try:
+                    media_time, media_id, ranking_time, ranking_id, tombstone_time, tombstone_id = decode_cursor(since, 6)
+                except ValueError:
+                    # Cursors issued before hard-delete tombstones: read tombstones from the media position
+                    media_time, media_id, ranking_time, ranking_id = decode_cursor(since, 4)
+                    tombstone_time, tombstone_id = media_time, 0
+                media_position = (parse_cursor_time(media_time), int(media_id))
+                ranking_position = (parse_cursor_time(ranking_time), int(ranking_id))
+                tombstone_position = (parse_cursor_time(tombstone_time), int(tombstone_id))
+            else:
+                media_position = ranking_position = tombstone_position = (None, 0)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        result = change_feed_service.changes(user_id, media_position, ranking_position, limit, tombstone_position)
+        next_cursor = encode_cursor([
+            *result.pop('media_position'), *result.pop('ranking_position'), *result.pop('tombstone_position')
+        ])
+        return negotiated_response({**result, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Failed to get changes: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
 
 @routes_bp.route('/api/ranking/sessions', methods=['GET'])
 @jwt_required()
-def get_ranking_sessions():
-    """Get all ranking sessions for the current user"""
+@conditional_on_user_data
+def get_ranking_sessions() -> Any:
+    """
+    Get one page of the current user's ranking sessions, newest first, with ranking progress.
+    Query params:
+        limit: Page size (default MEDIA_PAGE_SIZE, max MEDIA_MAX_PAGE_SIZE).
+        cursor: next_cursor from the previous page.
+    Returns:
+        JSON response with 'sessions' (each with 'total', 'completed', 'failed' and 'best_score',
+        aggregated for the whole page in one query) and 'next_cursor' (null on the last page), or error.
+    """
     try:
         user_id = get_jwt_identity()
-        sessions = RankingSession.query.filter_by(user_id=user_id).all()
-        return jsonify([session.to_dict() for session in sessions])
+        try:
+            limit = parse_limit(Config.MEDIA_PAGE_SIZE, Config.MEDIA_MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, 2) if cursor else None
+            after_time = parse_cursor_time(after[0]) if after else None
+            after_id = int(after[1]) if after else None
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        fields = RankingSession.API_FIELDS
+        query = select(*select_columns(RankingSession, fields)).where(RankingSession.user_id == user_id)
+        if after:
+            if after_time is not None:
+                query = query.where(or_(
+                    tuple_(RankingSession.initiated_at, RankingSession.id) < (after_time, after_id),
+                    RankingSession.initiated_at.is_(None)
+                ))
+            else:
+                query = query.where(RankingSession.initiated_at.is_(None), RankingSession.id < after_id)
+        query = query.order_by(RankingSession.initiated_at.desc().nulls_last(), RankingSession.id.desc()).limit(limit + 1)
+        rows = db.session.execute(query).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][fields.index('initiated_at')], rows[-1][0]])
+        sessions = serialize_rows(RankingSession, fields, rows)
+        progress = ranking_session_service.progress([session['id'] for session in sessions])
+        for session in sessions:
+            session.update(progress[session['id']])
+        logger.info(f"Fetched {len(sessions)} ranking sessions for user_id={user_id}")
+        return negotiated_response({'sessions': sessions, 'next_cursor': next_cursor})
     except Exception as e:
+        logger.error(f"Failed to get ranking sessions: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @routes_bp.route('/api/ranking/sessions/<int:session_id>', methods=['GET'])
@@ -224,133 +691,223 @@ def get_ranking_session(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@routes_bp.route('/api/ranking/sessions', methods=['POST'])
+@routes_bp.route('/api/ranking/sessions/<int:session_id>/rankings', methods=['GET'])
 @jwt_required()
-def create_ranking_session():
-    """Create a new ranking session"""
+@conditional_on_user_data
+def get_session_rankings(session_id: int) -> Any:
+    """
+    Page through a session's scored rankings, best first.
+    Query params:
+        limit: Page size (default MEDIA_PAGE_SIZE, max MEDIA_MAX_PAGE_SIZE).
+        cursor: next_cursor from the previous page.
+        min_score: Only rankings with combined_score >= min_score.
+        tags: Comma-separated tags every returned ranking must have.
+        embed: 'media_item' adds each ranking's media item (EMBED_MEDIA_FIELDS).
+    Returns:
+        JSON response with 'rankings' and 'next_cursor' (null on the last page), or error.
+    """
     try:
         user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        if not data or not data.get('media_items'):
-            return jsonify({'error': 'Media items are required'}), 400
-        
-        session = RankingSession(
-            user_id=user_id,
-            name=data.get('name', 'New Ranking Session'),
-            description=data.get('description', '')
+        try:
+            limit = parse_limit(Config.MEDIA_PAGE_SIZE, Config.MEDIA_MAX_PAGE_SIZE)
+            embed = parse_embed(('media_item',))
+            tags = parse_list('tags', MAX_TAG_FILTERS)
+            min_score = _parse_decimal(request.args.get('min_score'), 'min_score must be a number')
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, 2) if cursor else None
+            after_score = _parse_decimal(after[0], 'Invalid cursor') if after else None
+            after_id = int(after[1]) if after else None
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if db.session.scalar(
+            select(RankingSession.id).where(RankingSession.id == session_id, RankingSession.user_id == user_id)
+        ) is None:
+            return jsonify({'error': 'Ranking session not found'}), 404
+
+        fields = MediaRanking.API_FIELDS
+        query = select(*select_columns(MediaRanking, fields)).join(
+            MediaItem, MediaItem.id == MediaRanking.media_item_id
+        ).where(
+            MediaRanking.ranking_session_id == session_id,
+            MediaRanking.combined_score.isnot(None),
+            MediaItem.is_deleted.is_(False),
         )
-        
-        db.session.add(session)
-        db.session.flush()
-        
-        # Create media rankings for each item
-        for item_data in data['media_items']:
-            ranking = MediaRanking(
-                session_id=session.id,
-                media_item_id=item_data['id'],
-                initial_rank=item_data.get('initial_rank', 0)
+        if 'media_item' in embed:
+            query = query.add_columns(*select_columns(MediaItem, EMBED_MEDIA_FIELDS))
+        if min_score is not None:
+            query = query.where(MediaRanking.combined_score >= min_score)
+        if tags:
+            query = query.where(MediaRanking.tags_json.contains(tags))
+        if after:
+            query = query.where(tuple_(MediaRanking.combined_score, MediaRanking.id) < (after_score, after_id))
+        # Descending (session, score) order is a backward scan of idx_media_rankings_session_score
+        query = query.order_by(MediaRanking.combined_score.desc(), MediaRanking.id.desc()).limit(limit + 1)
+        rows = db.session.execute(query).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][fields.index('combined_score')], rows[-1][0]])
+        rankings = serialize_rows(MediaRanking, fields, rows)
+        if 'media_item' in embed:
+            serialize_media = compile_row_serializer(MediaItem, EMBED_MEDIA_FIELDS, len(fields))
+            for ranking, row in zip(rankings, rows):
+                ranking['media_item'] = serialize_media(row)
+        logger.info(f"Fetched {len(rankings)} rankings of session {session_id} for user_id={user_id}")
+        return negotiated_response({'rankings': rankings, 'next_cursor': next_cursor})
+    except Exception as e:
+        logger.error(f"Failed to get rankings of session {session_id}: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/ranking/sessions', methods=['POST'])
+@jwt_required()
+@idempotent()
+def create_ranking_session() -> Any:
+    """
+    Create a ranking session with a pending ranking for each requested media item.
+    Body: 'media_item_ids' or 'media_items' (objects with 'id'), optional 'method' and 'analysis_type'.
+    All items must belong to the current user; sessions are capped at RANKING_MAX_SESSION_ITEMS items.
+    Returns:
+        JSON response with the created session and its item count, or error.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        try:
+            media_item_ids = _requested_media_item_ids(data)
+            session = ranking_session_service.create(
+                user_id,
+                media_item_ids,
+                method=data.get('method') or 'ai_ranking',
+                analysis_type=data.get('analysis_type') or Config.RANKING_ANALYSIS_TYPE,
             )
-            db.session.add(ranking)
-        
+        except UnknownMediaItemsError as e:
+            return jsonify({'error': 'Media items not found', 'media_item_ids': e.media_item_ids}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result = session.to_dict()
         db.session.commit()
-        
-        return jsonify(session.to_dict()), 201
+        result['item_count'] = len(set(media_item_ids))
+        return jsonify(result), 201
     except Exception as e:
         db.session.rollback()
+        logger.error(f"Failed to create ranking session: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/api/ranking/sessions/estimate', methods=['POST'])
+@jwt_required()
+def estimate_ranking_session() -> Any:
+    """
+    Estimate the LLM calls, download size, wall time and token cost of ranking a set of media items.
+    Accepts the same body as create_ranking_session.
+    Returns:
+        JSON response with the estimate, including whether the job must be split.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        try:
+            media_item_ids = _requested_media_item_ids(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not media_item_ids:
+            return jsonify({'error': 'Media items are required'}), 400
+        estimator = RankingEstimator(
+            concurrency=Config.RANKING_CONCURRENCY,
+            rate_limit=Config.RANKING_RATE_LIMIT,
+            max_items=Config.RANKING_MAX_SESSION_ITEMS,
+            window=Config.RANKING_STATS_WINDOW,
+            input_token_cost=Config.RANKING_INPUT_TOKEN_COST,
+            output_token_cost=Config.RANKING_OUTPUT_TOKEN_COST,
+        )
+        analysis_type = data.get('analysis_type') or Config.RANKING_ANALYSIS_TYPE
+        return jsonify(estimator.estimate(user_id, media_item_ids, analysis_type))
+    except Exception as e:
+        logger.error(f"Failed to estimate ranking session: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 @routes_bp.route('/api/ranking/sessions/<int:session_id>/rank', methods=['POST'])
 @jwt_required()
-def rank_media_items(session_id):
-    """Rank media items in a session using LLM"""
+@idempotent(long_running=True)
+def rank_media_items(session_id: int) -> Any:
+    """
+    Rank the pending (or previously failed) media items of a session using the LLM,
+    then mark the session completed and refresh the user's top picks.
+    Args:
+        session_id (int): The ranking session's ID.
+    Returns:
+        JSON response with the session and 'ranked', 'cached' and 'failed' counts, or error.
+    """
     try:
         user_id = get_jwt_identity()
-        session = RankingSession.query.filter_by(
-            id=session_id, user_id=user_id
-        ).first()
-        
+        session = RankingSession.query.filter_by(id=session_id, user_id=user_id).first()
         if not session:
             return jsonify({'error': 'Ranking session not found'}), 404
-        
-        # Get all media items in the session
-        rankings = MediaRanking.query.filter_by(session_id=session.id).all()
-        media_items = [ranking.media_item for ranking in rankings]
-        
-        # Get rankings from LLM service
-        ranked_items = ranking_service.rank_media_items(media_items)
-        
-        # Update rankings in database
-        for item, rank in ranked_items:
-            ranking = MediaRanking.query.filter_by(
-                session_id=session.id,
-                media_item_id=item.id
-            ).first()
-            ranking.final_rank = rank
-        
+        counts = ranking_session_service.rank(session)
+        result = session.to_dict()
         db.session.commit()
-        
-        return jsonify(session.to_dict())
+        result.update(counts)
+        return jsonify(result)
     except Exception as e:
         db.session.rollback()
+        logger.error(f"Failed to rank session {session_id}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+def _is_streaming_batch_request() -> bool:
+    return request.mimetype == 'application/x-ndjson' or request.args.get('stream', '').lower() in ('1', 'true')
+
+def _stream_batch_create_media_items(user_id: int) -> Any:
+    """
+    Streaming variant of batch_create_media_items. Parses the JSON array (or NDJSON) body
+    incrementally and commits every MEDIA_STREAM_CHUNK_SIZE items, so a bad chunk does not
+    lose the others and peak memory does not depend on the batch size.
+    Args:
+        user_id (int): The current user's ID.
+    Returns:
+        NDJSON response with one line per committed chunk and a final summary line,
+        or 400 if the body does not start like a JSON array.
+    """
+    parse = iter_ndjson if request.mimetype == 'application/x-ndjson' else iter_json_array
+    items = parse(request.stream, max_element_size=Config.MEDIA_STREAM_MAX_ITEM_SIZE)
+    try:
+        first = next(items, None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if first is not None:
+        items = chain([first], items)
+
+    def generate():
+        for result in media_ingest_service.upsert_stream(user_id, items, Config.MEDIA_STREAM_CHUNK_SIZE):
+            yield json.dumps(result) + '\n'
+        logger.info(f"Finished streaming batch import for user_id={user_id}")
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @routes_bp.route('/api/media/items/batch', methods=['POST'])
 @jwt_required()
+@idempotent(skip=_is_streaming_batch_request)
 def batch_create_media_items() -> Any:
     """
     Batch create or update media items for the current user.
-    Accepts a list of media item metadata from the frontend (Google Photos Picker).
+    Accepts a list of media item metadata from the frontend (Google Photos Picker) and stores it
+    with one INSERT ... ON CONFLICT DO UPDATE per chunk of MEDIA_UPSERT_CHUNK_SIZE items.
+    With ?stream=true or an application/x-ndjson body the items are parsed and committed
+    incrementally instead (see _stream_batch_create_media_items); streamed imports ignore
+    Idempotency-Key, as each chunk is committed on its own and upserts are safe to repeat.
     Returns:
         JSON response with the stored media items (with DB IDs) or error.
     """
     try:
         user_id = get_jwt_identity()
+        if _is_streaming_batch_request():
+            return _stream_batch_create_media_items(user_id)
         data = request.get_json()
         if not isinstance(data, list):
             return jsonify({'error': 'Request body must be a list of media items'}), 400
-        stored_items = []
-        for item in data:
-            google_media_id = item.get('google_media_id') or item.get('id')
-            base_url = item.get('base_url') or item.get('baseUrl')
-            if not google_media_id or not base_url:
-                logger.warning(f"Missing google_media_id or base_url in item: {item}")
-                continue
-            # Check if item already exists for this user
-            existing = MediaItem.query.filter_by(user_id=user_id, google_media_id=google_media_id).first()
-            if existing:
-                # Update fields if changed
-                existing.base_url = base_url
-                existing.filename = item.get('filename')
-                existing.mime_type = item.get('mime_type') or item.get('mimeType')
-                existing.description = item.get('description', '')
-                existing.creation_time = item.get('creation_time') or item.get('creationTime')
-                existing.width = item.get('width')
-                existing.height = item.get('height')
-                existing.duration = item.get('duration')
-                existing.thumbnail_url = item.get('thumbnail_url') or item.get('thumbnailUrl')
-                existing.last_synced_at = datetime.utcnow()
-                logger.info(f"Updated media item {existing.id} for user_id={user_id}")
-                db.session.add(existing)
-                stored_items.append(existing)
-            else:
-                new_item = MediaItem(
-                    user_id=user_id,
-                    google_media_id=google_media_id,
-                    base_url=base_url,
-                    filename=item.get('filename'),
-                    mime_type=item.get('mime_type') or item.get('mimeType'),
-                    description=item.get('description', ''),
-                    creation_time=item.get('creation_time') or item.get('creationTime'),
-                    width=item.get('width'),
-                    height=item.get('height'),
-                    duration=item.get('duration'),
-                    thumbnail_url=item.get('thumbnail_url') or item.get('thumbnailUrl'),
-                )
-                db.session.add(new_item)
-                stored_items.append(new_item)
+        stored_items = media_ingest_service.upsert(user_id, data)
+        # Serialize before commit so the RETURNING values are used instead of reloading each row
+        results = [item.to_dict() for item in stored_items]
         db.session.commit()
-        return jsonify([item.to_dict() for item in stored_items]), 201
+        return jsonify(results), 201
     except Exception as e:
         db.session.rollback()
         logger.error(f"Failed to batch create media items: {str(e)}", exc_info=True)
@@ -0,0 +1,145 @@
+import os
+import click
+import logging
+from typing import Optional
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('rescore')
+@click.option('--analysis-type', required=True, help='Tag written to MediaRanking.analysis_type for this run.')
+@click.option('--model', default=None, help='Cohere model to score with (defaults to the service default).')
+@click.option('--concurrency', type=int, default=None, help='Parallel LLM calls (defaults to RANKING_CONCURRENCY).')
+@click.option('--rate', type=float, default=None, help='Max LLM calls per second (defaults to RANKING_RATE_LIMIT).')
+@click.option('--batch-size', type=int, default=50, show_default=True, help='Items per keyset page and commit.')
+@click.option('--state-file', default='rescore_state.json', show_default=True, help='Checkpoint file used to resume.')
+@click.option('--limit', type=int, default=None, help='Stop after this many items.')
+@click.option('--reset', is_flag=True, help='Discard an existing checkpoint and start from the beginning.')
+@with_appcontext
+def rescore_command(
+    analysis_type: str,
+    model: Optional[str],
+    concurrency: Optional[int],
+    rate: Optional[float],
+    batch_size: int,
+    state_file: str,
+    limit: Optional[int],
+    reset: bool,
+) -> None:
+    """
+    Re-score all users' media items with the LLM ranking service.
+    """
+    from app.services.llm_ranking_service import LLMBasedRankingService
+    from app.services.rescore_service import BulkRescoreService, RescoreCheckpoint
+
+    if reset and os.path.exists(state_file):
+        os.remove(state_file)
+    try:
+        checkpoint = RescoreCheckpoint(state_file, analysis_type)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    ranking_service = LLMBasedRankingService(model_name=model) if model else LLMBasedRankingService()
+    service = BulkRescoreService(
+        ranking_service,
+        analysis_type=analysis_type,
+        concurrency=concurrency or current_app.config['RANKING_CONCURRENCY'],
+        rate_limit=rate if rate is not None else current_app.config['RANKING_RATE_LIMIT'],
+        batch_size=batch_size,
+    )
+    click.echo(f"Rescoring with analysis_type={analysis_type}, starting after media item {checkpoint.cursor}")
+    checkpoint = service.run(checkpoint, report=click.echo, limit=limit)
+    click.echo(f"Done: {checkpoint.processed} items processed, {checkpoint.failed} failed, cursor={checkpoint.cursor}")
+
+
+@click.command('backfill-latest-rankings')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Media items per batch and commit.')
+@with_appcontext
+def backfill_latest_rankings_command(batch_size: int) -> None:
+    """
+    Recompute every media item's latest_ranking_id and ai_status from stored rankings.
+    """
+    from app.services.latest_ranking_service import LatestRankingService
+
+    changed = LatestRankingService().backfill(batch_size=batch_size, report=click.echo)
+    click.echo(f"Done: {changed} media items updated")
+
+
+@click.command('export-media')
+@click.option('--format', 'export_format', type=click.Choice(['ndjson', 'csv', 'parquet']), default='ndjson',
+              show_default=True, help='Output format (parquet requires pyarrow).')
+@click.option('--user-id', type=int, default=None, help='Only export this user (default: all users).')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default='-', show_default=True,
+              help='File to write, or - for stdout.')
+@click.option('--chunk-size', type=int, default=None, help='Rows per server-side cursor fetch (defaults to EXPORT_CHUNK_SIZE).')
+@with_appcontext
+def export_media_command(export_format: str, user_id: Optional[int], output: str, chunk_size: Optional[int]) -> None:
+    """
+    Stream media items joined to all their rankings to a file.
+    """
+    from app.services.export_service import ExportService
+
+    service = ExportService(chunk_size=chunk_size or current_app.config['EXPORT_CHUNK_SIZE'])
+    try:
+        chunks = service.stream(export_format, user_id)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    if output != '-':
+        click.echo(f"Exported to {output}", err=True)
+
+
+@click.command('reconcile-stats')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only reconcile this user (repeatable; default: all users).')
+@with_appcontext
+def reconcile_stats_command(user_ids: tuple) -> None:
+    """
+    Recompute every user's library statistics counters from the source tables and correct any drift.
+    """
+    from app.services.library_stats_service import LibraryStatsService
+
+    result = LibraryStatsService().reconcile(list(user_ids) or None, report=click.echo)
+    click.echo(f"Done: {result['users']} users checked, {result['corrected']} counters corrected")
+
+
+@click.command('rebuild-score-sketches')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only rebuild this user (repeatable; default: all users).')
+@click.option('--chunk-size', type=int, default=5000, show_default=True, help='Rankings fetched per round trip.')
+@with_appcontext
+def rebuild_score_sketches_command(user_ids: tuple, chunk_size: int) -> None:
+    """
+    Recompute every user's score percentile sketches from their completed rankings.
+    """
+    from app.services.score_sketch_service import ScoreSketchService
+
+    rebuilt = ScoreSketchService().rebuild(list(user_ids) or None, chunk_size=chunk_size, report=click.echo)
+    click.echo(f"Done: {rebuilt} users rebuilt")
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command() -> None:
+    """
+    Delete Idempotency-Key records whose stored responses have expired.
+    """
+    from app.services.idempotency_service import IdempotencyService
+
+    purged = IdempotencyService().purge()
+    click.echo(f"Done: {purged} expired idempotency keys deleted")
+
+
+def register_commands(app: Flask) -> None:
+    """
+    Register custom CLI commands with the app.
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    app.cli.add_command(rescore_command)
+    app.cli.add_command(backfill_latest_rankings_command)
+    app.cli.add_command(export_media_command)
+    app.cli.add_command(reconcile_stats_command)
+    app.cli.add_command(rebuild_score_sketches_command)
+    app.cli.add_command(purge_idempotency_keys_command)
@@ -0,0 +1,83 @@
+from flask import Flask, Response, request
+from typing import Optional
+import gzip
+import logging
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Mimetypes worth compressing, besides text/*
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/msgpack', 'application/x-ndjson'}
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """
+    Compress a response body.
+    Args:
+        data (bytes): The body.
+        encoding (str): 'br' or 'gzip'.
+        gzip_level (int): gzip compression level (1-9).
+        brotli_quality (int): Brotli quality (0-11); mid values suit per-request compression.
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def negotiate_encoding() -> Optional[str]:
+    """
+    Pick a Content-Encoding for the current request from its Accept-Encoding header.
+    Brotli is preferred over gzip at equal quality, when the brotli package is installed.
+    Returns:
+        str or None: 'br', 'gzip', or None to send the body uncompressed.
+    """
+    offers = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_quality = None, 0.0
+    for offer in offers:
+        quality = request.accept_encodings.quality(offer)
+        if quality > best_quality:
+            best, best_quality = offer, quality
+    return best
+
+
+def init_compression(app: Flask) -> None:
+    """
+    Compress successful, non-streamed JSON, MessagePack and text responses of at least
+    COMPRESSION_MIN_SIZE bytes with the best encoding the client accepts. Smaller bodies are
+    sent as is: compressing them costs more CPU than it saves on the wire.
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if not (200 <= response.status_code < 300) or response.direct_passthrough \
+                or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        mimetype = response.mimetype or ''
+        if not (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        encoding = negotiate_encoding() if len(data) >= min_size else None
+        if encoding is None:
+            return response
+        compressed = compress(data, encoding, gzip_level, brotli_quality)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        logger.debug(f"Compressed {request.path} response with {encoding}: {len(data)} -> {len(compressed)} bytes")
+        return response
+
+    if brotli is None:
+        logger.info("brotli is not installed; compressing responses with gzip only")
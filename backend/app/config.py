@@ -47,6 +47,14 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # JSON Configuration ('orjson' uses orjson when installed, 'default' uses Flask's encoder)
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+
+    # Response Compression (gzip, or Brotli when the brotli package is installed)
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # Smaller bodies are sent uncompressed
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))  # 0-11; higher is smaller but slower
+
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
@@ -63,6 +71,40 @@ class Config:
     # Cohere API Key
     COHERE_API_KEY = os.getenv('COHERE_API_KEY')
 
+    # Ranking Configuration
+    RANKING_CONCURRENCY = int(os.getenv('RANKING_CONCURRENCY', '4'))  # Parallel LLM calls
+    RANKING_RATE_LIMIT = float(os.getenv('RANKING_RATE_LIMIT', '2.0'))  # Max LLM calls per second
+    TOP_PICKS_LIMIT = int(os.getenv('TOP_PICKS_LIMIT', '20'))  # Photos in a user's top picks
+    RANKING_ANALYSIS_TYPE = os.getenv('RANKING_ANALYSIS_TYPE', 'default')  # Tag for interactive rankings
+    RANKING_MAX_SESSION_ITEMS = int(os.getenv('RANKING_MAX_SESSION_ITEMS', '500'))
+    RANKING_STATS_WINDOW = int(os.getenv('RANKING_STATS_WINDOW', '500'))  # Past calls used for estimates
+    RANKING_INPUT_TOKEN_COST = float(os.getenv('RANKING_INPUT_TOKEN_COST', '0.50'))  # USD per 1M input tokens
+    RANKING_OUTPUT_TOKEN_COST = float(os.getenv('RANKING_OUTPUT_TOKEN_COST', '1.50'))  # USD per 1M output tokens
+
+    # Pagination Configuration
+    MEDIA_PAGE_SIZE = int(os.getenv('MEDIA_PAGE_SIZE', '100'))  # Default page size for list endpoints
+    MEDIA_MAX_PAGE_SIZE = int(os.getenv('MEDIA_MAX_PAGE_SIZE', '1000'))
+    MEDIA_MULTI_GET_MAX_IDS = int(os.getenv('MEDIA_MULTI_GET_MAX_IDS', '200'))  # IDs per multi-get request
+    MEDIA_BULK_MAX_IDS = int(os.getenv('MEDIA_BULK_MAX_IDS', '1000'))  # IDs per bulk operation
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '1000'))  # Rows per server-side cursor fetch in exports
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '86400'))  # How long a response is replayed for its key
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '120'))  # Claim lease, renewed while the request runs
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '30'))  # Max wait for a duplicate in-flight request
+    SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '10'))  # Changes feed lag behind the DB clock
+
+    # Media Ingest Configuration
+    MEDIA_UPSERT_CHUNK_SIZE = int(os.getenv('MEDIA_UPSERT_CHUNK_SIZE', '1000'))  # Rows per upsert statement
+    MEDIA_STREAM_CHUNK_SIZE = int(os.getenv('MEDIA_STREAM_CHUNK_SIZE', '500'))  # Rows per commit in streaming mode
+    MEDIA_STREAM_MAX_ITEM_SIZE = int(os.getenv('MEDIA_STREAM_MAX_ITEM_SIZE', str(1024 * 1024)))  # Max characters per streamed item
+
+    # Outbound Call Resilience
+    GOOGLE_HTTP_TIMEOUT = float(os.getenv('GOOGLE_HTTP_TIMEOUT', '10'))  # Seconds, OAuth and Google API calls
+    IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv('IMAGE_DOWNLOAD_TIMEOUT', '20'))  # Seconds, per image download
+    IMAGE_HEDGE_PERCENTILE = float(os.getenv('IMAGE_HEDGE_PERCENTILE', '0.95'))  # Hedge downloads slower than this
+    COHERE_TIMEOUT = int(os.getenv('COHERE_TIMEOUT', '60'))  # Seconds, per LLM call
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+
     # Email Configuration
     MAIL_SERVER = os.getenv('SMTP_HOST')
     MAIL_PORT = int(os.getenv('SMTP_PORT', '587'))
@@ -0,0 +1,65 @@
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+from typing import Any
+import logging
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Output matches DefaultJSONProvider: types orjson
+    does not handle the same way (datetimes, Decimal, ...) go through the default hook.
+    """
+
+    def _options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """
+        Serialize obj to UTF-8 JSON bytes.
+        Args:
+            obj: The object to serialize.
+        Returns:
+            bytes: The JSON document.
+        """
+        return orjson.dumps(obj, default=self.default, option=self._options())
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def init_json_provider(app: Flask) -> None:
+    """
+    Install the JSON provider selected by the JSON_ENCODER config ('orjson' or 'default').
+    Falls back to Flask's encoder when orjson is not installed.
+    Args:
+        app (Flask): The Flask application instance.
+    """
+    encoder = app.config.get('JSON_ENCODER', 'default')
+    if encoder == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+    elif encoder == 'orjson':
+        logger.warning("JSON_ENCODER=orjson but orjson is not installed; using the default encoder")
+    logger.info(f"Using {type(app.json).__name__} for JSON responses")
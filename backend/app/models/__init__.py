@@ -3,11 +3,21 @@ from .oauth_credentials import OAuthCredentials
 from .media_item import MediaItem
 from .ranking_session import RankingSession
 from .media_ranking import MediaRanking
+from .media_item_tombstone import MediaItemTombstone
+from .user_top_picks import UserTopPicks
+from .library_stat import LibraryStat
+from .user_score_sketch import UserScoreSketch
+from .idempotency_key import IdempotencyKey
 
 __all__ = [
     'User',
     'OAuthCredentials',
     'MediaItem',
     'RankingSession',
-    'MediaRanking'
+    'MediaRanking',
+    'MediaItemTombstone',
+    'UserTopPicks',
+    'LibraryStat',
+    'UserScoreSketch',
+    'IdempotencyKey'
 ]
@@ -0,0 +1,45 @@
+from app.extensions import db
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyKey(db.Model):
+    """
+    SQLAlchemy model for a client-supplied Idempotency-Key: claimed while the first request
+    runs ('in_progress'), then holding its response ('completed') until expires_at, so
+    retries get the original result instead of repeating the work (see IdempotencyService).
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status = db.Column(db.String(20), nullable=False)  # in_progress, completed
+    claim_token = db.Column(db.String(32))  # Random per claim; only its holder may store or release the key
+    response_status = db.Column(db.Integer)
+    response_mimetype = db.Column(db.String(100))
+    response_body = db.Column(db.LargeBinary)
+    locked_until = db.Column(db.DateTime(timezone=True), nullable=False)  # Lease of an in_progress claim
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+
+    __table_args__ = (
+        db.Index("idx_idempotency_keys_expires", "expires_at"),  # Purging expired keys
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert an idempotency key to dictionary.
+        Returns:
+            dict: Dictionary representation of the key (without the stored response body).
+        """
+        return {
+            'user_id': self.user_id,
+            'key': self.key,
+            'status': self.status,
+            'response_status': self.response_status,
+            'locked_until': self.locked_until.isoformat() if self.locked_until else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,123 @@
+from app.extensions import db
+from sqlalchemy import DDL, event
+from typing import Dict, Any, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LibraryStat(db.Model):
+    """
+    SQLAlchemy model for one per-user library counter, e.g. 'items.live' or 'scores.7'.
+    On Postgres the counters are kept up to date by statement-level triggers on media_items,
+    ranking_sessions and media_rankings (see LIBRARY_STATS_DDL), in the same transaction as
+    the change; LibraryStatsService.reconcile recomputes them from the source tables.
+    """
+    __tablename__ = "library_stats"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    name = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert a library counter to dictionary.
+        Returns:
+            dict: Dictionary representation of the counter.
+        """
+        return {
+            'user_id': self.user_id,
+            'name': self.name,
+            'count': self.count
+        }
+
+
+# For each source table: the owning user, an optional join to find it, and the counters a row
+# contributes to (NULL entries are skipped). Must match app.services.library_stats_service.
+STAT_SOURCES = {
+    'media_items': (
+        'r.user_id',
+        '',
+        "ARRAY[CASE WHEN r.is_deleted THEN 'items.deleted' ELSE 'items.live' END, "
+        "CASE WHEN NOT r.is_deleted THEN 'items.ai_status.' || coalesce(r.ai_status, 'none') END, "
+        "CASE WHEN NOT r.is_deleted THEN CASE WHEN r.latest_ranking_id IS NULL "
+        "THEN 'items.unranked' ELSE 'items.ranked' END END]",
+    ),
+    'ranking_sessions': (
+        'r.user_id',
+        '',
+        "ARRAY['sessions.status.' || coalesce(r.status, 'none')]",
+    ),
+    'media_rankings': (
+        # The row's own copy of the owner: rankings deleted along with their session (ON DELETE
+        # CASCADE) could no longer be joined to it
+        'r.user_id',
+        '',
+        "ARRAY['rankings.status.' || coalesce(r.status, 'none'), "
+        "CASE WHEN r.status = 'completed' AND r.combined_score IS NOT NULL "
+        "THEN 'scores.' || least(greatest(floor(r.combined_score), 0), 9)::int END]",
+    ),
+}
+
+
+def _trigger_ddl(table: str, operation: str) -> List[str]:
+    """
+    Statements creating the counter trigger for one table and operation.
+
+    Args:
+        table (str): A key of STAT_SOURCES.
+        operation (str): 'INSERT', 'UPDATE' or 'DELETE'.
+    Returns:
+        list: CREATE FUNCTION and CREATE TRIGGER statements.
+    """
+    user, join, names = STAT_SOURCES[table]
+    name = f'library_stats_{table}_{operation.lower()}'
+    changes = []
+    if operation in ('INSERT', 'UPDATE'):
+        changes.append(f'SELECT {user} AS user_id, 1 AS delta, {names} AS names FROM new_rows AS r {join}')
+    if operation in ('UPDATE', 'DELETE'):
+        changes.append(f'SELECT {user} AS user_id, -1 AS delta, {names} AS names FROM old_rows AS r {join}')
+    changes_sql = ' UNION ALL '.join(changes)
+    referencing = {
+        'INSERT': 'NEW TABLE AS new_rows',
+        'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        'DELETE': 'OLD TABLE AS old_rows',
+    }[operation]
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Waits while LibraryStatsService.reconcile rebuilds one of these users' counters
+            PERFORM pg_advisory_xact_lock_shared(hashtextextended('library_stats.' || user_id, 0))
+            FROM (SELECT DISTINCT user_id FROM ({changes_sql}) AS changes ORDER BY user_id) AS locked;
+            -- Users deleted in this transaction are skipped; their counters go with them
+            INSERT INTO library_stats (user_id, name, count)
+            SELECT changes.user_id, counter.name, sum(changes.delta)
+            FROM ({changes_sql}) AS changes
+            CROSS JOIN unnest(changes.names) AS counter(name)
+            JOIN users ON users.id = changes.user_id
+            WHERE counter.name IS NOT NULL
+            GROUP BY changes.user_id, counter.name
+            HAVING sum(changes.delta) <> 0
+            ORDER BY changes.user_id, counter.name
+            ON CONFLICT (user_id, name) DO UPDATE SET count = library_stats.count + excluded.count;
+            RETURN NULL;
+        END
+        $$
+        """,
+        f"""
+        CREATE TRIGGER {name} AFTER {operation} ON {table}
+        REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+        """,
+    ]
+
+
+LIBRARY_STATS_DDL = [
+    statement
+    for table in STAT_SOURCES
+    for operation in ('INSERT', 'UPDATE', 'DELETE')
+    for statement in _trigger_ddl(table, operation)
+]
+
+# After every table exists, since the triggers live on the source tables
+for _statement in LIBRARY_STATS_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -6,6 +6,29 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Text search configuration; 'simple' lowercases without stemming or stop words
+SEARCH_CONFIG = db.literal_column("'simple'::regconfig")
+
+def search_vector(filename: Any, description: Any) -> Any:
+    """
+    Build the tsvector searched by /api/media/search. Anything that is not a letter or digit
+    separates words, so the in-process fallback can tokenize the same way (see media_search_service).
+    The expression must stay identical to the one in idx_media_items_search for the index to be used.
+
+    Args:
+        filename: The filename column.
+        description: The description column.
+    Returns:
+        The tsvector expression.
+    """
+    document = db.func.coalesce(filename, db.literal_column("''")) + db.literal_column("' '") + db.func.coalesce(
+        description, db.literal_column("''")
+    )
+    words = db.func.regexp_replace(
+        db.func.lower(document), db.literal_column("'[^[:alnum:]]+'"), db.literal_column("' '"), db.literal_column("'g'")
+    )
+    return db.func.to_tsvector(SEARCH_CONFIG, words)
+
 class MediaItem(db.Model):
     """
     SQLAlchemy model for a media item (photo) belonging to a user.
@@ -31,10 +54,31 @@ class MediaItem(db.Model):
     duration = db.Column(db.Integer, nullable=True)  # Duration in seconds for videos
     thumbnail_url = db.Column(db.Text, nullable=True)  # Thumbnail for UI
     ai_status = db.Column(db.String(20), default='pending')  # 'pending', 'analyzed', etc.
-    latest_ranking_id = db.Column(db.BigInteger, db.ForeignKey('media_rankings.id'), nullable=True)
+    latest_ranking_id = db.Column(db.BigInteger, db.ForeignKey('media_rankings.id', ondelete='SET NULL'), nullable=True)
 
     __table_args__ = (
         db.UniqueConstraint("user_id", "google_media_id", name="uq_user_media"),
+        db.Index("idx_media_items_user_updated", "user_id", "updated_at", "id"),  # Changes feed
+        # Media list: a user's live items, newest first (matches the keyset order)
+        db.Index(
+            "idx_media_items_user_live_created", user_id, creation_time.desc().nulls_last(), id.desc(),
+            postgresql_where=is_deleted.is_(False),
+        ),
+        db.Index(
+            "idx_media_items_latest_ranking", latest_ranking_id,
+            postgresql_where=latest_ranking_id.isnot(None),
+        ),
+        # Search: full text over filename/description, and tag containment/overlap
+        db.Index("idx_media_items_search", search_vector(filename, description), postgresql_using="gin"),
+        db.Index("idx_media_items_tags", tags_json, postgresql_using="gin"),
+    )
+
+    # Fields a client may select with ?fields= on list endpoints (same keys as to_dict)
+    API_FIELDS = (
+        'id', 'user_id', 'google_media_id', 'base_url', 'filename', 'mime_type', 'description',
+        'creation_time', 'width', 'height', 'duration', 'thumbnail_url', 'is_deleted',
+        'last_synced_at', 'exif_json', 'tags_json', 'ai_status', 'latest_ranking_id',
+        'created_at', 'updated_at',
     )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -0,0 +1,37 @@
+from app.extensions import db
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MediaItemTombstone(db.Model):
+    """
+    SQLAlchemy model recording a permanently deleted media item, so the changes feed can
+    tell syncing clients to drop it even though the media_items row is gone.
+    """
+    __tablename__ = "media_item_tombstones"
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    media_item_id = db.Column(db.BigInteger, nullable=False)  # No FK: the item no longer exists
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())  # Deletion time
+
+    __table_args__ = (
+        db.Index("idx_media_item_tombstones_user_updated", "user_id", "updated_at", "id"),  # Changes feed
+    )
+
+    # Columns read by the changes feed, in select order
+    API_FIELDS = ('id', 'media_item_id', 'updated_at')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert a tombstone to dictionary.
+        Returns:
+            dict: Dictionary representation of the tombstone.
+        """
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'media_item_id': self.media_item_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,4 +1,5 @@
 from app.extensions import db
+from sqlalchemy import DDL, event
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from datetime import datetime
 from typing import Optional, Dict, Any
@@ -15,6 +16,8 @@ class MediaRanking(db.Model):
     id = db.Column(db.BigInteger, primary_key=True)
     ranking_session_id = db.Column(db.BigInteger, db.ForeignKey("ranking_sessions.id", ondelete="CASCADE"), nullable=False)
     media_item_id = db.Column(db.BigInteger, db.ForeignKey("media_items.id", ondelete="CASCADE"), nullable=False)
+    # Owner of the session, copied so per-user reads need no join (see MEDIA_RANKINGS_USER_DDL)
+    user_id = db.Column(db.BigInteger, nullable=False)
     technical_score = db.Column(db.Numeric(5,2))
     aesthetic_score = db.Column(db.Numeric(5,2))
     combined_score = db.Column(db.Numeric(5,2))
@@ -24,10 +27,31 @@ class MediaRanking(db.Model):
     status = db.Column(db.String(20), default='completed')  # 'pending', 'completed', 'failed', etc.
     error_message = db.Column(db.Text, nullable=True)  # For failed analyses
     analyzed_at = db.Column(db.DateTime(timezone=True), nullable=True)  # When analysis completed
+    latency_ms = db.Column(db.Integer, nullable=True)  # Wall time of the LLM call, including image download
+    input_tokens = db.Column(db.Integer, nullable=True)  # Billed prompt tokens
+    output_tokens = db.Column(db.Integer, nullable=True)  # Billed completion tokens
+    image_bytes = db.Column(db.BigInteger, nullable=True)  # Size of the downloaded image
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
 
     __table_args__ = (
         db.Index("idx_media_rankings_session_score", "ranking_session_id", "combined_score"),
+        db.Index("idx_media_rankings_user_updated", "user_id", "updated_at", "id"),  # Changes feed
+        db.Index("idx_media_rankings_media_item", "media_item_id"),  # FK, cached-score lookups
+        # Recent LLM calls used by the ranking estimator
+        db.Index(
+            "idx_media_rankings_recent_calls", analyzed_at.desc().nulls_last(),
+            postgresql_where=latency_ms.isnot(None),
+        ),
+        db.Index("idx_media_rankings_tags", tags_json, postgresql_using="gin"),  # Tag search
+    )
+
+    # Columns returned by list endpoints (same keys as to_dict)
+    API_FIELDS = (
+        'id', 'ranking_session_id', 'media_item_id', 'technical_score', 'aesthetic_score',
+        'combined_score', 'llm_reasoning', 'tags_json', 'analysis_type', 'status', 'error_message',
+        'analyzed_at', 'latency_ms', 'input_tokens', 'output_tokens', 'image_bytes', 'created_at',
+        'updated_at',
     )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -49,5 +73,31 @@ class MediaRanking(db.Model):
             'status': self.status,
             'error_message': self.error_message,
             'analyzed_at': self.analyzed_at.isoformat() if self.analyzed_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'latency_ms': self.latency_ms,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'image_bytes': self.image_bytes,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+# Fills user_id from the ranking session when an insert leaves it out. Writers that know the
+# owner set it themselves, which skips the trigger. Must match migrations/versions/media_rankings_user_id.py
+MEDIA_RANKINGS_USER_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION media_rankings_set_user_id() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.user_id := (SELECT user_id FROM ranking_sessions WHERE id = NEW.ranking_session_id);
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER media_rankings_set_user_id BEFORE INSERT ON media_rankings
+    FOR EACH ROW WHEN (NEW.user_id IS NULL) EXECUTE FUNCTION media_rankings_set_user_id()
+    """,
+]
+
+for _statement in MEDIA_RANKINGS_USER_DDL:
+    event.listen(MediaRanking.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -21,6 +21,18 @@ class RankingSession(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
     updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
 
+    __table_args__ = (
+        db.Index("idx_ranking_sessions_user_completed", "user_id", "completed_at"),  # Latest completed session
+        # Session list: a user's sessions, newest first (matches the keyset order)
+        db.Index("idx_ranking_sessions_user_initiated", user_id, initiated_at.desc().nulls_last(), id.desc()),
+    )
+
+    # Columns returned by list endpoints (same keys as to_dict)
+    API_FIELDS = (
+        'id', 'user_id', 'initiated_at', 'completed_at', 'method', 'status', 'error_message',
+        'created_at', 'updated_at',
+    )
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Convert ranking session to dictionary.
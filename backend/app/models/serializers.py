@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import logging
+
+from sqlalchemy import Date, DateTime, Numeric
+
+logger = logging.getLogger(__name__)
+
+RowSerializer = Callable[[Sequence[Any]], Dict[str, Any]]
+
+
+def _value_expression(column: Any, index: int) -> str:
+    """
+    Source for serializing one positional value, matching the models' to_dict conventions.
+    """
+    value = f"r[{index}]"
+    if isinstance(column.type, (DateTime, Date)):
+        return f"({value}.isoformat() if {value} is not None else None)"
+    if isinstance(column.type, Numeric) and column.type.asdecimal:
+        return f"(float({value}) if {value} is not None else None)"
+    return value
+
+
+@lru_cache(maxsize=256)
+def compile_row_serializer(model: Any, fields: Tuple[str, ...], offset: int = 0, prefix: str = '') -> RowSerializer:
+    """
+    Compile a serializer that turns a positional result row into a dict.
+    The function body is generated once per (model, fields), so serializing a row costs
+    one dict display with no per-column type checks or attribute lookups.
+
+    Args:
+        model: The SQLAlchemy model class.
+        fields (tuple): Column names, in the order they are selected.
+        offset (int): Position of the first of these columns in the row (for joined selects).
+        prefix (str): Prepended to every key, e.g. 'ranking_' to flatten a joined model.
+    Returns:
+        callable: row -> dict.
+    """
+    columns = model.__table__.columns
+    items = ', '.join(
+        f"{prefix + field!r}: {_value_expression(columns[field], offset + index)}" for index, field in enumerate(fields)
+    )
+    namespace: Dict[str, Any] = {}
+    exec(f"def serialize(r):\n    return {{{items}}}\n", namespace)
+    logger.debug(f"Compiled row serializer for {model.__name__}{fields}")
+    return namespace['serialize']
+
+
+def select_columns(model: Any, fields: Sequence[str]) -> List[Any]:
+    """
+    Get the column attributes to select for the given fields, in order.
+
+    Args:
+        model: The SQLAlchemy model class.
+        fields (sequence): Column names.
+    Returns:
+        list: Column attributes usable in select().
+    """
+    return [getattr(model, field) for field in fields]
+
+
+def serialize_rows(model: Any, fields: Sequence[str], rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Serialize positional rows selected with select_columns(model, fields).
+
+    Args:
+        model: The SQLAlchemy model class.
+        fields (sequence): Column names, in the order they were selected.
+        rows (sequence): Result rows (tuples or Row objects).
+    Returns:
+        list: One dict per row.
+    """
+    serialize = compile_row_serializer(model, tuple(fields))
+    return [serialize(row) for row in rows]
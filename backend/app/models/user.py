@@ -24,6 +24,7 @@ class User(db.Model):
     verification_token = db.Column(db.String(100), unique=True)
     reset_password_token = db.Column(db.String(100), unique=True)
     reset_password_expires = db.Column(db.DateTime(timezone=True))
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # Bumped on every media/ranking change
     created_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now())
     updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
 
@@ -74,6 +75,24 @@ class User(db.Model):
             logger.warning(f"Failed to verify auth token: {str(e)}")
             return None
 
+    @staticmethod
+    def bump_data_version(*user_ids: int) -> None:
+        """
+        Increment the change counter of the given users. Call in the same transaction as the
+        change so conditional GETs (ETags) see it exactly when the change becomes visible.
+        Args:
+            *user_ids (int): The users whose media or rankings changed.
+        """
+        ids = {int(user_id) for user_id in user_ids}
+        if not ids:
+            return
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(ids))
+            .values(data_version=User.data_version + 1, updated_at=User.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Convert user object to dictionary.
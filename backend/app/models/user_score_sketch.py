@@ -0,0 +1,31 @@
+from app.extensions import db
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserScoreSketch(db.Model):
+    """
+    SQLAlchemy model for a serialized t-digest of one user's completed ranking scores on one
+    axis ('technical', 'aesthetic' or 'combined'), used to answer percentile lookups without
+    sorting the user's rankings (see ScoreSketchService).
+    """
+    __tablename__ = "user_score_sketches"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    axis = db.Column(db.String(20), primary_key=True)
+    digest = db.Column(db.LargeBinary, nullable=False)  # TDigest.to_bytes()
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert a score sketch to dictionary.
+        Returns:
+            dict: Dictionary representation of the sketch (without the digest itself).
+        """
+        return {
+            'user_id': self.user_id,
+            'axis': self.axis,
+            'size': len(self.digest) if self.digest else 0,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
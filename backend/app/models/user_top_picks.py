@@ -0,0 +1,33 @@
+from app.extensions import db
+from sqlalchemy.dialects.postgresql import JSONB
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UserTopPicks(db.Model):
+    """
+    SQLAlchemy model for a user's materialized top picks, computed from their latest
+    completed ranking session so the top-picks endpoint is served with one read.
+    """
+    __tablename__ = "user_top_picks"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    ranking_session_id = db.Column(db.BigInteger, db.ForeignKey("ranking_sessions.id", ondelete="SET NULL"), nullable=True)
+    photos = db.Column(JSONB, nullable=False)  # Serialized top-picks list, as returned by the API
+    data_version = db.Column(db.BigInteger)  # users.data_version read before computing; served only while it matches
+    computed_at = db.Column(db.DateTime(timezone=True), server_default=db.func.now(), onupdate=db.func.now())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert materialized top picks to dictionary.
+        Returns:
+            dict: Dictionary representation of the top picks.
+        """
+        return {
+            'user_id': self.user_id,
+            'ranking_session_id': self.ranking_session_id,
+            'photos': self.photos,
+            'data_version': self.data_version,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
@@ -1,7 +1,19 @@
 from .google_service import GoogleService
 from .llm_ranking_service import LLMBasedRankingService
+from .rescore_service import BulkRescoreService
+from .ranking_estimator import RankingEstimator
+from .media_ingest_service import MediaIngestService
+from .top_picks_service import TopPicksService
+from .ranking_session_service import RankingSessionService
+from .latest_ranking_service import LatestRankingService
 
 __all__ = [
     'GoogleService',
     'LLMBasedRankingService',
+    'BulkRescoreService',
+    'RankingEstimator',
+    'MediaIngestService',
+    'TopPicksService',
+    'RankingSessionService',
+    'LatestRankingService',
 ]
@@ -0,0 +1,153 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import column, func, select, table, true, tuple_
+from app.extensions import db
+from app.models import MediaItem, MediaItemTombstone, MediaRanking
+from app.models.serializers import select_columns, serialize_rows
+
+logger = logging.getLogger(__name__)
+
+# Position of (updated_at, id) for each resource in a changes cursor
+Position = Tuple[Optional[datetime], int]
+
+
+class ChangeFeedService:
+    """
+    Delta-sync feed of a user's media items and rankings, ordered by (updated_at, id).
+
+    Rows are stamped with now(), which in Postgres is the start time of the writing transaction,
+    so a transaction still open can later commit rows stamped no earlier than its own start. The
+    feed therefore only returns rows stamped before the oldest transaction still open on the
+    database (and before the settle window), and such a commit cannot slip behind a cursor that
+    already moved on. Caveats: a long transaction, even a read-only or idle one, holds the feed
+    back until it ends, and other roles' transactions are only seen with pg_read_all_stats. On
+    other databases only the settle window applies, which a transaction open longer than it defeats.
+    """
+
+    def __init__(self, settle_seconds: float = 10.0) -> None:
+        """
+        Initialize the changes feed.
+
+        Args:
+            settle_seconds (float): How far behind the database clock the feed stays.
+        """
+        self.settle = timedelta(seconds=max(0.0, settle_seconds))
+
+    def _horizon(self) -> datetime:
+        """
+        Get the time before which no more rows can appear, from the database clock.
+
+        Returns:
+            datetime: now() minus the settle window, or the start of the oldest other open
+            transaction when that is earlier.
+        """
+        horizon = func.now() - self.settle
+        if db.session.get_bind().dialect.name == 'postgresql':
+            activity = table('pg_stat_activity', column('xact_start'), column('datname'),
+                             column('pid'), column('backend_type'))
+            oldest = select(func.min(activity.c.xact_start)).where(
+                activity.c.datname == func.current_database(),
+                activity.c.pid != func.pg_backend_pid(),
+                activity.c.backend_type == 'client backend',
+            ).scalar_subquery()
+            # least() ignores the NULL when no other transaction is open
+            horizon = func.least(horizon, oldest)
+        return db.session.execute(select(horizon)).scalar_one()
+
+    @staticmethod
+    def _after(model: Any, position: Position) -> Any:
+        updated_at, row_id = position
+        if updated_at is None:
+            # No cursor yet: start from the beginning
+            return true()
+        return tuple_(model.updated_at, model.id) > (updated_at, row_id)
+
+    def _page(
+        self, query: Any, model: Any, position: Position, horizon: datetime, limit: int
+    ) -> Tuple[List[Any], Position, bool]:
+        """
+        Fetch the next page of changed rows of one resource.
+
+        Args:
+            query (Select): Core select of model.API_FIELDS.
+            model: The model being read.
+            position (tuple): (updated_at, id) of the last row already delivered.
+            horizon (datetime): Only rows stamped before it are returned, from _horizon().
+            limit (int): Page size.
+        Returns:
+            tuple: (rows, new position, whether more rows are waiting).
+        """
+        rows = db.session.execute(
+            query.where(
+                self._after(model, position),
+                model.updated_at < horizon,
+            ).order_by(model.updated_at, model.id).limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            last = rows[-1]
+            position = (last[model.API_FIELDS.index('updated_at')], last[model.API_FIELDS.index('id')])
+        return rows, position, has_more
+
+    def changes(
+        self,
+        user_id: int,
+        media_position: Position,
+        ranking_position: Position,
+        limit: int,
+        tombstone_position: Position = (None, 0),
+    ) -> Dict[str, Any]:
+        """
+        Get media items and rankings that changed after the given positions.
+
+        Args:
+            user_id (int): The user's ID.
+            media_position (tuple): Last delivered (updated_at, id) of media items.
+            ranking_position (tuple): Last delivered (updated_at, id) of rankings.
+            limit (int): Page size per resource.
+            tombstone_position (tuple): Last delivered (updated_at, id) of hard-delete tombstones.
+        Returns:
+            dict: 'media_items' (current state of changed items), 'deleted_media_item_ids'
+            (soft-deleted and permanently deleted items), 'rankings', the new positions and 'has_more'.
+        """
+        horizon = self._horizon()
+        media_fields = MediaItem.API_FIELDS
+        media_query = select(*select_columns(MediaItem, media_fields)).where(MediaItem.user_id == user_id)
+        media_rows, media_position, media_more = self._page(media_query, MediaItem, media_position, horizon, limit)
+
+        ranking_fields = MediaRanking.API_FIELDS
+        ranking_query = select(*select_columns(MediaRanking, ranking_fields)).where(MediaRanking.user_id == user_id)
+        ranking_rows, ranking_position, ranking_more = self._page(ranking_query, MediaRanking, ranking_position, horizon, limit)
+
+        tombstone_query = select(*select_columns(MediaItemTombstone, MediaItemTombstone.API_FIELDS)).where(
+            MediaItemTombstone.user_id == user_id
+        )
+        tombstone_rows, tombstone_position, tombstone_more = self._page(
+            tombstone_query, MediaItemTombstone, tombstone_position, horizon, limit
+        )
+
+        is_deleted, media_id = media_fields.index('is_deleted'), media_fields.index('id')
+        tombstone_item_id = MediaItemTombstone.API_FIELDS.index('media_item_id')
+        live_rows = [row for row in media_rows if not row[is_deleted]]
+        deleted_ids = [row[media_id] for row in media_rows if row[is_deleted]]
+        seen = set(deleted_ids)
+        for row in tombstone_rows:
+            if row[tombstone_item_id] not in seen:
+                seen.add(row[tombstone_item_id])
+                deleted_ids.append(row[tombstone_item_id])
+        logger.info(
+            f"Changes feed for user_id={user_id}: {len(live_rows)} items, {len(deleted_ids)} tombstones, "
+            f"{len(ranking_rows)} rankings"
+        )
+        return {
+            'media_items': serialize_rows(MediaItem, media_fields, live_rows),
+            'deleted_media_item_ids': deleted_ids,
+            'rankings': serialize_rows(MediaRanking, ranking_fields, ranking_rows),
+            'media_position': media_position,
+            'ranking_position': ranking_position,
+            'tombstone_position': tombstone_position,
+            'has_more': media_more or ranking_more or tombstone_more,
+        }
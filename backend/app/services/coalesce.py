@@ -0,0 +1,49 @@
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function and
+    every caller that arrives while it is running receives the same result (or error).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run `fn` for `key`, or wait for the identical call already in flight.
+
+        Args:
+            key: Identifies identical calls, e.g. ('top_picks', user_id).
+            fn (callable): The call to run. Its result is shared, so it must not be mutated.
+        Returns:
+            The result of the (possibly shared) call.
+        Raises:
+            Exception: Whatever `fn` raised.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            logger.debug(f"Coalesced concurrent call for {key!r}")
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -0,0 +1,218 @@
+import io
+import csv
+import json
+import logging
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import ARRAY, BigInteger, DateTime, Integer, Numeric, select, true
+from app.extensions import db
+from app.models import MediaItem, MediaRanking
+from app.models.serializers import compile_row_serializer, select_columns
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+
+class _DrainableBuffer(io.RawIOBase):
+    """
+    Write-only sink that hands out what has been written so far, so a ParquetWriter's
+    output can be streamed row group by row group instead of accumulating in memory.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    """
+    Streams media items joined to all their rankings as NDJSON, CSV or Parquet. Rows are read
+    through a server-side cursor (yield_per) and encoded one chunk at a time, so memory use
+    does not grow with the size of the export. Each output row is one (media item, ranking)
+    pair; items without rankings appear once with empty ranking columns.
+    """
+
+    FORMATS = ('ndjson', 'csv', 'parquet')
+    MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+    ITEM_FIELDS = (
+        'id', 'user_id', 'google_media_id', 'filename', 'mime_type', 'description', 'creation_time',
+        'width', 'height', 'tags_json', 'ai_status',
+    )
+    RANKING_FIELDS = (
+        'id', 'ranking_session_id', 'analysis_type', 'status', 'technical_score', 'aesthetic_score',
+        'combined_score', 'tags_json', 'analyzed_at',
+    )
+    RANKING_PREFIX = 'ranking_'
+
+    def __init__(self, chunk_size: int = 1000) -> None:
+        """
+        Initialize the export service.
+
+        Args:
+            chunk_size (int): Rows fetched from the server-side cursor and encoded at a time.
+        """
+        self.chunk_size = max(1, chunk_size)
+
+    @property
+    def columns(self) -> List[str]:
+        """Output column names, in order."""
+        return list(self.ITEM_FIELDS) + [self.RANKING_PREFIX + field for field in self.RANKING_FIELDS]
+
+    def validate(self, export_format: str) -> None:
+        """
+        Check that a format can be exported.
+
+        Args:
+            export_format (str): The requested format.
+        Raises:
+            ValueError: If the format is unknown, or Parquet is requested without pyarrow installed.
+        """
+        if export_format not in self.FORMATS:
+            raise ValueError(f"format must be one of {', '.join(self.FORMATS)}")
+        if export_format == 'parquet' and pyarrow is None:
+            raise ValueError('Parquet export requires pyarrow to be installed')
+
+    def _chunks(self, user_id: Optional[int]) -> Iterator[Sequence[Any]]:
+        """
+        Read the export rows in chunks through a server-side cursor.
+
+        Args:
+            user_id (int, optional): Only this user's items; all users when None.
+        Returns:
+            iterator: Lists of positional rows (ITEM_FIELDS, then RANKING_FIELDS).
+        """
+        # LATERAL makes each item's rankings an index lookup, so the plan starts streaming at once and
+        # reads only the exported items' rankings instead of hash-joining the whole rankings table
+        rankings = (
+            select(*select_columns(MediaRanking, self.RANKING_FIELDS))
+            .where(MediaRanking.media_item_id == MediaItem.id)
+            .order_by(MediaRanking.id)
+            .lateral('rankings')
+        )
+        query = (
+            select(*select_columns(MediaItem, self.ITEM_FIELDS), *rankings.c)
+            .outerjoin(rankings, true())
+            .where(MediaItem.is_deleted.is_(False))
+            .order_by(MediaItem.id, rankings.c.id)
+        )
+        if user_id is not None:
+            query = query.where(MediaItem.user_id == user_id)
+        # yield_per streams results from a server-side cursor instead of buffering the whole result
+        result = db.session.execute(query, execution_options={'yield_per': self.chunk_size})
+        total = 0
+        for partition in result.partitions():
+            total += len(partition)
+            yield partition
+        logger.info(f"Exported {total} rows for user_id={user_id}")
+
+    def _serializer(self) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+        serialize_item = compile_row_serializer(MediaItem, self.ITEM_FIELDS)
+        serialize_ranking = compile_row_serializer(
+            MediaRanking, self.RANKING_FIELDS, len(self.ITEM_FIELDS), self.RANKING_PREFIX
+        )
+
+        def serialize(row: Sequence[Any]) -> Dict[str, Any]:
+            record = serialize_item(row)
+            record.update(serialize_ranking(row))
+            return record
+        return serialize
+
+    def stream(self, export_format: str, user_id: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Encode the export in the given format, one chunk at a time.
+
+        Args:
+            export_format (str): 'ndjson', 'csv' or 'parquet'.
+            user_id (int, optional): Only this user's items; all users when None.
+        Returns:
+            iterator: Encoded byte chunks; concatenated they form the complete file.
+        Raises:
+            ValueError: If the format cannot be exported (see validate).
+        """
+        self.validate(export_format)
+        encode = {'ndjson': self._ndjson, 'csv': self._csv, 'parquet': self._parquet}[export_format]
+        return encode(self._chunks(user_id))
+
+    def _ndjson(self, chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+        serialize = self._serializer()
+        for chunk in chunks:
+            yield ''.join(json.dumps(serialize(row), ensure_ascii=False) + '\n' for row in chunk).encode('utf-8')
+
+    def _csv(self, chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+        serialize = self._serializer()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.columns)
+        for chunk in chunks:
+            for row in chunk:
+                # Lists (tags) are written as JSON so the cell round-trips unambiguously
+                writer.writerow([
+                    json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+                    for value in serialize(row).values()
+                ])
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def _arrow_schema(self) -> Any:
+        columns = [MediaItem.__table__.columns[field] for field in self.ITEM_FIELDS]
+        columns += [MediaRanking.__table__.columns[field] for field in self.RANKING_FIELDS]
+        fields = []
+        for name, column in zip(self.columns, columns):
+            if isinstance(column.type, (Integer, BigInteger)):
+                arrow_type = pyarrow.int64()
+            elif isinstance(column.type, Numeric):
+                arrow_type = pyarrow.float64()
+            elif isinstance(column.type, DateTime):
+                arrow_type = pyarrow.timestamp('us', tz='UTC')
+            elif isinstance(column.type, ARRAY):
+                arrow_type = pyarrow.list_(pyarrow.string())
+            else:
+                arrow_type = pyarrow.string()
+            fields.append(pyarrow.field(name, arrow_type))
+        return pyarrow.schema(fields)
+
+    def _parquet(self, chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+        schema = self._arrow_schema()
+        sink = _DrainableBuffer()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        try:
+            for chunk in chunks:
+                # One row group per chunk; Decimal scores become floats like in the JSON output
+                arrays = [
+                    pyarrow.array(
+                        [float(row[index]) if isinstance(row[index], Decimal) else row[index] for row in chunk],
+                        type=field.type,
+                    )
+                    for index, field in enumerate(schema)
+                ]
+                writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
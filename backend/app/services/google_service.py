@@ -5,9 +5,12 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from app.models.oauth_credentials import OAuthCredentials
 from app.extensions import db
 from app.config import Config
+from app.services.resilience import get_breaker, is_dependency_failure
 import secrets
 from datetime import datetime, timedelta
 import requests
@@ -30,6 +33,32 @@ class GoogleService:
             'https://www.googleapis.com/auth/userinfo.email',
             'https://www.googleapis.com/auth/userinfo.profile'
         ]
+        self.oauth_breaker = get_breaker(
+            'google_oauth',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+            is_failure=is_dependency_failure,
+        )
+        self.api_breaker = get_breaker(
+            'google_api',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+        )
+
+    def _build_service(self, service_name: str, version: str, credentials: Credentials) -> Any:
+        """
+        Build a Google API client whose HTTP transport enforces GOOGLE_HTTP_TIMEOUT.
+
+        Args:
+            service_name (str): The API name, e.g. 'oauth2'.
+            version (str): The API version.
+            credentials (Credentials): The credentials to authorize requests with.
+
+        Returns:
+            Resource: The API client.
+        """
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=Config.GOOGLE_HTTP_TIMEOUT))
+        return build(service_name, version, http=http)
 
     def get_auth_url(self, access_type: str = 'offline', include_granted_scopes: bool = False) -> str:
         """
@@ -90,10 +119,12 @@ class GoogleService:
                 scopes=self.required_scopes,
                 redirect_uri=self.redirect_uri
             )
-            tokens = flow.fetch_token(
+            tokens = self.oauth_breaker.call(
+                flow.fetch_token,
                 code=code,
                 client_id=self.client_id,
-                client_secret=self.client_secret
+                client_secret=self.client_secret,
+                timeout=Config.GOOGLE_HTTP_TIMEOUT
             )
             scopes = tokens.get('scope', [])
             if isinstance(scopes, str):
@@ -101,7 +132,7 @@ class GoogleService:
             # Only log if tokeninfo fetch fails
             tokeninfo_url = f"https://www.googleapis.com/oauth2/v1/tokeninfo?access_token={tokens['access_token']}"
             try:
-                requests.get(tokeninfo_url)
+                self.oauth_breaker.call(requests.get, tokeninfo_url, timeout=Config.GOOGLE_HTTP_TIMEOUT)
             except Exception as e:
                 logger.warning(f"Error fetching tokeninfo: {e}")
             return tokens
@@ -119,8 +150,8 @@ class GoogleService:
         Returns:
             dict: User information from Google.
         """
-        service = build('oauth2', 'v2', credentials=Credentials(access_token))
-        return service.userinfo().get().execute()
+        service = self._build_service('oauth2', 'v2', Credentials(access_token))
+        return self.api_breaker.call(service.userinfo().get().execute)
 
     def store_credentials(self, user_id: int, provider: str, tokens: Dict[str, Any]) -> None:
         """
@@ -193,7 +224,7 @@ class GoogleService:
         )
         if creds.expired and creds.refresh_token:
             try:
-                creds.refresh(Request())
+                self.oauth_breaker.call(creds.refresh, Request())
                 credentials.access_token = creds.token
                 credentials.token_expires_at = creds.expiry
                 db.session.commit()
@@ -234,8 +265,8 @@ class GoogleService:
             if not credentials:
                 logger.warning("No credentials found or failed to refresh.")
                 return False
-            oauth2_service = build('oauth2', 'v2', credentials=credentials)
-            user_info = oauth2_service.userinfo().get().execute()
+            oauth2_service = self._build_service('oauth2', 'v2', credentials)
+            user_info = self.api_breaker.call(oauth2_service.userinfo().get().execute)
             # Removed persistent Photos Library API access
             # photos_service = build('photoslibrary', 'v1', credentials=credentials)
             # test_response = photos_service.mediaItems().list(pageSize=1).execute()
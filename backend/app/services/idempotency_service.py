@@ -0,0 +1,279 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Row
+from app.extensions import db
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """Raised when an Idempotency-Key is sent again with a different request."""
+
+
+class IdempotencyKeyInProgressError(RuntimeError):
+    """Raised when the request that claimed a key is still running after the wait."""
+
+
+class IdempotencyService:
+    """
+    Stores Idempotency-Key claims and responses in the database, so a retried write is
+    answered with the original response from any worker process instead of running again.
+    The first request claims the key with a single insert and renews the claim while it runs;
+    duplicates that arrive meanwhile poll until it finishes (or give up after wait_seconds)
+    rather than executing.
+    """
+
+    IN_PROGRESS = 'in_progress'
+    COMPLETED = 'completed'
+    MAX_KEY_LENGTH = 255
+
+    def __init__(
+        self,
+        ttl_seconds: int = 86400,
+        lock_seconds: int = 120,
+        wait_seconds: float = 30.0,
+        poll_interval: float = 0.25,
+    ) -> None:
+        """
+        Initialize the idempotency service.
+
+        Args:
+            ttl_seconds (int): How long a completed response is replayed for its key.
+            lock_seconds (int): How long a claim is honoured without renewal before a retry may take
+                it over, so a worker that died mid-request does not block the key until it expires.
+                Running requests renew it (see lease()), however long they take.
+            wait_seconds (float): How long a duplicate waits for the original request to finish.
+            poll_interval (float): Seconds between checks while waiting.
+        """
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lock = timedelta(seconds=lock_seconds)
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def fingerprint(method: str, path: str, body: bytes) -> str:
+        """
+        Hash the parts of a request that must match for a key to be replayed.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path with its query string.
+            body (bytes): The raw request body.
+        Returns:
+            str: Hex SHA-256 digest.
+        """
+        digest = hashlib.sha256(f"{method} {path}\n".encode('utf-8'))
+        digest.update(body)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _insert() -> Any:
+        return pg_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+    def _claim(self, user_id: int, key: str, fingerprint: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        values = {
+            'fingerprint': fingerprint,
+            'status': self.IN_PROGRESS,
+            'claim_token': token,
+            'locked_until': now + self.lock,
+            'expires_at': now + self.ttl,
+        }
+        claimed = db.session.execute(
+            self._insert()(IdempotencyKey)
+            .values(user_id=user_id, key=key, **values)
+            .on_conflict_do_nothing()
+            .returning(IdempotencyKey.key)
+        ).first()
+        if claimed is None:
+            # Take over keys whose response has expired or whose request died holding the claim
+            claimed = db.session.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    or_(
+                        IdempotencyKey.expires_at <= now,
+                        and_(IdempotencyKey.status == self.IN_PROGRESS, IdempotencyKey.locked_until <= now),
+                    ),
+                )
+                .values(response_status=None, response_mimetype=None, response_body=None,
+                        created_at=func.now(), **values)
+                .returning(IdempotencyKey.key)
+            ).first()
+        db.session.commit()
+        return token if claimed is not None else None
+
+    def begin(
+        self, user_id: int, key: str, fingerprint: str, wait: bool = True
+    ) -> Tuple[Optional[str], Optional[Row]]:
+        """
+        Claim a key for a request, or find the response of the request that claimed it.
+        Commits the session, so the claim is visible to other workers before the request runs.
+
+        Args:
+            user_id (int): The current user's ID; keys are scoped per user.
+            key (str): The client's Idempotency-Key.
+            fingerprint (str): The request's fingerprint, from fingerprint().
+            wait (bool): Whether to wait up to wait_seconds for a request still holding the key.
+        Returns:
+            tuple: (claim token, None) when the caller now holds the key and must run the request
+            and then call complete() or release() with the token; otherwise (None, stored
+            response) with response_status, response_mimetype and response_body.
+        Raises:
+            IdempotencyKeyReusedError: If the key was used for a different request.
+            IdempotencyKeyInProgressError: If the original request is still running after the wait.
+        """
+        deadline = time.monotonic() + (self.wait_seconds if wait else 0.0)
+        while True:
+            token = self._claim(user_id, key, fingerprint)
+            if token is not None:
+                return token, None
+            row = db.session.execute(
+                select(
+                    IdempotencyKey.fingerprint, IdempotencyKey.status, IdempotencyKey.response_status,
+                    IdempotencyKey.response_mimetype, IdempotencyKey.response_body,
+                ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            ).first()
+            # End the read so the next poll sees the original request's commit
+            db.session.commit()
+            if row is None:
+                continue  # Released between the claim and the read: try to claim it again
+            if row.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError('Idempotency-Key was already used for a different request')
+            if row.status == self.COMPLETED:
+                logger.info(f"Replaying stored response for idempotency key of user_id={user_id}")
+                return None, row
+            if time.monotonic() >= deadline:
+                raise IdempotencyKeyInProgressError('A request with this Idempotency-Key is still in progress')
+            time.sleep(self.poll_interval)
+
+    def _held(self, user_id: int, key: str, token: str) -> tuple:
+        return (
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == self.IN_PROGRESS,
+            IdempotencyKey.claim_token == token,
+        )
+
+    def renew(self, connection: Connection, user_id: int, key: str, token: str) -> bool:
+        """
+        Extend a held claim by lock_seconds from now.
+
+        Args:
+            connection (Connection): Connection to run the update on; the caller commits.
+            user_id (int): The current user's ID.
+            key (str): The claimed Idempotency-Key.
+            token (str): The claim token returned by begin().
+        Returns:
+            bool: Whether the claim is still held.
+        """
+        result = connection.execute(
+            update(IdempotencyKey)
+            .where(*self._held(user_id, key, token))
+            .values(locked_until=datetime.now(timezone.utc) + self.lock)
+        )
+        return bool(result.rowcount)
+
+    @contextmanager
+    def lease(self, user_id: int, key: str, token: str) -> Iterator[None]:
+        """
+        Keep a claim from being taken over while the request holding it runs, by renewing it
+        every third of lock_seconds from a background thread on a connection of its own.
+
+        Args:
+            user_id (int): The current user's ID.
+            key (str): The claimed Idempotency-Key.
+            token (str): The claim token returned by begin().
+        """
+        engine = db.engine
+        stop = threading.Event()
+
+        def renew_until_stopped() -> None:
+            while not stop.wait(self.lock.total_seconds() / 3):
+                try:
+                    with engine.begin() as connection:
+                        if not self.renew(connection, user_id, key, token):
+                            return
+                except Exception as e:
+                    logger.warning(f"Failed to renew idempotency key of user_id={user_id}: {str(e)}")
+
+        renewer = threading.Thread(target=renew_until_stopped, name='idempotency-lease', daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    def complete(self, user_id: int, key: str, token: str, status: int, mimetype: Optional[str], body: bytes) -> bool:
+        """
+        Store the response of a claimed key, to be replayed until it expires. Commits the session.
+        Nothing is stored if the claim was taken over meanwhile (the request outlived lock_seconds).
+
+        Args:
+            user_id (int): The current user's ID.
+            key (str): The claimed Idempotency-Key.
+            token (str): The claim token returned by begin().
+            status (int): The response's HTTP status code.
+            mimetype (str, optional): The response's mimetype.
+            body (bytes): The response body.
+        Returns:
+            bool: Whether the response was stored.
+        """
+        result = db.session.execute(
+            update(IdempotencyKey)
+            .where(*self._held(user_id, key, token))
+            .values(
+                status=self.COMPLETED,
+                response_status=status,
+                response_mimetype=mimetype,
+                response_body=body,
+                expires_at=datetime.now(timezone.utc) + self.ttl,
+            )
+        )
+        db.session.commit()
+        if not result.rowcount:
+            logger.warning(f"Idempotency key of user_id={user_id} was taken over before its response was stored")
+        return bool(result.rowcount)
+
+    def release(self, user_id: int, key: str, token: str) -> None:
+        """
+        Give up a claimed key without storing a response (the request failed), so a retry
+        runs the request again. Rolls back the failed request's work and commits the release.
+        A claim that was taken over meanwhile is left to its new holder.
+
+        Args:
+            user_id (int): The current user's ID.
+            key (str): The claimed Idempotency-Key.
+            token (str): The claim token returned by begin().
+        """
+        db.session.rollback()
+        db.session.execute(delete(IdempotencyKey).where(*self._held(user_id, key, token)))
+        db.session.commit()
+
+    def purge(self) -> int:
+        """
+        Delete expired keys. Commits the session.
+
+        Returns:
+            int: Number of keys deleted.
+        """
+        result = db.session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+        )
+        db.session.commit()
+        logger.info(f"Purged {result.rowcount} expired idempotency keys")
+        return result.rowcount
@@ -0,0 +1,173 @@
+import json
+import codecs
+import logging
+from typing import Any, BinaryIO, Iterator
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+# A decode error this close to the end of the buffer may be a token cut off by a read
+# (a number, literal or \\uXXXX escape); anything earlier is malformed input
+_TRUNCATION_WINDOW = 16
+_NUMBER_CHARS = '0123456789+-.eE'
+
+
+def _read_text(stream: BinaryIO, read_size: int) -> Iterator[str]:
+    """
+    Read a binary stream as UTF-8 text in chunks, without splitting multi-byte characters.
+
+    Args:
+        stream: Binary stream (e.g. request.stream).
+        read_size (int): Bytes per read.
+    Yields:
+        str: Decoded text chunks.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            return
+        text = decoder.decode(data)
+        if text:
+            yield text
+
+
+def iter_json_array(
+    stream: BinaryIO,
+    read_size: int = 64 * 1024,
+    max_element_size: int = 1024 * 1024,
+) -> Iterator[Any]:
+    """
+    Incrementally parse a top-level JSON array, yielding one element at a time.
+    Only the element being parsed is buffered, so memory does not grow with the array.
+
+    Args:
+        stream: Binary stream containing a JSON array.
+        read_size (int): Bytes per read.
+        max_element_size (int): Largest element accepted, in characters; bounds the buffer.
+    Yields:
+        Each array element.
+    Raises:
+        ValueError: If the body is not a well-formed JSON array (including a trailing comma or
+            anything but whitespace after it, as json.loads would reject) or an element is too large.
+    """
+    chunks = _read_text(stream, read_size)
+    buffer = ''
+    pos = 0
+    started = False
+    expect_value = True
+    after_comma = False
+
+    def fill(min_size: int = 0) -> bool:
+        # Read at least one chunk, and on until min_size characters are buffered
+        nonlocal buffer, pos
+        parts = [buffer[pos:]]
+        size = len(parts[0])
+        for text in chunks:
+            parts.append(text)
+            size += len(text)
+            if size >= min_size or size > max_element_size:
+                break
+        if len(parts) == 1:
+            return False
+        buffer = ''.join(parts)
+        pos = 0
+        return True
+
+    def too_large() -> ValueError:
+        return ValueError(f'JSON array element is larger than {max_element_size} characters')
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buffer):
+            if not fill():
+                raise ValueError('Unexpected end of JSON array')
+            continue
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise ValueError('Request body must be a JSON array')
+            started = True
+            pos += 1
+        elif char == ']':
+            if after_comma:
+                raise ValueError('Trailing comma in JSON array')
+            pos += 1
+            # Like json.loads, accept nothing but whitespace after the array
+            while True:
+                if buffer[pos:].strip(_WHITESPACE):
+                    raise ValueError('Unexpected data after JSON array')
+                pos = len(buffer)
+                if not fill():
+                    return
+        elif char == ',' and not expect_value:
+            expect_value = after_comma = True
+            pos += 1
+        elif expect_value:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                pending = len(buffer) - pos
+                truncated = e.msg.startswith('Unterminated string') or len(buffer) - e.pos <= _TRUNCATION_WINDOW
+                if truncated and pending > max_element_size:
+                    raise too_large()
+                # Read ahead geometrically, so a large element is re-parsed O(log n) times
+                if not truncated or not fill(2 * pending):
+                    raise ValueError(f'Malformed JSON array element: {e.msg}')
+                continue
+            if end - pos > max_element_size:
+                raise too_large()
+            if not isinstance(value, (dict, list, str)) and not buffer[end:].strip(_NUMBER_CHARS):
+                # A bare number or literal may continue in the next read (e.g. '-0.' + '25')
+                if fill():
+                    continue
+            pos = end
+            expect_value = after_comma = False
+            yield value
+        else:
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+
+
+def iter_ndjson(
+    stream: BinaryIO,
+    read_size: int = 64 * 1024,
+    max_element_size: int = 1024 * 1024,
+) -> Iterator[Any]:
+    """
+    Parse newline-delimited JSON, yielding one value per non-blank line.
+
+    Args:
+        stream: Binary stream of NDJSON.
+        read_size (int): Bytes per read.
+        max_element_size (int): Longest line accepted, in characters; bounds the buffer.
+    Yields:
+        Each decoded line.
+    Raises:
+        ValueError: If a line is not valid JSON or is too long.
+    """
+    pending = ''
+    line_number = 0
+    for text in _read_text(stream, read_size):
+        pending += text
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            line_number += 1
+            if len(line) > max_element_size:
+                raise ValueError(f'NDJSON line {line_number} is longer than {max_element_size} characters')
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f'Malformed NDJSON on line {line_number}: {e.msg}')
+        if len(pending) > max_element_size:
+            raise ValueError(f'NDJSON line {line_number + 1} is longer than {max_element_size} characters')
+    if pending.strip():
+        try:
+            yield json.loads(pending)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Malformed NDJSON on line {line_number + 1}: {e.msg}')
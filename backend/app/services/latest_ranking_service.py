@@ -0,0 +1,141 @@
+import logging
+from typing import Callable, List, Optional, Set
+
+from sqlalchemy import and_, func, or_, select, update
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking
+
+logger = logging.getLogger(__name__)
+
+
+class LatestRankingService:
+    """
+    Maintains the denormalized MediaItem.latest_ranking_id / ai_status pointers, so galleries
+    can show each item's current score with a single join on media_rankings' primary key.
+    An item points at its completed ranking from the most recently completed session;
+    items whose only rankings failed get ai_status 'failed'.
+    """
+
+    @staticmethod
+    def apply_sessions(*ranking_session_ids: int) -> Set[int]:
+        """
+        Point every item ranked in the given (just completed) sessions at its new ranking,
+        with one UPDATE ... FROM per outcome. Does not commit.
+
+        Args:
+            *ranking_session_ids (int): The completed sessions.
+        Returns:
+            set: IDs of the users whose items changed.
+        """
+        ids = {int(session_id) for session_id in ranking_session_ids}
+        if not ids:
+            return set()
+        completed = db.session.execute(
+            update(MediaItem)
+            .where(
+                MediaItem.id == MediaRanking.media_item_id,
+                MediaRanking.ranking_session_id.in_(ids),
+                MediaRanking.status == 'completed',
+            )
+            .values(latest_ranking_id=MediaRanking.id, ai_status='analyzed')
+            .returning(MediaItem.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        failed = db.session.execute(
+            update(MediaItem)
+            .where(
+                MediaItem.id == MediaRanking.media_item_id,
+                MediaRanking.ranking_session_id.in_(ids),
+                MediaRanking.status == 'failed',
+                MediaItem.latest_ranking_id.is_(None),
+            )
+            .values(ai_status='failed')
+            .returning(MediaItem.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        logger.info(f"Updated latest rankings of {len(completed)} items ({len(failed)} failed) for sessions {sorted(ids)}")
+        return set(completed) | set(failed)
+
+    @staticmethod
+    def backfill_range(first_id: int, last_id: int) -> List[int]:
+        """
+        Recompute the pointers of media items with IDs in [first_id, last_id]. Does not commit.
+
+        Args:
+            first_id (int): Lowest media item ID in the range.
+            last_id (int): Highest media item ID in the range.
+        Returns:
+            list: The owning user ID of each media item whose pointers changed.
+        """
+        latest = select(
+            MediaRanking.id,
+            MediaRanking.media_item_id,
+            func.row_number().over(
+                partition_by=MediaRanking.media_item_id,
+                order_by=(RankingSession.completed_at.desc(), MediaRanking.id.desc()),
+            ).label('position'),
+        ).join(
+            RankingSession, RankingSession.id == MediaRanking.ranking_session_id
+        ).where(
+            MediaRanking.media_item_id.between(first_id, last_id),
+            MediaRanking.status == 'completed',
+            RankingSession.completed_at.isnot(None),
+        ).subquery()
+        completed = db.session.execute(
+            update(MediaItem)
+            .where(
+                MediaItem.id == latest.c.media_item_id,
+                latest.c.position == 1,
+                or_(
+                    MediaItem.latest_ranking_id.is_distinct_from(latest.c.id),
+                    MediaItem.ai_status.is_distinct_from('analyzed'),
+                ),
+            )
+            .values(latest_ranking_id=latest.c.id, ai_status='analyzed')
+            .returning(MediaItem.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        failed = db.session.execute(
+            update(MediaItem)
+            .where(
+                MediaItem.id.between(first_id, last_id),
+                MediaItem.latest_ranking_id.is_(None),
+                MediaItem.ai_status.is_distinct_from('failed'),
+                select(MediaRanking.id).where(
+                    and_(MediaRanking.media_item_id == MediaItem.id, MediaRanking.status == 'failed')
+                ).exists(),
+            )
+            .values(ai_status='failed')
+            .returning(MediaItem.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        return list(completed) + list(failed)
+
+    def backfill(self, batch_size: int = 5000, report: Optional[Callable[[str], None]] = None) -> int:
+        """
+        Recompute the pointers of all media items in primary-key batches, committing after each.
+
+        Args:
+            batch_size (int): Media items per batch and commit.
+            report (callable, optional): Receives a progress line after each batch.
+        Returns:
+            int: Number of media items whose pointers changed.
+        """
+        batch_size = max(1, batch_size)
+        cursor = 0
+        changed = 0
+        while True:
+            ids = db.session.scalars(
+                select(MediaItem.id).where(MediaItem.id > cursor).order_by(MediaItem.id).limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            user_ids = self.backfill_range(ids[0], ids[-1])
+            User.bump_data_version(*user_ids)
+            db.session.commit()
+            cursor = ids[-1]
+            changed += len(user_ids)
+            if report:
+                report(f"Backfilled media items up to {cursor}: {changed} updated")
+        logger.info(f"Backfilled latest rankings up to media item {cursor}")
+        return changed
@@ -0,0 +1,192 @@
+import math
+import logging
+from collections import Counter
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking, LibraryStat
+
+logger = logging.getLogger(__name__)
+
+SCORE_BUCKETS = 10  # Unit-wide buckets [0, 1) ... [9, 10]; a score of 10 falls in the last one
+
+
+def item_stat_names(is_deleted: bool, ai_status: Optional[str], ranked: bool) -> List[str]:
+    """Counters a media item contributes to (mirrors STAT_SOURCES['media_items'])."""
+    if is_deleted:
+        return ['items.deleted']
+    return ['items.live', f"items.ai_status.{ai_status or 'none'}", 'items.ranked' if ranked else 'items.unranked']
+
+
+def session_stat_names(status: Optional[str]) -> List[str]:
+    """Counters a ranking session contributes to (mirrors STAT_SOURCES['ranking_sessions'])."""
+    return [f"sessions.status.{status or 'none'}"]
+
+
+def ranking_stat_names(status: Optional[str], combined_score: Optional[Decimal]) -> List[str]:
+    """Counters a media ranking contributes to (mirrors STAT_SOURCES['media_rankings'])."""
+    names = [f"rankings.status.{status or 'none'}"]
+    if status == 'completed' and combined_score is not None:
+        names.append(f'scores.{min(max(math.floor(combined_score), 0), SCORE_BUCKETS - 1)}')
+    return names
+
+
+class LibraryStatsService:
+    """
+    Per-user library statistics for the dashboard: item counts by ai_status, ranked vs unranked
+    items, sessions and rankings by status, and a histogram of completed ranking scores.
+    On Postgres they are read from the library_stats counters, which triggers keep in step with
+    every write (see app.models.library_stat), so a dashboard load never scans the user's media.
+    Elsewhere they are computed from the source tables on each call.
+    """
+
+    @staticmethod
+    def compute_counters(user_id: int) -> Dict[str, int]:
+        """
+        Count a user's statistics from the source tables.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            dict: Counter name -> count, without zero counts.
+        """
+        counters: Counter = Counter()
+        items = db.session.execute(
+            select(MediaItem.is_deleted, MediaItem.ai_status, MediaItem.latest_ranking_id.isnot(None), func.count())
+            .where(MediaItem.user_id == user_id)
+            .group_by(MediaItem.is_deleted, MediaItem.ai_status, MediaItem.latest_ranking_id.isnot(None))
+        )
+        for is_deleted, ai_status, ranked, count in items:
+            for name in item_stat_names(is_deleted, ai_status, ranked):
+                counters[name] += count
+        sessions = db.session.execute(
+            select(RankingSession.status, func.count())
+            .where(RankingSession.user_id == user_id)
+            .group_by(RankingSession.status)
+        )
+        for status, count in sessions:
+            for name in session_stat_names(status):
+                counters[name] += count
+        # Grouping by the score itself keeps the bucketing in one place (ranking_stat_names)
+        rankings = db.session.execute(
+            select(MediaRanking.status, MediaRanking.combined_score, func.count())
+            .where(MediaRanking.user_id == user_id)
+            .group_by(MediaRanking.status, MediaRanking.combined_score)
+        )
+        for status, combined_score, count in rankings:
+            for name in ranking_stat_names(status, combined_score):
+                counters[name] += count
+        return {name: count for name, count in counters.items() if count}
+
+    def counters(self, user_id: int) -> Dict[str, int]:
+        """
+        Get a user's counters: the maintained library_stats rows on Postgres, computed elsewhere.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            dict: Counter name -> count, without zero counts.
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return self.compute_counters(user_id)
+        rows = db.session.execute(
+            select(LibraryStat.name, LibraryStat.count).where(LibraryStat.user_id == user_id, LibraryStat.count != 0)
+        )
+        return {name: count for name, count in rows}
+
+    def summary(self, user_id: int) -> Dict[str, Any]:
+        """
+        Get a user's library statistics.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            dict: 'items' (live, deleted, ranked, unranked, by_ai_status), 'sessions' and
+            'rankings' (total, by_status) and 'score_histogram' ([{'min', 'max', 'count'}, ...]).
+        """
+        counters = self.counters(user_id)
+
+        def by_prefix(prefix: str) -> Dict[str, int]:
+            return {name[len(prefix):]: count for name, count in sorted(counters.items()) if name.startswith(prefix)}
+
+        sessions = by_prefix('sessions.status.')
+        rankings = by_prefix('rankings.status.')
+        return {
+            'items': {
+                'live': counters.get('items.live', 0),
+                'deleted': counters.get('items.deleted', 0),
+                'ranked': counters.get('items.ranked', 0),
+                'unranked': counters.get('items.unranked', 0),
+                'by_ai_status': by_prefix('items.ai_status.'),
+            },
+            'sessions': {'total': sum(sessions.values()), 'by_status': sessions},
+            'rankings': {'total': sum(rankings.values()), 'by_status': rankings},
+            'score_histogram': [
+                {'min': bucket, 'max': bucket + 1, 'count': counters.get(f'scores.{bucket}', 0)}
+                for bucket in range(SCORE_BUCKETS)
+            ],
+        }
+
+    def reconcile_user(self, user_id: int) -> int:
+        """
+        Rebuild a user's counters from the source tables. Does not commit; the caller should
+        commit promptly, since the user's writes wait on the lock taken here until then.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            int: Number of counters that had drifted and were corrected. The user's data_version
+            is bumped when any were.
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            # Counters are only maintained on Postgres
+            return 0
+        # Waits for in-flight writes to this user's media to commit and holds off new ones (the
+        # triggers take the same lock, shared), so the recount and the rewrite see the same data
+        db.session.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f'library_stats.{user_id}', 0))))
+        expected = self.compute_counters(user_id)
+        stored = self.counters(user_id)
+        drifted = {name for name in set(expected) | set(stored) if expected.get(name, 0) != stored.get(name, 0)}
+        if not drifted:
+            return 0
+        logger.warning(f"Library stats of user_id={user_id} drifted: " + ', '.join(
+            f"{name} {stored.get(name, 0)} -> {expected.get(name, 0)}" for name in sorted(drifted)
+        ))
+        db.session.execute(delete(LibraryStat).where(LibraryStat.user_id == user_id))
+        if expected:
+            db.session.execute(pg_insert(LibraryStat), [
+                {'user_id': user_id, 'name': name, 'count': count} for name, count in sorted(expected.items())
+            ])
+        # The stats endpoint is served with user-data ETags; clients must not keep the old numbers
+        User.bump_data_version(user_id)
+        return len(drifted)
+
+    def reconcile(
+        self,
+        user_ids: Optional[Sequence[int]] = None,
+        report: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, int]:
+        """
+        Rebuild the counters of the given users, or of every user, committing after each user
+        so no lock is held for long.
+
+        Args:
+            user_ids (sequence, optional): Users to reconcile; all users when None.
+            report (callable, optional): Receives a line for each user whose counters drifted.
+        Returns:
+            dict: 'users' checked and 'corrected' counters.
+        """
+        if user_ids is None:
+            user_ids = db.session.scalars(select(User.id).order_by(User.id)).all()
+        corrected = 0
+        for user_id in user_ids:
+            fixed = self.reconcile_user(user_id)
+            db.session.commit()
+            corrected += fixed
+            if fixed and report:
+                report(f"Corrected {fixed} counters for user_id={user_id}")
+        logger.info(f"Reconciled library stats of {len(user_ids)} users: {corrected} counters corrected")
+        return {'users': len(user_ids), 'corrected': corrected}
@@ -6,9 +6,14 @@ import re
 import cohere
 import requests
 import base64
+import time
+import threading
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from app.config import Config
+from app.services.resilience import (
+    CallCancelledError, LatencyTracker, get_breaker, hedged_call, is_dependency_failure
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +34,45 @@ class LLMBasedRankingService:
         api_key = Config.COHERE_API_KEY
         if not api_key:
             raise ValueError("Please set COHERE_API_KEY in your .env file")
-        self.client = cohere.Client(api_key=api_key)
+        self.client = cohere.Client(api_key=api_key, timeout=Config.COHERE_TIMEOUT)
         self.model = model_name
+        self.cohere_breaker = get_breaker(
+            'cohere',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+            is_failure=is_dependency_failure,
+        )
+        self.download_breaker = get_breaker(
+            'image_download',
+            failure_threshold=Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+            is_failure=is_dependency_failure,
+        )
+        self.download_latency = LatencyTracker()
+
+    def _fetch_image(self, image_url: str, cancelled: threading.Event) -> bytes:
+        """
+        Download image bytes with a timeout, recording the duration of successful downloads.
+
+        Args:
+            image_url (str): The URL of the image to download.
+            cancelled (threading.Event): Set when a hedged copy of this download already succeeded.
+        Returns:
+            bytes: The image content.
+        Raises:
+            requests.RequestException: If the download fails or times out.
+            CallCancelledError: If the download was cancelled before it finished.
+        """
+        started = time.monotonic()
+        with requests.get(image_url, timeout=Config.IMAGE_DOWNLOAD_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if cancelled.is_set():
+                    raise CallCancelledError(f"Download of {image_url} cancelled")
+                chunks.append(chunk)
+        self.download_latency.record(time.monotonic() - started)
+        return b''.join(chunks)
 
     def _download_and_encode_image(self, image_url: str) -> str:
         """
@@ -44,9 +86,14 @@ class LLMBasedRankingService:
             Exception: If the image cannot be downloaded or encoded.
         """
         try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            image_data = response.content
+            # Slow downloads past the recent p95 get a second, hedged request
+            hedge_after = self.download_latency.percentile(Config.IMAGE_HEDGE_PERCENTILE)
+            image_data = self.download_breaker.call(
+                hedged_call,
+                lambda cancelled: self._fetch_image(image_url, cancelled),
+                hedge_after,
+                self.download_breaker,
+            )
             base64_image = base64.b64encode(image_data).decode('utf-8')
             return f"data:image/jpeg;base64,{base64_image}"
         except Exception as e:
@@ -188,14 +235,51 @@ Respond **only** with valid JSON, for example:
         Raises:
             Exception: If the LLM response cannot be parsed as JSON.
         """
+        return self.score_item(item)['scores']
+
+    def score_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score an image and report the cost of the call alongside the scores.
+
+        Args:
+            item (dict): The image item with metadata.
+        Returns:
+            dict: 'scores' plus 'latency_ms', 'input_tokens', 'output_tokens' and 'image_bytes'.
+        Raises:
+            Exception: If the LLM response cannot be parsed as JSON.
+        """
+        started = time.monotonic()
         image_url = self._get_best_quality_url(item['baseUrl'])
         messages = self._build_messages(image_url, item['description'], item['mediaMetadata'])
-        response = self.client.chat(
+        image_uri = messages[1]['content'][1]['image_url']['url']
+        response = self.cohere_breaker.call(
+            self.client.chat,
             model=self.model,
             messages=messages,
             max_tokens=500
         )
+        latency_ms = int((time.monotonic() - started) * 1000)
+        input_tokens, output_tokens = self._token_usage(response)
         content = response.message.content[0].text
+        return {
+            'scores': self._parse_scores(content),
+            'latency_ms': latency_ms,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'image_bytes': len(image_uri.split(',', 1)[-1]) * 3 // 4,
+        }
+
+    def _parse_scores(self, content: str) -> Dict[str, float]:
+        """
+        Parse the JSON scores out of the LLM response text.
+
+        Args:
+            content (str): The raw LLM response text.
+        Returns:
+            dict: The parsed scores.
+        Raises:
+            json.JSONDecodeError: If no JSON object can be parsed.
+        """
         try:
             return json.loads(content)
         except json.JSONDecodeError:
@@ -205,6 +289,70 @@ Respond **only** with valid JSON, for example:
             logger.error("Failed to parse LLM response as JSON.")
             raise
 
+    @staticmethod
+    def _token_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Extract billed input/output token counts from a Cohere chat response.
+
+        Args:
+            response: The Cohere chat response.
+        Returns:
+            tuple: (input_tokens, output_tokens), None where the response does not report them.
+        """
+        usage = getattr(response, 'usage', None) or getattr(response, 'meta', None)
+        billed = getattr(usage, 'billed_units', None)
+        if billed is None and isinstance(usage, dict):
+            billed = usage.get('billed_units')
+        if billed is None:
+            return None, None
+        if isinstance(billed, dict):
+            return billed.get('input_tokens'), billed.get('output_tokens')
+        return getattr(billed, 'input_tokens', None), getattr(billed, 'output_tokens', None)
+
+    def build_item_payload(self, media_item: Any) -> Dict[str, Any]:
+        """
+        Build the item payload expected by rate_image from a stored MediaItem.
+
+        Args:
+            media_item (MediaItem): The stored media item.
+        Returns:
+            dict: The image item with baseUrl, description and mediaMetadata.
+        """
+        return {
+            'id': media_item.id,
+            'baseUrl': media_item.base_url,
+            'description': media_item.description or '',
+            'mediaMetadata': {
+                'filename': media_item.filename,
+                'mimeType': media_item.mime_type,
+                'creationTime': media_item.creation_time.isoformat() if media_item.creation_time else None,
+                'width': media_item.width,
+                'height': media_item.height,
+            }
+        }
+
+    @staticmethod
+    def scores_to_ranking_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map a score_item result onto MediaRanking column values.
+
+        Args:
+            result (dict): The result returned by score_item.
+        Returns:
+            dict: Score columns, llm_reasoning and the call metrics.
+        """
+        scores = result['scores']
+        return {
+            'technical_score': scores.get('technical'),
+            'aesthetic_score': scores.get('aesthetic'),
+            'combined_score': scores.get('overall', 0.0),
+            'llm_reasoning': scores,
+            'latency_ms': result.get('latency_ms'),
+            'input_tokens': result.get('input_tokens'),
+            'output_tokens': result.get('output_tokens'),
+            'image_bytes': result.get('image_bytes'),
+        }
+
     def rank_images(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Rank a list of images by their overall LLM score.
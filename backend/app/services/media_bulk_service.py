@@ -0,0 +1,119 @@
+import logging
+from typing import List, Sequence
+
+from sqlalchemy import BigInteger, Text, any_, bindparam, delete, func, insert, not_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.extensions import db
+from app.models import User, MediaItem, MediaItemTombstone
+from app.services.top_picks_service import TopPicksService
+
+logger = logging.getLogger(__name__)
+
+
+class MediaBulkService:
+    """
+    Applies one operation to many of a user's media items with a single set-based statement
+    (UPDATE/DELETE ... WHERE user_id = :user AND id = ANY(:ids)), instead of loading and
+    saving each item. Every operation counts only the rows it actually changed.
+    """
+
+    OPERATIONS = ('soft_delete', 'restore', 'hard_delete', 'add_tags', 'remove_tags')
+
+    def __init__(self, max_ids: int = 1000) -> None:
+        """
+        Initialize the bulk service.
+
+        Args:
+            max_ids (int): Largest number of media items per operation.
+        """
+        self.max_ids = max_ids
+
+    def apply(self, user_id: int, operation: str, media_item_ids: Sequence[int], tags: Sequence[str] = ()) -> int:
+        """
+        Apply an operation to the user's media items. Does not commit.
+
+        Args:
+            user_id (int): The owning user's ID; other users' items are never touched.
+            operation (str): One of OPERATIONS.
+            media_item_ids (sequence): The items to change; duplicates are ignored.
+            tags (sequence): Tags for add_tags/remove_tags.
+        Returns:
+            int: Number of items changed. Items that are missing, owned by someone else or
+            already in the requested state are not counted.
+        Raises:
+            ValueError: If the operation, IDs or tags are invalid.
+        """
+        if operation not in self.OPERATIONS:
+            raise ValueError(f"operation must be one of {', '.join(self.OPERATIONS)}")
+        ids = list(dict.fromkeys(media_item_ids))
+        if not ids:
+            raise ValueError('ids are required')
+        if len(ids) > self.max_ids:
+            raise ValueError(f'At most {self.max_ids} media items per bulk operation, got {len(ids)}')
+        tags = list(dict.fromkeys(tags))
+        if operation in ('add_tags', 'remove_tags') and not tags:
+            raise ValueError(f'{operation} needs tags')
+
+        # One array parameter, so the statement text does not depend on how many IDs are sent
+        owned = (
+            MediaItem.user_id == user_id,
+            MediaItem.id == any_(bindparam('ids', ids, type_=ARRAY(BigInteger))),
+        )
+        changed = getattr(self, f'_{operation}')(owned, tags)
+        if changed:
+            TopPicksService.invalidate(user_id)
+            User.bump_data_version(user_id)
+        logger.info(f"Bulk {operation} changed {len(changed)}/{len(ids)} media items for user_id={user_id}")
+        return len(changed)
+
+    @staticmethod
+    def _update(owned: tuple, *where: object, **values: object) -> List[int]:
+        return db.session.execute(
+            update(MediaItem)
+            .where(*owned, *where)
+            .values(**values)
+            .returning(MediaItem.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+    def _soft_delete(self, owned: tuple, tags: List[str]) -> List[int]:
+        return self._update(owned, MediaItem.is_deleted.is_(False), is_deleted=True)
+
+    def _restore(self, owned: tuple, tags: List[str]) -> List[int]:
+        return self._update(owned, MediaItem.is_deleted.is_(True), is_deleted=False)
+
+    @staticmethod
+    def _hard_delete(owned: tuple, tags: List[str]) -> List[int]:
+        # Rankings go with the items (ON DELETE CASCADE); tombstones tell the changes feed
+        deleted = db.session.execute(
+            delete(MediaItem).where(*owned)
+            .returning(MediaItem.id, MediaItem.user_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if deleted:
+            db.session.execute(insert(MediaItemTombstone), [
+                {'user_id': user_id, 'media_item_id': item_id} for item_id, user_id in deleted
+            ])
+        return [item_id for item_id, _ in deleted]
+
+    def _add_tags(self, owned: tuple, tags: List[str]) -> List[int]:
+        current = func.coalesce(MediaItem.tags_json, bindparam('no_tags', [], type_=ARRAY(Text)))
+        added = bindparam('tags', tags, type_=ARRAY(Text))
+        # Append the missing tags in request order: keep the first position of each tag
+        element = func.unnest(func.array_cat(current, added)).table_valued(
+            'tag', with_ordinality='position'
+        ).render_derived()
+        merged = func.array(
+            select(element.c.tag).group_by(element.c.tag).order_by(func.min(element.c.position)).scalar_subquery()
+        )
+        return self._update(owned, not_(current.contains(added)), tags_json=merged)
+
+    def _remove_tags(self, owned: tuple, tags: List[str]) -> List[int]:
+        removed = bindparam('tags', tags, type_=ARRAY(Text))
+        element = func.unnest(MediaItem.tags_json).table_valued(
+            'tag', with_ordinality='position'
+        ).render_derived()
+        remaining = func.array(
+            select(element.c.tag).where(element.c.tag != func.all(removed)).order_by(element.c.position).scalar_subquery()
+        )
+        return self._update(owned, MediaItem.tags_json.overlap(removed), tags_json=remaining)
@@ -0,0 +1,227 @@
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dateutil.parser import isoparse
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.extensions import db
+from app.models import MediaItem, User
+from app.services.top_picks_service import TopPicksService
+
+logger = logging.getLogger(__name__)
+
+# Columns overwritten when a picked item already exists for the user
+UPSERT_COLUMNS = (
+    'base_url', 'filename', 'mime_type', 'description', 'creation_time',
+    'width', 'height', 'duration', 'thumbnail_url',
+)
+
+
+class MediaIngestService:
+    """
+    Stores media item metadata from the Google Photos Picker using set-based upserts
+    keyed on (user_id, google_media_id).
+    """
+
+    def __init__(self, chunk_size: int = 1000) -> None:
+        """
+        Initialize the ingest service.
+
+        Args:
+            chunk_size (int): Rows per INSERT statement, keeping bind parameters under driver limits.
+        """
+        self.chunk_size = max(1, chunk_size)
+
+    @staticmethod
+    def _parse_time(value: Any) -> Optional[datetime]:
+        """
+        Parse an ISO-8601 creation time from the picker.
+
+        Args:
+            value: The raw value.
+        Returns:
+            datetime or None: The parsed timestamp, or None if missing or malformed.
+        """
+        if not value or isinstance(value, datetime):
+            return value or None
+        try:
+            return isoparse(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed creation_time: {value!r}")
+            return None
+
+    def normalize(self, user_id: int, item: Any) -> Optional[Dict[str, Any]]:
+        """
+        Map a picker item (snake_case or camelCase) to media_items column values.
+
+        Args:
+            user_id (int): The owning user's ID.
+            item (dict): The raw item from the request.
+        Returns:
+            dict or None: Column values, or None if google_media_id or base_url is missing.
+        """
+        if not isinstance(item, dict):
+            logger.warning(f"Skipping non-object media item: {item!r}")
+            return None
+        google_media_id = item.get('google_media_id') or item.get('id')
+        base_url = item.get('base_url') or item.get('baseUrl')
+        if not google_media_id or not base_url:
+            logger.warning(f"Missing google_media_id or base_url in item: {item}")
+            return None
+        return {
+            'user_id': user_id,
+            'google_media_id': str(google_media_id),
+            'base_url': base_url,
+            'filename': item.get('filename'),
+            'mime_type': item.get('mime_type') or item.get('mimeType'),
+            'description': item.get('description', ''),
+            'creation_time': self._parse_time(item.get('creation_time') or item.get('creationTime')),
+            'width': item.get('width'),
+            'height': item.get('height'),
+            'duration': item.get('duration'),
+            'thumbnail_url': item.get('thumbnail_url') or item.get('thumbnailUrl'),
+        }
+
+    def upsert(self, user_id: int, items: Iterable[Any]) -> List[MediaItem]:
+        """
+        Insert or update the given picker items for a user. Does not commit.
+
+        Args:
+            user_id (int): The owning user's ID.
+            items (iterable): Raw picker items.
+        Returns:
+            list: The stored MediaItem objects in request order (one per distinct google_media_id).
+        """
+        rows: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            row = self.normalize(user_id, item)
+            if row:
+                # Last occurrence wins, first occurrence keeps its position
+                rows[row['google_media_id']] = row
+        values = list(rows.values())
+        stored: Dict[str, MediaItem] = {}
+        for start in range(0, len(values), self.chunk_size):
+            for media_item in self._upsert_chunk(values[start:start + self.chunk_size]):
+                stored[media_item.google_media_id] = media_item
+        if stored:
+            # Top picks embed base_url and skip deleted items, so they must be recomputed
+            TopPicksService.invalidate(user_id)
+            User.bump_data_version(user_id)
+        logger.info(f"Upserted {len(stored)} media items for user_id={user_id}")
+        return [stored[google_media_id] for google_media_id in rows if google_media_id in stored]
+
+    def upsert_stream(self, user_id: int, items: Iterable[Any], chunk_size: int) -> Iterator[Dict[str, Any]]:
+        """
+        Upsert items from an iterator in fixed-size chunks, committing each chunk separately.
+        A failing chunk is rolled back and reported without affecting the others, and the
+        session is cleared after every chunk so memory stays flat however long the input is.
+
+        Args:
+            user_id (int): The owning user's ID.
+            items (iterable): Raw picker items, typically parsed lazily from the request body.
+            chunk_size (int): Items per chunk and commit.
+        Yields:
+            dict: One result per chunk, then a final summary with 'done': True.
+        """
+        items = iter(items)
+        chunk_number = 0
+        stored_total = 0
+        failed_chunks = 0
+        while True:
+            try:
+                chunk = list(islice(items, max(1, chunk_size)))
+            except ValueError as e:
+                # The body stopped parsing: earlier chunks stay committed, but the items already
+                # read into this unfinished chunk are dropped along with it
+                logger.warning(f"Stopped streaming media items for user_id={user_id}: {str(e)}")
+                yield {'error': str(e), 'done': True, 'stored': stored_total, 'failed_chunks': failed_chunks}
+                return
+            if not chunk:
+                break
+            chunk_number += 1
+            try:
+                stored = self.upsert(user_id, chunk)
+                results = [media_item.to_dict() for media_item in stored]
+                db.session.commit()
+                stored_total += len(results)
+                yield {
+                    'chunk': chunk_number,
+                    'received': len(chunk),
+                    'stored': len(results),
+                    'skipped': len(chunk) - len(results),
+                    'items': results,
+                }
+            except Exception as e:
+                db.session.rollback()
+                failed_chunks += 1
+                logger.error(f"Failed to store media item chunk {chunk_number} for user_id={user_id}: {str(e)}", exc_info=True)
+                yield {'chunk': chunk_number, 'received': len(chunk), 'stored': 0, 'error': str(e)}
+            finally:
+                db.session.expunge_all()
+        yield {'done': True, 'stored': stored_total, 'failed_chunks': failed_chunks}
+
+    def _upsert_chunk(self, chunk: List[Dict[str, Any]]) -> List[MediaItem]:
+        """
+        Upsert one chunk with a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+        Args:
+            chunk (list): Column values for distinct google_media_ids.
+        Returns:
+            list: The inserted or updated MediaItem objects.
+        """
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            insert_fn = pg_insert
+        elif dialect == 'sqlite':
+            insert_fn = sqlite_insert
+        else:
+            return self._upsert_chunk_portable(chunk)
+        # Passing the rows as parameters lets SQLAlchemy reuse the cached statement and render
+        # them into one multi-row INSERT ... ON CONFLICT ... RETURNING (insertmanyvalues)
+        stmt = insert_fn(MediaItem)
+        update_columns = {column: getattr(stmt.excluded, column) for column in UPSERT_COLUMNS}
+        update_columns['last_synced_at'] = func.now()
+        update_columns['updated_at'] = func.now()
+        # Picking a deleted item again restores it
+        update_columns['is_deleted'] = False
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaItem.user_id, MediaItem.google_media_id],
+            set_=update_columns,
+        ).returning(MediaItem)
+        return db.session.scalars(stmt, chunk, execution_options={'populate_existing': True}).all()
+
+    def _upsert_chunk_portable(self, chunk: List[Dict[str, Any]]) -> List[MediaItem]:
+        """
+        Upsert one chunk on databases without ON CONFLICT: one IN query for existing rows,
+        then a single flush of the updates and inserts.
+
+        Args:
+            chunk (list): Column values for distinct google_media_ids.
+        Returns:
+            list: The inserted or updated MediaItem objects.
+        """
+        user_id = chunk[0]['user_id']
+        existing = {
+            media_item.google_media_id: media_item
+            for media_item in db.session.scalars(select(MediaItem).where(
+                MediaItem.user_id == user_id,
+                MediaItem.google_media_id.in_([row['google_media_id'] for row in chunk])
+            ))
+        }
+        stored = []
+        for row in chunk:
+            media_item = existing.get(row['google_media_id'])
+            if media_item:
+                for column in UPSERT_COLUMNS:
+                    setattr(media_item, column, row[column])
+                media_item.last_synced_at = datetime.utcnow()
+                media_item.is_deleted = False
+            else:
+                media_item = MediaItem(**row)
+                db.session.add(media_item)
+            stored.append(media_item)
+        db.session.flush()
+        return stored
@@ -0,0 +1,205 @@
+import re
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Float, and_, case, cast, func, or_, select, tuple_
+from app.extensions import db
+from app.models import MediaItem, MediaRanking
+from app.models.media_item import SEARCH_CONFIG, search_vector
+from app.services.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+# Position of (score, id) of the last result on a page
+Position = Tuple[float, int]
+
+# Score added when a query word is one of the item's tags
+TAG_MATCH_SCORE = 1.0
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Split text into lowercase words the same way search_vector does: anything that is not
+    a letter or digit separates words.
+
+    Args:
+        text (str, optional): The text.
+    Returns:
+        list: The words, in order, with repeats.
+    """
+    return _WORD.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    In-process word -> media item index over one user's library, used to search when the
+    database is not Postgres. Scores are term frequencies rather than ts_rank, so the order
+    of results can differ from Postgres, but the same items match.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Sequence[str], Sequence[str]]]) -> None:
+        """
+        Build the index.
+
+        Args:
+            rows (iterable): (id, filename, description, item tags, latest ranking tags) per live media item.
+        """
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.lengths: Dict[int, int] = {}
+        self.item_tags: Dict[int, Set[str]] = {}
+        self.ranking_tags: Dict[int, Set[str]] = {}
+        for item_id, filename, description, item_tags, ranking_tags in rows:
+            words = tokenize(filename) + tokenize(description)
+            for word in words:
+                self.postings[word][item_id] = self.postings[word].get(item_id, 0) + 1
+            self.lengths[item_id] = len(words)
+            self.item_tags[item_id] = set(item_tags or ())
+            self.ranking_tags[item_id] = set(ranking_tags or ())
+
+    def search(self, words: List[str], tags: List[str]) -> Dict[int, float]:
+        """
+        Score the items matching a query, with the same rules as the Postgres search.
+
+        Args:
+            words (list): Query words; an item matches if its text has all of them or a tag equals one of them.
+            tags (list): Tags the item itself or its latest ranking must all have.
+        Returns:
+            dict: media item ID -> score.
+        """
+        candidates = set(self.lengths)
+        if tags:
+            wanted = set(tags)
+            candidates = {
+                item_id for item_id in candidates
+                if wanted <= self.item_tags[item_id] or wanted <= self.ranking_tags[item_id]
+            }
+        if not words:
+            return {item_id: 0.0 for item_id in candidates}
+        scores = {}
+        for item_id in candidates:
+            score = 0.0
+            if all(item_id in self.postings.get(word, ()) for word in words):
+                hits = sum(self.postings[word][item_id] for word in words)
+                score = hits / (1 + self.lengths[item_id])
+            if not set(words).isdisjoint(self.item_tags[item_id] | self.ranking_tags[item_id]):
+                score += TAG_MATCH_SCORE
+            elif score == 0.0:
+                continue
+            scores[item_id] = score
+        return scores
+
+
+class MediaSearchService:
+    """
+    Ranked, keyset-paginated search over a user's live media items by filename/description
+    words and by tags (the item's own or its latest ranking's). On Postgres it runs against
+    the GIN indexes idx_media_items_search, idx_media_items_tags and idx_media_rankings_tags;
+    elsewhere it falls back to an InvertedIndex held in a VersionedCache.
+    """
+
+    def __init__(self, cache_size: int = 32) -> None:
+        """
+        Initialize the search service.
+
+        Args:
+            cache_size (int): Number of per-user inverted indexes kept by the fallback.
+        """
+        self._indexes = VersionedCache(cache_size)
+
+    def search(
+        self,
+        user_id: int,
+        query: Optional[str],
+        tags: List[str],
+        limit: int,
+        after: Optional[Position] = None,
+    ) -> Tuple[List[Tuple[int, float]], Optional[Position]]:
+        """
+        Find one page of matching media items, best first.
+
+        Args:
+            user_id (int): The user's ID.
+            query (str, optional): Free text; every word must appear in the filename or description,
+                or one of the words must be one of the item's tags.
+            tags (list): Tags the item itself or its latest ranking must all have.
+            limit (int): Page size.
+            after (tuple, optional): (score, id) of the last result already delivered.
+        Returns:
+            tuple: ([(media item ID, score), ...], position of the last result or None on the last page).
+        Raises:
+            ValueError: If neither words nor tags are given.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words and not tags:
+            raise ValueError('Search needs q or tags')
+        if db.session.get_bind().dialect.name == 'postgresql':
+            results = self._search_postgres(user_id, words, tags, limit + 1, after)
+        else:
+            results = self._search_in_process(user_id, words, tags, limit + 1, after)
+        position = None
+        if len(results) > limit:
+            results = results[:limit]
+            position = results[-1][1], results[-1][0]
+        logger.info(f"Search for user_id={user_id} words={words} tags={tags}: {len(results)} results")
+        return results, position
+
+    @staticmethod
+    def _search_postgres(
+        user_id: int, words: List[str], tags: List[str], limit: int, after: Optional[Position]
+    ) -> List[Tuple[int, float]]:
+        latest_tags = select(MediaRanking.id)
+        matches = []
+        score = cast(0.0, Float)
+        if words:
+            ts_query = func.to_tsquery(SEARCH_CONFIG, ' & '.join(words))
+            vector = search_vector(MediaItem.filename, MediaItem.description)
+            tag_hit = or_(
+                MediaItem.tags_json.overlap(words),
+                MediaItem.latest_ranking_id.in_(latest_tags.where(MediaRanking.tags_json.overlap(words))),
+            )
+            matches.append(or_(vector.op('@@')(ts_query), tag_hit))
+            score = cast(func.ts_rank(vector, ts_query), Float) + case((tag_hit, TAG_MATCH_SCORE), else_=0.0)
+        if tags:
+            matches.append(or_(
+                MediaItem.tags_json.contains(tags),
+                MediaItem.latest_ranking_id.in_(latest_tags.where(MediaRanking.tags_json.contains(tags))),
+            ))
+        if after:
+            matches.append(tuple_(score, MediaItem.id) < tuple(after))
+        rows = db.session.execute(
+            select(MediaItem.id, score)
+            .where(MediaItem.user_id == user_id, MediaItem.is_deleted.is_(False), and_(*matches))
+            .order_by(score.desc(), MediaItem.id.desc())
+            .limit(limit)
+        ).all()
+        return [(item_id, float(item_score)) for item_id, item_score in rows]
+
+    def _index(self, user_id: int) -> InvertedIndex:
+        """
+        Get the user's inverted index, rebuilding it when their data_version has moved on.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            InvertedIndex: The index of the user's live media items.
+        """
+        def build() -> InvertedIndex:
+            rows = db.session.execute(
+                select(MediaItem.id, MediaItem.filename, MediaItem.description, MediaItem.tags_json, MediaRanking.tags_json)
+                .outerjoin(MediaRanking, MediaRanking.id == MediaItem.latest_ranking_id)
+                .where(MediaItem.user_id == user_id, MediaItem.is_deleted.is_(False))
+            ).all()
+            return InvertedIndex(rows)
+        return self._indexes.get(user_id, 'inverted_index', build)
+
+    def _search_in_process(
+        self, user_id: int, words: List[str], tags: List[str], limit: int, after: Optional[Position]
+    ) -> List[Tuple[int, float]]:
+        scores = self._index(user_id).search(words, tags)
+        results = sorted(scores.items(), key=lambda result: (result[1], result[0]), reverse=True)
+        if after:
+            results = [(item_id, score) for item_id, score in results if (score, item_id) < tuple(after)]
+        return results[:limit]
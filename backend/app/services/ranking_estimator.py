@@ -0,0 +1,174 @@
+import math
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from app.extensions import db
+from app.models import MediaItem, RankingSession, MediaRanking
+
+logger = logging.getLogger(__name__)
+
+
+class RankingEstimator:
+    """
+    Estimates the LLM calls, download volume, wall time and token cost of a prospective
+    ranking session from a rolling window of past ranking calls.
+    """
+
+    # Used until enough history has been recorded
+    DEFAULT_LATENCY_MS = 4000.0
+    DEFAULT_INPUT_TOKENS = 1500.0
+    DEFAULT_OUTPUT_TOKENS = 150.0
+    DEFAULT_IMAGE_BYTES = 3_000_000.0
+
+    def __init__(
+        self,
+        concurrency: int,
+        rate_limit: Optional[float],
+        max_items: int,
+        window: int = 500,
+        input_token_cost: float = 0.0,
+        output_token_cost: float = 0.0,
+    ) -> None:
+        """
+        Initialize the estimator.
+
+        Args:
+            concurrency (int): Parallel LLM calls a ranking runs with.
+            rate_limit (float, optional): Max LLM calls per second.
+            max_items (int): Largest session accepted in one job.
+            window (int): Number of most recent calls the statistics are computed over.
+            input_token_cost (float): USD per 1M input tokens.
+            output_token_cost (float): USD per 1M output tokens.
+        """
+        self.concurrency = max(1, concurrency)
+        self.rate_limit = rate_limit
+        self.max_items = max_items
+        self.window = window
+        self.input_token_cost = input_token_cost
+        self.output_token_cost = output_token_cost
+
+    def call_statistics(self) -> Dict[str, Any]:
+        """
+        Compute per-call latency, token and download statistics over the recent window.
+
+        Returns:
+            dict: Sample count and averages, falling back to defaults without history.
+        """
+        recent = select(
+            MediaRanking.latency_ms,
+            MediaRanking.input_tokens,
+            MediaRanking.output_tokens,
+            MediaRanking.image_bytes,
+        ).where(
+            MediaRanking.latency_ms.isnot(None)
+        ).order_by(MediaRanking.analyzed_at.desc().nulls_last()).limit(self.window).subquery()
+        row = db.session.execute(select(
+            func.count(),
+            func.avg(recent.c.latency_ms),
+            func.percentile_cont(0.95).within_group(recent.c.latency_ms),
+            func.avg(recent.c.input_tokens),
+            func.avg(recent.c.output_tokens),
+            func.avg(recent.c.image_bytes),
+        )).one()
+        samples, avg_latency, p95_latency, avg_input, avg_output, avg_bytes = row
+        return {
+            'samples': samples,
+            'avg_latency_ms': float(avg_latency) if avg_latency is not None else self.DEFAULT_LATENCY_MS,
+            'p95_latency_ms': float(p95_latency) if p95_latency is not None else self.DEFAULT_LATENCY_MS,
+            'avg_input_tokens': float(avg_input) if avg_input is not None else self.DEFAULT_INPUT_TOKENS,
+            'avg_output_tokens': float(avg_output) if avg_output is not None else self.DEFAULT_OUTPUT_TOKENS,
+            'avg_image_bytes': float(avg_bytes) if avg_bytes is not None else self.DEFAULT_IMAGE_BYTES,
+        }
+
+    def cached_item_ids(self, user_id: int, media_item_ids: List[int], analysis_type: str) -> List[int]:
+        """
+        Find the selected items that already have a completed score for this analysis type.
+
+        Args:
+            user_id (int): The owning user's ID.
+            media_item_ids (list): The selected media item IDs.
+            analysis_type (str): The analysis type the session would write.
+        Returns:
+            list: IDs whose existing score can be reused without an LLM call.
+        """
+        if not media_item_ids:
+            return []
+        rows = db.session.execute(
+            select(MediaRanking.media_item_id).distinct()
+            .join(RankingSession, RankingSession.id == MediaRanking.ranking_session_id)
+            .where(
+                RankingSession.user_id == user_id,
+                MediaRanking.media_item_id.in_(media_item_ids),
+                MediaRanking.analysis_type == analysis_type,
+                MediaRanking.status == 'completed',
+                MediaRanking.combined_score.isnot(None),
+            )
+        ).scalars().all()
+        return list(rows)
+
+    def split(self, item_count: int) -> List[int]:
+        """
+        Split an item count into job sizes no larger than max_items.
+
+        Args:
+            item_count (int): Number of items selected.
+        Returns:
+            list: Item counts of each suggested job.
+        """
+        if item_count <= self.max_items:
+            return [item_count]
+        full, rest = divmod(item_count, self.max_items)
+        return [self.max_items] * full + ([rest] if rest else [])
+
+    def estimate(self, user_id: int, media_item_ids: List[int], analysis_type: str) -> Dict[str, Any]:
+        """
+        Estimate the cost of ranking the given items.
+
+        Args:
+            user_id (int): The owning user's ID.
+            media_item_ids (list): The media item IDs the session would rank.
+            analysis_type (str): The analysis type the session would write.
+        Returns:
+            dict: The estimate, including whether the job fits in a single session.
+        """
+        requested = list(dict.fromkeys(media_item_ids))
+        owned = db.session.execute(
+            select(MediaItem.id).where(
+                MediaItem.user_id == user_id,
+                MediaItem.id.in_(requested),
+                MediaItem.is_deleted.is_(False),
+            )
+        ).scalars().all() if requested else []
+        owned_set = set(owned)
+        unknown = [item_id for item_id in requested if item_id not in owned_set]
+        cached = self.cached_item_ids(user_id, list(owned_set), analysis_type)
+        item_count = len(owned_set)
+        calls = item_count - len(cached)
+        stats = self.call_statistics()
+
+        wall_time = calls * stats['avg_latency_ms'] / 1000.0 / self.concurrency
+        if self.rate_limit and self.rate_limit > 0:
+            wall_time = max(wall_time, calls / self.rate_limit)
+        input_tokens = int(math.ceil(calls * stats['avg_input_tokens']))
+        output_tokens = int(math.ceil(calls * stats['avg_output_tokens']))
+        cost = (input_tokens * self.input_token_cost + output_tokens * self.output_token_cost) / 1_000_000
+        batches = self.split(item_count)
+        logger.info(f"Estimated ranking of {item_count} items for user_id={user_id}: {calls} LLM calls, {wall_time:.0f}s")
+        return {
+            'item_count': item_count,
+            'unknown_item_ids': unknown,
+            'cached_items': len(cached),
+            'cache_hit_rate': len(cached) / item_count if item_count else 0.0,
+            'expected_llm_calls': calls,
+            'bytes_to_download': int(calls * stats['avg_image_bytes']),
+            'concurrency': self.concurrency,
+            'wall_time_seconds': round(wall_time, 1),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'estimated_cost_usd': round(cost, 4),
+            'history': stats,
+            'max_items': self.max_items,
+            'within_limit': item_count <= self.max_items,
+            'suggested_batches': batches,
+        }
@@ -0,0 +1,297 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import BigInteger, cast, column, func, insert, literal, select, update, values
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking
+from app.services.rescore_service import RateLimiter
+from app.services.top_picks_service import TopPicksService
+from app.services.latest_ranking_service import LatestRankingService
+from app.services.score_sketch_service import ScoreSketchService
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownMediaItemsError(LookupError):
+    """
+    Raised when requested media items do not exist, are deleted, or belong to another user.
+    """
+
+    def __init__(self, media_item_ids: Sequence[int]) -> None:
+        self.media_item_ids = list(media_item_ids)
+        super().__init__(f"Media items not found: {', '.join(str(item_id) for item_id in self.media_item_ids)}")
+
+
+class RankingSessionService:
+    """
+    Creates ranking sessions and ranks their media items, reading and writing the
+    session's rankings with set-based statements.
+    """
+
+    # Columns written back to media_rankings after ranking
+    RESULT_COLUMNS = (
+        'technical_score', 'aesthetic_score', 'combined_score', 'llm_reasoning', 'tags_json',
+        'status', 'error_message', 'analyzed_at', 'latency_ms', 'input_tokens', 'output_tokens', 'image_bytes',
+    )
+
+    def __init__(
+        self,
+        ranking_service: Any = None,
+        max_items: int = 500,
+        concurrency: int = 4,
+        rate_limit: Optional[float] = None,
+        top_picks_limit: int = 20,
+        write_chunk_size: int = 1000,
+    ) -> None:
+        """
+        Initialize the ranking session service.
+
+        Args:
+            ranking_service (LLMBasedRankingService, optional): Service used to score images; required by rank().
+            max_items (int): Largest number of media items allowed in one session.
+            concurrency (int): Number of parallel LLM calls while ranking.
+            rate_limit (float, optional): Maximum LLM calls per second.
+            top_picks_limit (int): Size of the top picks refreshed when a session completes.
+            write_chunk_size (int): Rankings written back per UPDATE statement.
+        """
+        self.ranking_service = ranking_service
+        self.max_items = max_items
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rate_limit)
+        self.top_picks_limit = top_picks_limit
+        self.write_chunk_size = max(1, write_chunk_size)
+
+    def create(self, user_id: int, media_item_ids: Sequence[int], method: str, analysis_type: str) -> RankingSession:
+        """
+        Create a session with one pending MediaRanking per requested item. Does not commit.
+        Ownership is checked with one IN query and the rankings are written with a single
+        INSERT ... SELECT, so the number of round trips does not grow with the session.
+
+        Args:
+            user_id (int): The owning user's ID.
+            media_item_ids (sequence): Requested media item IDs; duplicates are ignored.
+            method (str): The session's ranking method.
+            analysis_type (str): Tag written to each MediaRanking.analysis_type.
+        Returns:
+            RankingSession: The flushed session.
+        Raises:
+            ValueError: If no items are given or the session would exceed max_items.
+            UnknownMediaItemsError: If any item is missing, deleted or not owned by the user.
+        """
+        item_ids = list(dict.fromkeys(media_item_ids))
+        if not item_ids:
+            raise ValueError('Media items are required')
+        if len(item_ids) > self.max_items:
+            raise ValueError(
+                f"A ranking session may contain at most {self.max_items} media items, got {len(item_ids)}; "
+                f"use /api/ranking/sessions/estimate to plan batches"
+            )
+
+        owned = select(MediaItem.id).where(
+            MediaItem.user_id == user_id,
+            MediaItem.id.in_(item_ids),
+            MediaItem.is_deleted.is_(False),
+        )
+        found = set(db.session.scalars(owned))
+        if len(found) != len(item_ids):
+            raise UnknownMediaItemsError([item_id for item_id in item_ids if item_id not in found])
+
+        session = RankingSession(user_id=user_id, method=method, status='pending')
+        db.session.add(session)
+        db.session.flush()
+        # One INSERT ... SELECT, however many items the session has
+        db.session.execute(
+            insert(MediaRanking).from_select(
+                ['ranking_session_id', 'user_id', 'media_item_id', 'status', 'analysis_type'],
+                owned.with_only_columns(
+                    literal(session.id), literal(user_id), MediaItem.id, literal('pending'), literal(analysis_type)
+                ),
+            )
+        )
+
+        User.bump_data_version(user_id)
+        logger.info(f"Created ranking session {session.id} with {len(item_ids)} items for user_id={user_id}")
+        return session
+
+    @staticmethod
+    def progress(session_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Aggregate the rankings of several sessions with one grouped query.
+
+        Args:
+            session_ids (sequence): The sessions to summarize.
+        Returns:
+            dict: session_id -> 'total', 'completed' and 'failed' ranking counts and 'best_score'
+            (None when nothing is scored). Sessions without rankings get zero counts.
+        """
+        progress = {
+            session_id: {'total': 0, 'completed': 0, 'failed': 0, 'best_score': None} for session_id in session_ids
+        }
+        if not progress:
+            return progress
+        rows = db.session.execute(
+            select(
+                MediaRanking.ranking_session_id,
+                func.count(MediaRanking.id),
+                func.count(MediaRanking.id).filter(MediaRanking.status == 'completed'),
+                func.count(MediaRanking.id).filter(MediaRanking.status == 'failed'),
+                func.max(MediaRanking.combined_score),
+            )
+            .where(MediaRanking.ranking_session_id.in_(list(progress)))
+            .group_by(MediaRanking.ranking_session_id)
+        ).all()
+        for session_id, total, completed, failed, best_score in rows:
+            progress[session_id] = {
+                'total': total,
+                'completed': completed,
+                'failed': failed,
+                'best_score': float(best_score) if best_score is not None else None,
+            }
+        return progress
+
+    def _score_item(self, payload: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Score a single item, capturing failures instead of raising.
+
+        Args:
+            payload (dict): The item payload built by the ranking service.
+        Returns:
+            tuple: (score_item result or None, error message or None).
+        """
+        self.limiter.acquire()
+        try:
+            return self.ranking_service.score_item(payload), None
+        except Exception as e:
+            logger.warning(f"Failed to rank media item {payload['id']}: {str(e)}")
+            return None, str(e)
+
+    def _cached_scores(self, session: RankingSession, media_item_ids: List[int], analysis_type: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Find the latest completed score of each item from the user's other sessions.
+
+        Args:
+            session (RankingSession): The session being ranked.
+            media_item_ids (list): Items still to be ranked.
+            analysis_type (str): Only scores of this analysis type are reused.
+        Returns:
+            dict: media_item_id -> score columns to copy.
+        """
+        rows = db.session.execute(
+            select(
+                MediaRanking.media_item_id, MediaRanking.technical_score, MediaRanking.aesthetic_score,
+                MediaRanking.combined_score, MediaRanking.llm_reasoning, MediaRanking.tags_json,
+            )
+            .join(RankingSession, RankingSession.id == MediaRanking.ranking_session_id)
+            .where(
+                RankingSession.user_id == session.user_id,
+                MediaRanking.ranking_session_id != session.id,
+                MediaRanking.media_item_id.in_(media_item_ids),
+                MediaRanking.analysis_type == analysis_type,
+                MediaRanking.status == 'completed',
+                MediaRanking.combined_score.isnot(None),
+            )
+            .order_by(MediaRanking.id)
+        ).all()
+        # Later rows overwrite earlier ones, so the newest score wins
+        return {row.media_item_id: dict(row._mapping) for row in rows}
+
+    def rank(self, session: RankingSession) -> Dict[str, int]:
+        """
+        Rank every pending or failed item in a session and complete it.
+        Scores already computed for the same analysis type are copied instead of calling the LLM.
+        The read transaction is committed before scoring; all results are then written back in
+        bulk and the session's status and completed_at are updated in one transaction, which is
+        left for the caller to commit.
+
+        Args:
+            session (RankingSession): The session to rank.
+        Returns:
+            dict: Counts of 'ranked' (LLM calls that succeeded), 'cached' and 'failed' items.
+        """
+        rows = db.session.execute(
+            select(MediaRanking.id, MediaRanking.analysis_type, MediaItem)
+            .join(MediaItem, MediaItem.id == MediaRanking.media_item_id)
+            .where(MediaRanking.ranking_session_id == session.id, MediaRanking.status != 'completed')
+            .order_by(MediaRanking.id)
+        ).all()
+        analyzed_at = datetime.now(timezone.utc)
+        results: List[Dict[str, Any]] = []
+        counts = {'ranked': 0, 'cached': 0, 'failed': 0}
+
+        to_score = []
+        for analysis_type in {row.analysis_type for row in rows}:
+            group = [row for row in rows if row.analysis_type == analysis_type]
+            cached = self._cached_scores(session, [row.MediaItem.id for row in group], analysis_type)
+            for row in group:
+                scores = cached.get(row.MediaItem.id)
+                if scores is None:
+                    to_score.append(row)
+                    continue
+                result = dict.fromkeys(self.RESULT_COLUMNS)
+                result.update({key: value for key, value in scores.items() if key != 'media_item_id'})
+                result.update(id=row.id, status='completed', analyzed_at=analyzed_at)
+                results.append(result)
+                counts['cached'] += 1
+
+        scored_results: List[Dict[str, Any]] = []
+        payloads = [self.ranking_service.build_item_payload(row.MediaItem) for row in to_score]
+        # End the read transaction before the LLM calls, so no connection idles in a transaction
+        # and the write-back is stamped with the time it actually happens (see ChangeFeedService)
+        db.session.commit()
+        if to_score:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                scored = list(executor.map(self._score_item, payloads))
+            for row, (score, error) in zip(to_score, scored):
+                result = dict.fromkeys(self.RESULT_COLUMNS)
+                result.update(id=row.id, analyzed_at=analyzed_at)
+                if score is None:
+                    result.update(status='failed', error_message=error)
+                    counts['failed'] += 1
+                else:
+                    result.update(self.ranking_service.scores_to_ranking_fields(score), status='completed')
+                    counts['ranked'] += 1
+                scored_results.append(result)
+        results.extend(scored_results)
+
+        for start in range(0, len(results), self.write_chunk_size):
+            self._write_results(results[start:start + self.write_chunk_size])
+        # Cached copies are already in the user's sketches, so only fresh scores are added
+        ScoreSketchService.add(session.user_id, scored_results)
+
+        session.status = 'completed'
+        session.completed_at = analyzed_at
+        session.error_message = f"{counts['failed']} media items failed to rank" if counts['failed'] else None
+        db.session.flush()
+        LatestRankingService.apply_sessions(session.id)
+        User.bump_data_version(session.user_id)
+        TopPicksService(limit=self.top_picks_limit).refresh(session.user_id)
+        logger.info(
+            f"Ranked session {session.id}: {counts['ranked']} scored, {counts['cached']} cached, {counts['failed']} failed"
+        )
+        return counts
+
+    def _write_results(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Write ranking results back with one UPDATE ... FROM (VALUES ...) on Postgres,
+        or an executemany of primary-key updates elsewhere.
+
+        Args:
+            results (list): Dicts with 'id' and every column in RESULT_COLUMNS.
+        """
+        if db.session.get_bind().dialect.name != 'postgresql':
+            db.session.execute(update(MediaRanking), results)
+            return
+        table = MediaRanking.__table__
+        names = ('id',) + self.RESULT_COLUMNS
+        data = values(
+            *[column(name, table.c[name].type) for name in names], name='results'
+        ).data([tuple(result[name] for name in names) for result in results])
+        # VALUES columns are untyped in Postgres, so cast each one to the target column's type
+        db.session.execute(
+            update(MediaRanking)
+            .where(MediaRanking.id == cast(data.c.id, BigInteger))
+            .values({name: cast(data.c[name], table.c[name].type) for name in self.RESULT_COLUMNS}),
+            execution_options={'synchronize_session': False},
+        )
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import threading
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from app.extensions import db
+from app.config import Config
+from app.models import User, MediaItem, RankingSession, MediaRanking
+from app.services.top_picks_service import TopPicksService
+from app.services.latest_ranking_service import LatestRankingService
+from app.services.score_sketch_service import ScoreSketchService
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls so no more than `rate` start per second.
+    """
+
+    def __init__(self, rate: Optional[float]) -> None:
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate (float, optional): Maximum calls per second. None or <= 0 disables the cap.
+        """
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        """
+        Block until the caller is allowed to start its call.
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RescoreCheckpoint:
+    """
+    Persisted progress of a bulk re-scoring run, stored as a JSON file.
+    """
+
+    def __init__(self, path: str, analysis_type: str) -> None:
+        """
+        Load the checkpoint at `path`, or start a fresh one.
+
+        Args:
+            path (str): Location of the checkpoint file.
+            analysis_type (str): The analysis type this run writes.
+        Raises:
+            ValueError: If the file belongs to a run with a different analysis type.
+        """
+        self.path = path
+        self.analysis_type = analysis_type
+        self.cursor = 0
+        self.processed = 0
+        self.failed = 0
+        self.sessions: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                state = json.load(f)
+            if state.get('analysis_type') != analysis_type:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to analysis_type={state.get('analysis_type')!r}; "
+                    f"use --reset or another --state-file"
+                )
+            self.cursor = state.get('cursor', 0)
+            self.processed = state.get('processed', 0)
+            self.failed = state.get('failed', 0)
+            self.sessions = state.get('sessions', {})
+            logger.info(f"Resuming rescore from cursor={self.cursor} ({self.processed} already processed)")
+
+    def save(self) -> None:
+        """
+        Atomically write the checkpoint to disk.
+        """
+        state = {
+            'analysis_type': self.analysis_type,
+            'cursor': self.cursor,
+            'processed': self.processed,
+            'failed': self.failed,
+            'sessions': self.sessions,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class BulkRescoreService:
+    """
+    Re-scores every stored media item through the LLM ranking service, walking
+    media_items in primary-key order so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        ranking_service: Any,
+        analysis_type: str,
+        concurrency: int = 4,
+        rate_limit: Optional[float] = None,
+        batch_size: int = 50,
+    ) -> None:
+        """
+        Initialize the bulk re-scoring service.
+
+        Args:
+            ranking_service (LLMBasedRankingService): Service used to score each image.
+            analysis_type (str): Tag written to MediaRanking.analysis_type.
+            concurrency (int): Number of parallel LLM calls.
+            rate_limit (float, optional): Maximum LLM calls per second.
+            batch_size (int): Items fetched and committed per keyset page.
+        """
+        self.ranking_service = ranking_service
+        self.analysis_type = analysis_type
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.limiter = RateLimiter(rate_limit)
+
+    def _score_item(self, payload: Dict[str, Any]) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Score a single item, capturing failures instead of raising.
+
+        Args:
+            payload (dict): The item payload built by the ranking service.
+        Returns:
+            tuple: (media_item_id, score_item result or None, error message or None).
+        """
+        self.limiter.acquire()
+        try:
+            return payload['id'], self.ranking_service.score_item(payload), None
+        except Exception as e:
+            logger.warning(f"Failed to rescore media item {payload['id']}: {str(e)}")
+            return payload['id'], None, str(e)
+
+    def _session_for_user(self, checkpoint: RescoreCheckpoint, user_id: int) -> int:
+        """
+        Get (or create) the ranking session that holds this run's rows for a user.
+
+        Args:
+            checkpoint (RescoreCheckpoint): The run checkpoint.
+            user_id (int): The owning user's ID.
+        Returns:
+            int: The ranking session ID.
+        """
+        key = str(user_id)
+        if key not in checkpoint.sessions:
+            session = RankingSession(
+                user_id=user_id,
+                method=f"rescore:{self.analysis_type}",
+                status='pending'
+            )
+            db.session.add(session)
+            db.session.flush()
+            checkpoint.sessions[key] = session.id
+            # Saved before the batch commits, so a crash right after the commit can still find it
+            checkpoint.save()
+        return checkpoint.sessions[key]
+
+    def _fetch_batch(self, cursor: int) -> List[MediaItem]:
+        """
+        Fetch the next keyset page of media items after `cursor`.
+
+        Args:
+            cursor (int): The last processed media item ID.
+        Returns:
+            list: Up to batch_size media items ordered by ID.
+        """
+        return MediaItem.query.filter(
+            MediaItem.id > cursor,
+            MediaItem.is_deleted.is_(False)
+        ).order_by(MediaItem.id).limit(self.batch_size).all()
+
+    def _recover(self, checkpoint: RescoreCheckpoint) -> None:
+        """
+        Bring the checkpoint up to date with what this run already committed. A batch is
+        committed before the checkpoint file is written, so after a crash between the two the
+        run's sessions in the database hold rankings past the saved cursor; re-scoring those
+        items would duplicate rankings, sketch entries and LLM calls. Only the sessions recorded
+        in the checkpoint are consulted, never those of other runs of the same analysis type.
+
+        Args:
+            checkpoint (RescoreCheckpoint): The run checkpoint; updated and saved if behind.
+        """
+        if not checkpoint.sessions:
+            return
+        existing = set(db.session.scalars(
+            select(RankingSession.id).where(RankingSession.id.in_(list(checkpoint.sessions.values())))
+        ))
+        # Sessions saved for a batch that was rolled back never made it to the database
+        sessions = {user: session_id for user, session_id in checkpoint.sessions.items() if session_id in existing}
+        changed = sessions != checkpoint.sessions
+        checkpoint.sessions = sessions
+        if sessions:
+            cursor, processed, failed = db.session.execute(
+                select(
+                    func.max(MediaRanking.media_item_id),
+                    func.count(),
+                    func.count().filter(MediaRanking.status == 'failed'),
+                ).where(
+                    MediaRanking.ranking_session_id.in_(list(sessions.values())),
+                    MediaRanking.media_item_id > checkpoint.cursor,
+                )
+            ).one()
+            if processed:
+                logger.warning(f"Checkpoint was behind the database by {processed} items; resuming after {cursor}")
+                checkpoint.cursor = cursor
+                checkpoint.processed += processed
+                checkpoint.failed += failed
+                changed = True
+        if changed:
+            checkpoint.save()
+        db.session.commit()
+
+    def run(
+        self,
+        checkpoint: RescoreCheckpoint,
+        report: Optional[Callable[[str], None]] = None,
+        limit: Optional[int] = None,
+    ) -> RescoreCheckpoint:
+        """
+        Re-score all remaining media items, committing and checkpointing after each batch.
+        Items whose rankings were committed by an earlier, interrupted invocation are skipped.
+
+        Args:
+            checkpoint (RescoreCheckpoint): Where to resume from and persist progress.
+            report (callable, optional): Receives a progress line after each batch.
+            limit (int, optional): Stop after this many items in this invocation.
+        Returns:
+            RescoreCheckpoint: The final checkpoint.
+        """
+        self._recover(checkpoint)
+        remaining = MediaItem.query.filter(
+            MediaItem.id > checkpoint.cursor,
+            MediaItem.is_deleted.is_(False)
+        ).count()
+        if limit is not None:
+            remaining = min(remaining, limit)
+        started = time.monotonic()
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while limit is None or done < limit:
+                batch = self._fetch_batch(checkpoint.cursor)
+                if limit is not None:
+                    batch = batch[:limit - done]
+                if not batch:
+                    break
+                owners = {item.id: item.user_id for item in batch}
+                last_id = batch[-1].id
+                payloads = [self.ranking_service.build_item_payload(item) for item in batch]
+                # Don't hold the read transaction open across the LLM calls
+                db.session.commit()
+                results = list(executor.map(self._score_item, payloads))
+                analyzed_at = datetime.now(timezone.utc)
+                rows = []
+                for media_item_id, result, error in results:
+                    row = {
+                        'ranking_session_id': self._session_for_user(checkpoint, owners[media_item_id]),
+                        'user_id': owners[media_item_id],
+                        'media_item_id': media_item_id,
+                        'analysis_type': self.analysis_type,
+                        'analyzed_at': analyzed_at,
+                    }
+                    if result is None:
+                        row.update(status='failed', error_message=error)
+                        checkpoint.failed += 1
+                    else:
+                        row.update(self.ranking_service.scores_to_ranking_fields(result), status='completed')
+                    rows.append(row)
+                db.session.execute(db.insert(MediaRanking), rows)
+                rows_by_user = defaultdict(list)
+                for row in rows:
+                    rows_by_user[owners[row['media_item_id']]].append(row)
+                ScoreSketchService.add_by_user(rows_by_user)
+                User.bump_data_version(*owners.values())
+                db.session.commit()
+                checkpoint.cursor = last_id
+                checkpoint.processed += len(batch)
+                checkpoint.save()
+                done += len(batch)
+                if report:
+                    elapsed = time.monotonic() - started
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    eta = (remaining - done) / rate if rate > 0 else 0.0
+                    report(
+                        f"{done}/{remaining} items ({checkpoint.failed} failed) | "
+                        f"{rate:.2f} items/s | ETA {eta:.0f}s | cursor={checkpoint.cursor}"
+                    )
+        if limit is None or done < limit:
+            self._complete_sessions(checkpoint)
+        return checkpoint
+
+    def _complete_sessions(self, checkpoint: RescoreCheckpoint) -> None:
+        """
+        Mark every ranking session created by this run as completed.
+
+        Args:
+            checkpoint (RescoreCheckpoint): The run checkpoint.
+        """
+        if not checkpoint.sessions:
+            return
+        RankingSession.query.filter(
+            RankingSession.id.in_(checkpoint.sessions.values()),
+            RankingSession.completed_at.is_(None)
+        ).update({
+            RankingSession.status: 'completed',
+            RankingSession.completed_at: datetime.now(timezone.utc)
+        }, synchronize_session=False)
+        LatestRankingService.apply_sessions(*checkpoint.sessions.values())
+        User.bump_data_version(*checkpoint.sessions)
+        top_picks = TopPicksService(limit=Config.TOP_PICKS_LIMIT)
+        for user_id in checkpoint.sessions:
+            top_picks.refresh(int(user_id))
+        db.session.commit()
+        logger.info(f"Completed {len(checkpoint.sessions)} rescore sessions for analysis_type={self.analysis_type}")
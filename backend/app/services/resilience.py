@@ -0,0 +1,324 @@
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+import requests
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a dependency whose circuit breaker is open.
+    """
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker. Opens after `failure_threshold` consecutive failures,
+    fails fast while open, and lets one trial call through after `reset_timeout` seconds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        is_failure: Optional[Callable[[Exception], bool]] = None,
+    ) -> None:
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name (str): Dependency name, used in errors and the health endpoint.
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds to stay open before a trial call.
+            is_failure (callable, optional): Decides whether an exception counts as a dependency failure.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda e: True)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._hedges = 0
+        self._hedges_skipped = 0
+
+    def _before_call(self) -> None:
+        """
+        Check whether a call may proceed, moving open -> half_open once the timeout expires.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or a trial call is already in flight.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - elapsed))
+
+    def _on_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed after successful trial call")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def _on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_hedge(self, launched: bool) -> None:
+        """
+        Count a hedged call for reporting.
+
+        Args:
+            launched (bool): Whether the hedge ran, or was skipped because the hedge executor was saturated.
+        """
+        with self._lock:
+            if launched:
+                self._hedges += 1
+            else:
+                self._hedges_skipped += 1
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Call `fn` through the breaker.
+
+        Args:
+            fn (callable): The dependency call.
+        Returns:
+            Whatever `fn` returns.
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            Exception: Whatever `fn` raises.
+        """
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        self._on_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the breaker state for reporting.
+
+        Returns:
+            dict: State, consecutive failures, seconds until the next trial call, and the
+            number of hedged calls launched and skipped.
+        """
+        with self._lock:
+            state = self._state
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                if retry_in == 0.0:
+                    state = self.HALF_OPEN
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'retry_in_seconds': round(retry_in, 1),
+                'hedges': self._hedges,
+                'hedges_skipped': self._hedges_skipped,
+            }
+
+
+class LatencyTracker:
+    """
+    Rolling window of call durations used to derive a hedging threshold.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int): Number of most recent durations kept.
+            min_samples (int): Samples required before a percentile is reported.
+        """
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Get the q-th percentile of the recorded durations.
+
+        Args:
+            q (float): Percentile in [0, 1].
+        Returns:
+            float or None: Duration in seconds, or None until min_samples are recorded.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CallCancelledError(Exception):
+    """
+    Raised by a hedged attempt that stopped because the other attempt already succeeded.
+    """
+
+
+# Hedges run here, never the primary attempt; when every slot is busy the hedge is skipped,
+# so hedging cannot deepen a queue that is itself what makes calls slow
+_hedge_executor = ThreadPoolExecutor(max_workers=Config.RANKING_CONCURRENCY, thread_name_prefix='hedge')
+_hedge_slots = threading.BoundedSemaphore(Config.RANKING_CONCURRENCY)
+
+
+def hedged_call(
+    fn: Callable[[threading.Event], Any],
+    hedge_after: Optional[float],
+    breaker: Optional[CircuitBreaker] = None,
+) -> Any:
+    """
+    Call `fn` in the caller's thread, and if it has not finished after `hedge_after` seconds
+    start a second identical call on the hedge executor (unless it is saturated). The first
+    successful result wins. Each attempt is passed an event that is set once the other attempt
+    has succeeded; it should then stop and raise CallCancelledError.
+
+    Args:
+        fn (callable): Idempotent call to make, taking the cancellation event.
+        hedge_after (float, optional): Seconds before hedging. None disables hedging.
+        breaker (CircuitBreaker, optional): Breaker whose stats count launched and skipped hedges.
+    Returns:
+        The result of whichever call succeeded first.
+    Raises:
+        Exception: The primary attempt's error if every attempt failed.
+    """
+    cancel_primary = threading.Event()
+    if hedge_after is None:
+        return fn(cancel_primary)
+    cancel_hedge = threading.Event()
+    hedge: Optional[Future] = None
+
+    def run_hedge() -> Any:
+        try:
+            result = fn(cancel_hedge)
+        finally:
+            _hedge_slots.release()
+        cancel_primary.set()
+        return result
+
+    def launch() -> None:
+        nonlocal hedge
+        launched = _hedge_slots.acquire(blocking=False)
+        if breaker is not None:
+            breaker.record_hedge(launched)
+        if not launched:
+            logger.debug(f"Skipping hedge after {hedge_after:.2f}s: hedge executor is saturated")
+            return
+        logger.info(f"Hedging slow call after {hedge_after:.2f}s")
+        hedge = _hedge_executor.submit(run_hedge)
+
+    timer = threading.Timer(hedge_after, launch)
+    timer.daemon = True
+    timer.start()
+    try:
+        return fn(cancel_primary)
+    except Exception:
+        # The hedge is only consulted if the primary attempt failed or was cancelled by it
+        timer.cancel()
+        timer.join()
+        if hedge is not None:
+            try:
+                return hedge.result()
+            except Exception:
+                pass
+        raise
+    finally:
+        timer.cancel()
+        timer.join()
+        cancel_hedge.set()
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """
+    Decide whether an error means the dependency is unhealthy. Client errors (e.g. an
+    expired image URL returning 403, or an API rejecting a malformed request with 400)
+    do not count against the breaker.
+
+    Args:
+        error (Exception): The raised error, from requests or an SDK exposing the HTTP
+            status as `http_status` (Cohere) or `status_code`.
+    Returns:
+        bool: True for timeouts, connection errors, 429 and 5xx responses.
+    """
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+    else:
+        status = getattr(error, 'http_status', None) or getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+    return True
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """
+    Get the process-wide breaker for a dependency, creating it on first use.
+
+    Args:
+        name (str): Dependency name, e.g. 'cohere'.
+        **kwargs: CircuitBreaker options used when the breaker is created.
+    Returns:
+        CircuitBreaker: The shared breaker.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **kwargs)
+        return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the state of every registered breaker.
+
+    Returns:
+        dict: Breaker name -> snapshot.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,210 @@
+import logging
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.extensions import db
+from app.models import User, RankingSession, MediaRanking, UserScoreSketch
+from app.services.tdigest import TDigest
+from app.services.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+# Sketch axis -> MediaRanking score column
+AXES = {'technical': 'technical_score', 'aesthetic': 'aesthetic_score', 'combined': 'combined_score'}
+
+
+def percentiles(digests: Mapping[str, TDigest], scores: Mapping[str, Any]) -> Dict[str, Optional[float]]:
+    """
+    Look up where a ranking's scores fall in the user's score distributions.
+
+    Args:
+        digests (mapping): The user's digests by axis, from ScoreSketchService.digests.
+        scores (mapping): Score columns (e.g. a serialized ranking); missing or null scores are skipped.
+    Returns:
+        dict: Axis -> fraction of the user's scores at or below this one (ties count half),
+        rounded to 4 places, or None when either the score or the axis' digest is missing.
+    """
+    result: Dict[str, Optional[float]] = {}
+    for axis, column in AXES.items():
+        digest = digests.get(axis)
+        score = scores.get(column)
+        fraction = digest.cdf(score) if digest is not None and score is not None else None
+        result[axis] = round(fraction, 4) if fraction is not None else None
+    return result
+
+
+class ScoreSketchService:
+    """
+    Maintains one t-digest per user and score axis over all completed ranking scores, so
+    "top 5% of your library" labels cost a CDF lookup on a ~1 KB sketch instead of sorting
+    the user's rankings. Sketches are updated in the transaction that writes the scores;
+    rankings removed later (hard deletes) stay in the sketch until the next rebuild.
+    """
+
+    COMPRESSION = 100.0  # Up to ~100 centroids per digest: about 1% quantile error, ~1 KB stored
+
+    def __init__(self, cache_size: int = 256) -> None:
+        """
+        Initialize the sketch service.
+
+        Args:
+            cache_size (int): Number of users whose deserialized digests are kept in memory.
+        """
+        self._digests = VersionedCache(cache_size)
+
+    @staticmethod
+    def _insert() -> Any:
+        return pg_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+    @classmethod
+    def add(cls, user_id: int, rankings: Iterable[Mapping[str, Any]]) -> int:
+        """
+        Add the scores of newly written rankings to the user's sketches. Does not commit.
+        Pass only freshly scored rankings; copies of cached scores are already counted.
+        The sketch rows are locked while they are updated, so concurrent sessions of the
+        same user do not lose each other's scores.
+
+        Args:
+            user_id (int): The owning user's ID.
+            rankings (iterable): Ranking values with 'status' and the score columns; only
+                completed rankings are counted.
+        Returns:
+            int: Number of scores added across all axes.
+        """
+        rankings = [ranking for ranking in rankings if ranking.get('status') == 'completed']
+        values = {
+            axis: [float(ranking[column]) for ranking in rankings if ranking.get(column) is not None]
+            for axis, column in AXES.items()
+        }
+        values = {axis: axis_values for axis, axis_values in values.items() if axis_values}
+        if not values:
+            return 0
+        empty = TDigest(cls.COMPRESSION).to_bytes()
+        db.session.execute(
+            cls._insert()(UserScoreSketch)
+            .values([{'user_id': user_id, 'axis': axis, 'digest': empty} for axis in sorted(values)])
+            .on_conflict_do_nothing()
+        )
+        sketches = db.session.scalars(
+            select(UserScoreSketch)
+            .where(UserScoreSketch.user_id == user_id, UserScoreSketch.axis.in_(list(values)))
+            .order_by(UserScoreSketch.axis)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        for sketch in sketches:
+            digest = TDigest.from_bytes(sketch.digest)
+            digest.update(values[sketch.axis])
+            sketch.digest = digest.to_bytes()
+        db.session.flush()
+        added = sum(len(axis_values) for axis_values in values.values())
+        logger.debug(f"Added {added} scores to the score sketches of user_id={user_id}")
+        return added
+
+    @classmethod
+    def add_by_user(cls, rankings_by_user: Mapping[int, Sequence[Mapping[str, Any]]]) -> int:
+        """
+        Add rankings of several users, locking their sketches in user order. Does not commit.
+
+        Args:
+            rankings_by_user (mapping): User ID -> ranking values, as for add.
+        Returns:
+            int: Number of scores added.
+        """
+        return sum(cls.add(user_id, rankings_by_user[user_id]) for user_id in sorted(rankings_by_user))
+
+    def digests(self, user_id: int) -> Dict[str, TDigest]:
+        """
+        Get the user's digests, deserialized once per data version and shared between callers.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            dict: Axis -> TDigest; axes without scores are missing. Must not be mutated.
+        """
+        return self._digests.get(user_id, 'score_sketches', lambda: {
+            axis: TDigest.from_bytes(digest)
+            for axis, digest in db.session.execute(
+                select(UserScoreSketch.axis, UserScoreSketch.digest).where(UserScoreSketch.user_id == user_id)
+            )
+        })
+
+    def rebuild_user(self, user_id: int, chunk_size: int = 5000) -> Dict[str, int]:
+        """
+        Recompute a user's sketches from their completed rankings. Does not commit.
+
+        Args:
+            user_id (int): The user's ID.
+            chunk_size (int): Rankings fetched per round trip.
+        Returns:
+            dict: Axis -> number of scores in the rebuilt sketch.
+        """
+        # Wait for in-flight add() calls to commit, and make later ones apply on top of the rebuild
+        db.session.execute(
+            select(UserScoreSketch.axis).where(UserScoreSketch.user_id == user_id).with_for_update()
+        ).all()
+        digests = {axis: TDigest(self.COMPRESSION) for axis in AXES}
+        columns = [getattr(MediaRanking, column) for column in AXES.values()]
+        # Copies of cached scores (see RankingSessionService.rank) carry no call metrics and
+        # repeat an earlier ranking of the item; add() skips them, so the rebuild does too
+        source = aliased(MediaRanking)
+        copied = and_(
+            MediaRanking.latency_ms.is_(None),
+            exists().where(
+                source.media_item_id == MediaRanking.media_item_id,
+                source.analysis_type == MediaRanking.analysis_type,
+                source.user_id == MediaRanking.user_id,
+                source.status == 'completed',
+                source.id < MediaRanking.id,
+            ),
+        )
+        result = db.session.execute(
+            select(*columns)
+            .join(RankingSession, RankingSession.id == MediaRanking.ranking_session_id)
+            .where(RankingSession.user_id == user_id, MediaRanking.status == 'completed', ~copied),
+            execution_options={'yield_per': max(1, chunk_size)},
+        )
+        for partition in result.partitions():
+            for row in partition:
+                for axis, score in zip(AXES, row):
+                    if score is not None:
+                        digests[axis].add(float(score))
+        stmt = self._insert()(UserScoreSketch).values([
+            {'user_id': user_id, 'axis': axis, 'digest': digest.to_bytes()} for axis, digest in digests.items()
+        ])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[UserScoreSketch.user_id, UserScoreSketch.axis],
+            set_={'digest': stmt.excluded.digest, 'updated_at': func.now()},
+        ))
+        User.bump_data_version(user_id)
+        return {axis: int(digest.count) for axis, digest in digests.items()}
+
+    def rebuild(
+        self,
+        user_ids: Optional[Sequence[int]] = None,
+        chunk_size: int = 5000,
+        report: Optional[Callable[[str], None]] = None,
+    ) -> int:
+        """
+        Rebuild the sketches of the given users, or of every user, committing after each user.
+
+        Args:
+            user_ids (sequence, optional): Users to rebuild; all users when None.
+            chunk_size (int): Rankings fetched per round trip.
+            report (callable, optional): Receives a progress line after each user.
+        Returns:
+            int: Number of users rebuilt.
+        """
+        if user_ids is None:
+            user_ids = db.session.scalars(select(User.id).order_by(User.id)).all()
+        for user_id in user_ids:
+            counts = self.rebuild_user(user_id, chunk_size)
+            db.session.commit()
+            if report:
+                report(f"Rebuilt score sketches for user_id={user_id}: {counts['combined']} combined scores")
+        logger.info(f"Rebuilt score sketches of {len(user_ids)} users")
+        return len(user_ids)
+
@@ -0,0 +1,195 @@
+import math
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+# Serialized layout: version, compression, count, min, max, centroid count, then the centroid
+# means (float64, so stored scores compare exactly) and weights (float32)
+_HEADER = struct.Struct('<BfdddI')
+_VERSION = 1
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl): a mergeable sketch of a distribution that answers
+    quantile and CDF queries with small error, most accurate near the tails. It keeps at most
+    about `compression` centroids however many values are added, and serializes to a few
+    hundred bytes, so one digest per user and score axis can be stored and loaded cheaply.
+    """
+
+    def __init__(self, compression: float = 100.0) -> None:
+        """
+        Initialize an empty digest.
+
+        Args:
+            compression (float): Accuracy/size trade-off; the digest keeps up to about this many centroids.
+        """
+        self.compression = float(compression)
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """
+        Add a value.
+
+        Args:
+            value (float): The value.
+            weight (float): Its weight (number of occurrences).
+        """
+        value = float(value)
+        if math.isnan(value) or weight <= 0:
+            return
+        self._buffer.append((value, float(weight)))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        """
+        Add several values with weight 1.
+
+        Args:
+            values (iterable): The values.
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'TDigest') -> None:
+        """
+        Add every value summarized by another digest to this one.
+
+        Args:
+            other (TDigest): The digest to merge in; it is not modified.
+        """
+        self._buffer.extend(zip(other._means, other._weights))
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _scale(self, q: float) -> float:
+        # k1 scale function: centroids are small near q=0 and q=1, large around the median
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        means: List[float] = []
+        weights: List[float] = []
+        before = 0.0
+        mean, weight = points[0]
+        for next_mean, next_weight in points[1:]:
+            if self._scale((before + weight + next_weight) / self.count) - self._scale(before / self.count) <= 1:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                before += weight
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights, self._buffer = means, weights, []
+
+    def _knots(self) -> List[Tuple[float, float]]:
+        """(value, rank) points the quantile and CDF functions interpolate between."""
+        self._compress()
+        knots = [(self.min, 0.0)]
+        before = 0.0
+        for mean, weight in zip(self._means, self._weights):
+            knots.append((mean, before + weight / 2))
+            before += weight
+        knots.append((self.max, self.count))
+        return knots
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the value below which a fraction q of the values fall.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+        Returns:
+            float or None: The estimated value, or None for an empty digest.
+        """
+        if not self.count:
+            return None
+        target = min(max(q, 0.0), 1.0) * self.count
+        knots = self._knots()
+        for (low_value, low_rank), (high_value, high_rank) in zip(knots, knots[1:]):
+            if target <= high_rank:
+                if high_rank == low_rank:
+                    return high_value
+                return low_value + (high_value - low_value) * (target - low_rank) / (high_rank - low_rank)
+        return self.max
+
+    def cdf(self, value: float) -> Optional[float]:
+        """
+        Estimate the fraction of values at or below a value; values equal to it count half,
+        so the most common score of a library sits in the middle of its tie.
+
+        Args:
+            value (float): The value.
+        Returns:
+            float or None: The estimated fraction between 0 and 1, or None for an empty digest.
+        """
+        if not self.count:
+            return None
+        value = float(value)
+        if value < self.min:
+            return 0.0
+        if value > self.max:
+            return 1.0
+        knots = self._knots()
+        ties = [rank for knot_value, rank in knots[1:-1] if knot_value == value]
+        if ties:
+            return (ties[0] + ties[-1]) / 2 / self.count
+        for (low_value, low_rank), (high_value, high_rank) in zip(knots, knots[1:]):
+            # Inclusive below: the minimum is usually merged into a centroid, so it is not a tie
+            if low_value <= value < high_value:
+                return (low_rank + (high_rank - low_rank) * (value - low_value) / (high_value - low_value)) / self.count
+        return 1.0
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the digest compactly (12 bytes per centroid plus a 33-byte header).
+
+        Returns:
+            bytes: The serialized digest.
+        """
+        self._compress()
+        size = len(self._means)
+        return _HEADER.pack(
+            _VERSION, self.compression, self.count, self.min, self.max, size
+        ) + struct.pack(f'<{size}d{size}f', *self._means, *self._weights)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TDigest':
+        """
+        Deserialize a digest written by to_bytes.
+
+        Args:
+            data (bytes): The serialized digest.
+        Returns:
+            TDigest: The digest.
+        Raises:
+            ValueError: If the data is not a serialized digest.
+        """
+        try:
+            version, compression, count, minimum, maximum, size = _HEADER.unpack_from(data)
+            centroids = struct.unpack_from(f'<{size}d{size}f', data, _HEADER.size)
+        except struct.error as e:
+            raise ValueError(f'Invalid t-digest data: {e}')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported t-digest version {version}')
+        digest = cls(compression)
+        digest.count, digest.min, digest.max = count, minimum, maximum
+        digest._means = list(centroids[:size])
+        digest._weights = list(centroids[size:])
+        return digest
@@ -0,0 +1,104 @@
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, literal_column, select
+from app.extensions import db
+from app.models import MediaItem
+from app.services.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('day', 'month', 'year')
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    """
+    Truncate a timestamp to the start of its UTC day, month or year, like date_trunc.
+
+    Args:
+        value (datetime): The timestamp; naive values are taken as UTC.
+        granularity (str): 'day', 'month' or 'year'.
+    Returns:
+        datetime: The bucket start, timezone-aware UTC.
+    """
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity in ('month', 'year'):
+        value = value.replace(day=1)
+    if granularity == 'year':
+        value = value.replace(month=1)
+    return value
+
+
+class TimelineService:
+    """
+    Per-user histograms of media items by creation_time for the gallery's timeline scrubber.
+    Buckets are UTC days, months or years. Histograms are cached in a VersionedCache, so an
+    ingest (or any other change to the user's media) invalidates them.
+    """
+
+    def __init__(self, cache_size: int = 256) -> None:
+        """
+        Initialize the timeline service.
+
+        Args:
+            cache_size (int): Number of histograms kept across all users.
+        """
+        self._histograms = VersionedCache(cache_size)
+
+    def histogram(
+        self,
+        user_id: int,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Count the user's live media items per bucket, newest bucket first.
+
+        Args:
+            user_id (int): The user's ID.
+            granularity (str): 'day', 'month' or 'year'.
+            start (datetime, optional): Only items created at or after this time.
+            end (datetime, optional): Only items created before this time.
+        Returns:
+            dict: 'buckets' ([{'start', 'count'}, ...], shared with other callers so must not be
+            mutated), 'total' and 'undated' (items without creation_time; 0 when a range is given).
+        Raises:
+            ValueError: If the granularity is unknown.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        key = ('histogram', granularity, start, end)
+        return self._histograms.get(user_id, key, lambda: self._compute(user_id, granularity, start, end))
+
+    @staticmethod
+    def _compute(user_id: int, granularity: str, start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+        filters = [MediaItem.user_id == user_id, MediaItem.is_deleted.is_(False)]
+        if start is not None:
+            filters.append(MediaItem.creation_time >= start)
+        if end is not None:
+            filters.append(MediaItem.creation_time < end)
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Reads only (user_id, creation_time), so it is an index-only scan of idx_media_items_user_live_created
+            # Literals rather than bind parameters, so GROUP BY matches the selected expression
+            bucket = func.date_trunc(
+                literal_column(f"'{granularity}'"), func.timezone(literal_column("'UTC'"), MediaItem.creation_time)
+            )
+            rows = db.session.execute(
+                select(bucket, func.count()).where(*filters).group_by(bucket).order_by(bucket.desc().nulls_last())
+            ).all()
+            counts = [(value.replace(tzinfo=timezone.utc) if value else None, count) for value, count in rows]
+        else:
+            times = db.session.scalars(select(MediaItem.creation_time).where(*filters))
+            counter = Counter(truncate(value, granularity) if value else None for value in times)
+            undated = counter.pop(None, 0)
+            counts = sorted(counter.items(), reverse=True) + ([(None, undated)] if undated else [])
+        buckets: List[Dict[str, Any]] = [
+            {'start': value.isoformat(), 'count': count} for value, count in counts if value is not None
+        ]
+        undated = sum(count for value, count in counts if value is None)
+        logger.info(f"Computed {granularity} timeline for user_id={user_id}: {len(buckets)} buckets")
+        return {'buckets': buckets, 'total': sum(count for _, count in counts), 'undated': undated}
@@ -0,0 +1,158 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking, UserTopPicks
+from app.services.coalesce import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class TopPicksService:
+    """
+    Computes, materializes and serves each user's top picks from their latest completed
+    ranking session. The materialized row is refreshed when a session completes and dropped
+    whenever the user's media items change, then recomputed on the next read. Each row records
+    the user's data_version it was computed from and is only served while that still matches,
+    so picks computed concurrently with a change are never kept.
+    """
+
+    def __init__(self, limit: int = 20) -> None:
+        """
+        Initialize the top-picks service.
+
+        Args:
+            limit (int): Number of photos in a user's top picks.
+        """
+        self.limit = limit
+        self._single_flight = SingleFlight()
+
+    def compute(self, user_id: int) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+        """
+        Compute top picks with one joined query: best-scored, non-deleted items of the
+        user's latest completed ranking session.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            tuple: (ranking session ID or None, list of photo dicts).
+        """
+        latest_session = select(RankingSession.id).where(
+            RankingSession.user_id == user_id,
+            RankingSession.completed_at.isnot(None)
+        ).order_by(RankingSession.completed_at.desc()).limit(1).scalar_subquery()
+        rows = db.session.execute(
+            select(
+                MediaRanking.ranking_session_id,
+                MediaItem.google_media_id,
+                MediaItem.base_url,
+                MediaRanking.combined_score,
+                MediaRanking.tags_json,
+                MediaItem.width,
+                MediaItem.height,
+            )
+            .join(MediaItem, MediaItem.id == MediaRanking.media_item_id)
+            .where(
+                MediaRanking.ranking_session_id == latest_session,
+                MediaRanking.combined_score.isnot(None),
+                MediaItem.is_deleted.is_(False),
+            )
+            .order_by(MediaRanking.combined_score.desc(), MediaRanking.id)
+            .limit(self.limit)
+        ).all()
+        photos = [
+            {
+                'google_media_id': row.google_media_id,
+                'base_url': row.base_url,
+                'combined_score': float(row.combined_score),
+                'tags': row.tags_json or [],
+                'width': row.width,
+                'height': row.height
+            }
+            for row in rows
+        ]
+        return (rows[0].ranking_session_id if rows else None), photos
+
+    def refresh(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Recompute and store a user's top picks. Does not commit. Call after bumping the
+        user's data_version in the same transaction, or the stored row is stale at once.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            list: The refreshed photo dicts.
+        """
+        # Read before computing: a change committed after this makes the row stale, never wrong
+        data_version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar_one_or_none()
+        ranking_session_id, photos = self.compute(user_id)
+        values = {
+            'user_id': user_id, 'ranking_session_id': ranking_session_id,
+            'photos': photos, 'data_version': data_version,
+        }
+        if db.session.get_bind().dialect.name == 'postgresql':
+            stmt = pg_insert(UserTopPicks).values(**values)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[UserTopPicks.user_id],
+                set_={
+                    'ranking_session_id': stmt.excluded.ranking_session_id,
+                    'photos': stmt.excluded.photos,
+                    'data_version': stmt.excluded.data_version,
+                    'computed_at': func.now(),
+                }
+            ))
+        else:
+            self._store_portable(values)
+        logger.info(f"Materialized {len(photos)} top picks for user_id={user_id}")
+        return photos
+
+    @staticmethod
+    def _store_portable(values: Dict[str, Any]) -> None:
+        """
+        Replace a user's materialized row on databases without ON CONFLICT. Does not commit.
+
+        Args:
+            values (dict): Column values of the new row, including user_id.
+        """
+        db.session.execute(delete(UserTopPicks).where(UserTopPicks.user_id == values['user_id']))
+        db.session.execute(db.insert(UserTopPicks).values(**values))
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """
+        Drop a user's materialized top picks after their media items changed. Does not commit.
+
+        Args:
+            user_id (int): The user's ID.
+        """
+        db.session.execute(delete(UserTopPicks).where(UserTopPicks.user_id == user_id))
+
+    def get(self, user_id: int) -> List[Dict[str, Any]]:
+        """
+        Get a user's top picks from the materialized row, recomputing it on a miss.
+        Concurrent calls for the same user share one lookup.
+
+        Args:
+            user_id (int): The user's ID.
+        Returns:
+            list: The photo dicts.
+        """
+        return self._single_flight.do(('top_picks', user_id), lambda: self._load(user_id))
+
+    def _load(self, user_id: int) -> List[Dict[str, Any]]:
+        photos = db.session.execute(
+            select(UserTopPicks.photos)
+            .join(User, User.id == UserTopPicks.user_id)
+            .where(UserTopPicks.user_id == user_id, UserTopPicks.data_version == User.data_version)
+        ).scalar_one_or_none()
+        if photos is not None:
+            return photos
+        try:
+            photos = self.refresh(user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return photos
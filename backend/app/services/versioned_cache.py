@@ -0,0 +1,61 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import select
+from app.extensions import db
+from app.models import User
+from app.services.coalesce import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """
+    Small in-process LRU of values derived from one user's data. Entries are keyed by the
+    user's data_version, which every media/ranking write bumps, so a change (e.g. an ingest)
+    invalidates the user's entries without any explicit eviction call.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Entries kept across all users before the least recently used is dropped.
+        """
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._single_flight = SingleFlight()
+
+    def get(self, user_id: int, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Get a cached value for the user's current data, computing it on a miss.
+        Concurrent misses for the same entry are coalesced into one computation.
+
+        Args:
+            user_id (int): The user the value belongs to.
+            key: Identifies the value within the user's data, e.g. ('histogram', 'month').
+            compute (callable): Builds the value; its result is shared, so it must not be mutated.
+        Returns:
+            The cached or freshly computed value.
+        """
+        version = db.session.scalar(select(User.data_version).where(User.id == user_id)) or 0
+        entry_key = (user_id, version, key)
+        with self._lock:
+            if entry_key in self._entries:
+                self._entries.move_to_end(entry_key)
+                return self._entries[entry_key]
+        value = self._single_flight.do(entry_key, compute)
+        with self._lock:
+            self._entries[entry_key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,110 @@
+"""
+Benchmark POST /api/media/items/batch storage: legacy per-row lookup + add vs. set-based upsert.
+
+Runs against DATABASE_URL inside a transaction that is rolled back, so it leaves no data behind.
+
+Usage:
+    docker-compose exec backend python benchmarks/bench_batch_upsert.py [--sizes 100,1000,10000]
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import create_app
+from app.extensions import db
+from app.models import User, MediaItem
+from app.services.media_ingest_service import MediaIngestService
+
+
+def legacy_batch_store(user_id: int, data: List[Dict[str, Any]]) -> List[MediaItem]:
+    """The pre-upsert implementation: one SELECT per item, then one INSERT/UPDATE per row on flush."""
+    stored_items = []
+    for item in data:
+        google_media_id = item.get('google_media_id') or item.get('id')
+        base_url = item.get('base_url') or item.get('baseUrl')
+        if not google_media_id or not base_url:
+            continue
+        existing = MediaItem.query.filter_by(user_id=user_id, google_media_id=google_media_id).first()
+        if existing:
+            existing.base_url = base_url
+            existing.filename = item.get('filename')
+            existing.mime_type = item.get('mime_type') or item.get('mimeType')
+            existing.description = item.get('description', '')
+            existing.width = item.get('width')
+            existing.height = item.get('height')
+            existing.last_synced_at = datetime.utcnow()
+            stored_items.append(existing)
+        else:
+            new_item = MediaItem(
+                user_id=user_id,
+                google_media_id=google_media_id,
+                base_url=base_url,
+                filename=item.get('filename'),
+                mime_type=item.get('mime_type') or item.get('mimeType'),
+                description=item.get('description', ''),
+                width=item.get('width'),
+                height=item.get('height'),
+            )
+            db.session.add(new_item)
+            stored_items.append(new_item)
+    db.session.flush()
+    return stored_items
+
+
+def make_payload(size: int) -> List[Dict[str, Any]]:
+    prefix = uuid.uuid4().hex
+    return [
+        {
+            'id': f'{prefix}-{i}',
+            'baseUrl': f'https://lh3.googleusercontent.com/{prefix}/{i}',
+            'filename': f'IMG_{i:05d}.jpg',
+            'mimeType': 'image/jpeg',
+            'width': 4032,
+            'height': 3024,
+        }
+        for i in range(size)
+    ]
+
+
+def time_store(store: Callable[[int, List[Dict[str, Any]]], Any], user_id: int, payload: List[Dict[str, Any]]) -> float:
+    started = time.perf_counter()
+    store(user_id, payload)
+    elapsed = time.perf_counter() - started
+    db.session.expunge_all()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated batch sizes')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    service = MediaIngestService()
+
+    app = create_app()
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        db.session = scoped_session(sessionmaker(bind=connection))
+        try:
+            user = User(email=f'bench-{uuid.uuid4()}@example.com')
+            db.session.add(user)
+            db.session.flush()
+            print(f"{'items':>7} {'path':>8} {'insert rows/s':>14} {'update rows/s':>14}")
+            for size in sizes:
+                for name, store in (('legacy', legacy_batch_store), ('upsert', service.upsert)):
+                    payload = make_payload(size)
+                    insert_time = time_store(store, user.id, payload)
+                    update_time = time_store(store, user.id, payload)
+                    print(f"{size:>7} {name:>8} {size / insert_time:>14,.0f} {size / update_time:>14,.0f}")
+        finally:
+            transaction.rollback()
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark list-endpoint serialization: ORM objects + to_dict() + Flask's default encoder vs.
+core select() tuples + compiled row serializers + the orjson provider.
+
+Runs against DATABASE_URL inside a transaction that is rolled back, so it leaves no data behind.
+Each timing covers the query, serialization and JSON encoding of the whole response body.
+
+Usage:
+    docker-compose exec backend python benchmarks/bench_list_serialization.py [--rows 10000] [--repeat 5]
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, List
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import create_app
+from app.extensions import db
+from app.json_provider import OrjsonProvider
+from app.models import User, MediaItem, RankingSession, MediaRanking
+from app.models.serializers import select_columns, serialize_rows
+
+
+def seed(user_id: int, rows: int) -> int:
+    """Insert rows media items, one ranking session and one ranking per item. Returns the session ID."""
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    db.session.execute(db.insert(MediaItem), [
+        {
+            'user_id': user_id,
+            'google_media_id': f'bench-{i}',
+            'base_url': f'https://lh3.googleusercontent.com/bench/{i}',
+            'filename': f'IMG_{i:05d}.jpg',
+            'mime_type': 'image/jpeg',
+            'description': '',
+            'creation_time': started + timedelta(minutes=i),
+            'width': 4032,
+            'height': 3024,
+            'tags_json': ['beach', 'sunset'],
+        }
+        for i in range(rows)
+    ])
+    session = RankingSession(user_id=user_id, method='ai_ranking', status='completed', completed_at=started)
+    db.session.add(session)
+    db.session.flush()
+    item_ids = db.session.scalars(select(MediaItem.id).where(MediaItem.user_id == user_id)).all()
+    db.session.execute(db.insert(MediaRanking), [
+        {
+            'ranking_session_id': session.id,
+            'media_item_id': item_id,
+            'technical_score': Decimal('7.50'),
+            'aesthetic_score': Decimal('6.25'),
+            'combined_score': Decimal('6.88'),
+            'llm_reasoning': {'technical': 7.5, 'aesthetic': 6.25, 'overall': 6.88},
+            'analysis_type': 'default',
+            'analyzed_at': started,
+            'latency_ms': 850,
+        }
+        for item_id in item_ids
+    ])
+    db.session.flush()
+    return session.id
+
+
+def orm_path(model: Any, where: Any, provider: DefaultJSONProvider) -> bytes:
+    objects = db.session.scalars(select(model).where(where)).all()
+    return provider.dumps([obj.to_dict() for obj in objects]).encode('utf-8')
+
+
+def fast_path(model: Any, where: Any, provider: OrjsonProvider) -> bytes:
+    rows = db.session.execute(select(*select_columns(model, model.API_FIELDS)).where(where)).all()
+    return provider.dumps_bytes(serialize_rows(model, model.API_FIELDS, rows))
+
+
+def best_time(fn: Callable[[], bytes], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='Rows per response')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best time is reported')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        default_provider = DefaultJSONProvider(app)
+        orjson_provider = OrjsonProvider(app)
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        db.session = scoped_session(sessionmaker(bind=connection))
+        try:
+            user = User(email=f'bench-{uuid.uuid4()}@example.com')
+            db.session.add(user)
+            db.session.flush()
+            session_id = seed(user.id, args.rows)
+            cases = (
+                ('MediaItem', MediaItem, MediaItem.user_id == user.id),
+                ('MediaRanking', MediaRanking, MediaRanking.ranking_session_id == session_id),
+            )
+            print(f"{'model':>13} {'rows':>7} {'orm rows/s':>12} {'fast rows/s':>12} {'speedup':>8}")
+            for name, model, where in cases:
+                assert orm_path(model, where, default_provider) and fast_path(model, where, orjson_provider)
+                orm_time = best_time(lambda: orm_path(model, where, default_provider), args.repeat)
+                fast_time = best_time(lambda: fast_path(model, where, orjson_provider), args.repeat)
+                print(f"{name:>13} {args.rows:>7} {args.rows / orm_time:>12,.0f} "
+                      f"{args.rows / fast_time:>12,.0f} {orm_time / fast_time:>7.1f}x")
+        finally:
+            transaction.rollback()
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark list-endpoint wire formats: response size and encode time of JSON vs. MessagePack,
+each uncompressed, gzip'd and Brotli-compressed with the app's COMPRESSION_* settings.
+
+Runs against DATABASE_URL inside a transaction that is rolled back, so it leaves no data behind.
+Payloads are fetched once through the real endpoints (GET /api/media/items and
+GET /api/ranking/sessions/<id>/rankings); each timing covers encoding plus compression.
+MessagePack and Brotli rows are skipped when msgpack or brotli is not installed.
+
+Usage:
+    docker-compose exec backend python benchmarks/bench_wire_formats.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+import uuid
+from typing import Any, Callable, List, Optional
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from app import create_app
+from app.api.negotiation import msgpack, packb
+from app.compression import brotli, compress
+from app.extensions import db
+from app.models import User
+from bench_list_serialization import seed
+
+
+def best_time(fn: Callable[[], bytes], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per response (at most MEDIA_MAX_PAGE_SIZE)')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per variant; the best time is reported')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        db.session = scoped_session(sessionmaker(bind=connection))
+        try:
+            user = User(email=f'bench-{uuid.uuid4()}@example.com')
+            db.session.add(user)
+            db.session.flush()
+            session_id = seed(user.id, args.rows)
+            headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+            client = app.test_client()
+            cases = (
+                ('media items', f'/api/media/items?limit={args.rows}'),
+                ('rankings', f'/api/ranking/sessions/{session_id}/rankings?limit={args.rows}'),
+            )
+            encoders = [('json', lambda obj: app.json.dumps(obj).encode('utf-8'))]
+            if msgpack is not None:
+                encoders.append(('msgpack', packb))
+            encodings: List[Optional[str]] = [None, 'gzip'] + (['br'] if brotli is not None else [])
+
+            print(f"{'payload':>12} {'format':>8} {'encoding':>8} {'bytes':>10} {'vs json':>8} {'encode ms':>10}")
+            for name, url in cases:
+                response = client.get(url, headers=headers)
+                assert response.status_code == 200, response.get_data(as_text=True)
+                payload = json.loads(response.data)
+                json_size = len(encoders[0][1](payload))
+                for format_name, encode in encoders:
+                    for encoding in encodings:
+                        def run(encode: Any = encode, encoding: Optional[str] = encoding) -> bytes:
+                            body = encode(payload)
+                            return compress(body, encoding, gzip_level, brotli_quality) if encoding else body
+                        size = len(run())
+                        elapsed = best_time(run, args.repeat)
+                        print(f"{name:>12} {format_name:>8} {encoding or 'none':>8} {size:>10,} "
+                              f"{size / json_size:>8.1%} {elapsed * 1000:>10.2f}")
+        finally:
+            transaction.rollback()
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
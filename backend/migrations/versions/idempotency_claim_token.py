@@ -0,0 +1,22 @@
+"""Add idempotency_keys.claim_token
+
+Revision ID: idempotency_claim_token
+Revises: top_picks_data_version
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'idempotency_claim_token'
+down_revision = 'top_picks_data_version'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Claims made before the upgrade have no token; they can still expire or be taken over
+    op.add_column('idempotency_keys', sa.Column('claim_token', sa.String(length=32), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'claim_token')
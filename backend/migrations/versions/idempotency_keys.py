@@ -0,0 +1,37 @@
+"""Add idempotency_keys for retried write requests
+
+Revision ID: idempotency_keys
+Revises: user_score_sketches
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'idempotency_keys'
+down_revision = 'user_score_sketches'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('idempotency_keys',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('response_mimetype', sa.String(length=100), nullable=True),
+        sa.Column('response_body', sa.LargeBinary(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'key')
+    )
+    # Must match IdempotencyKey.__table_args__
+    op.create_index('idx_idempotency_keys_expires', 'idempotency_keys', ['expires_at'])
+
+def downgrade() -> None:
+    op.drop_index('idx_idempotency_keys_expires', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
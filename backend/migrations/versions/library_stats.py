@@ -0,0 +1,100 @@
+"""Add trigger-maintained library_stats counters
+
+Revision ID: library_stats
+Revises: media_search
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'library_stats'
+down_revision = 'media_search'
+branch_labels = None
+depends_on = None
+
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+# Must match app.models.library_stat.STAT_SOURCES
+STAT_SOURCES = {
+    'media_items': (
+        'r.user_id',
+        '',
+        "ARRAY[CASE WHEN r.is_deleted THEN 'items.deleted' ELSE 'items.live' END, "
+        "CASE WHEN NOT r.is_deleted THEN 'items.ai_status.' || coalesce(r.ai_status, 'none') END, "
+        "CASE WHEN NOT r.is_deleted THEN CASE WHEN r.latest_ranking_id IS NULL "
+        "THEN 'items.unranked' ELSE 'items.ranked' END END]",
+    ),
+    'ranking_sessions': (
+        'r.user_id',
+        '',
+        "ARRAY['sessions.status.' || coalesce(r.status, 'none')]",
+    ),
+    'media_rankings': (
+        's.user_id',
+        'JOIN ranking_sessions AS s ON s.id = r.ranking_session_id',
+        "ARRAY['rankings.status.' || coalesce(r.status, 'none'), "
+        "CASE WHEN r.status = 'completed' AND r.combined_score IS NOT NULL "
+        "THEN 'scores.' || least(greatest(floor(r.combined_score), 0), 9)::int END]",
+    ),
+}
+
+def create_trigger(table: str, operation: str) -> None:
+    user, join, names = STAT_SOURCES[table]
+    name = f'library_stats_{table}_{operation.lower()}'
+    changes = []
+    if operation in ('INSERT', 'UPDATE'):
+        changes.append(f'SELECT {user} AS user_id, 1 AS delta, {names} AS names FROM new_rows AS r {join}')
+    if operation in ('UPDATE', 'DELETE'):
+        changes.append(f'SELECT {user} AS user_id, -1 AS delta, {names} AS names FROM old_rows AS r {join}')
+    changes_sql = ' UNION ALL '.join(changes)
+    referencing = {
+        'INSERT': 'NEW TABLE AS new_rows',
+        'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        'DELETE': 'OLD TABLE AS old_rows',
+    }[operation]
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock_shared(hashtextextended('library_stats.' || user_id, 0))
+            FROM (SELECT DISTINCT user_id FROM ({changes_sql}) AS changes ORDER BY user_id) AS locked;
+            INSERT INTO library_stats (user_id, name, count)
+            SELECT changes.user_id, counter.name, sum(changes.delta)
+            FROM ({changes_sql}) AS changes
+            CROSS JOIN unnest(changes.names) AS counter(name)
+            JOIN users ON users.id = changes.user_id
+            WHERE counter.name IS NOT NULL
+            GROUP BY changes.user_id, counter.name
+            HAVING sum(changes.delta) <> 0
+            ORDER BY changes.user_id, counter.name
+            ON CONFLICT (user_id, name) DO UPDATE SET count = library_stats.count + excluded.count;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {name} AFTER {operation} ON {table}
+        REFERENCING {referencing} FOR EACH STATEMENT EXECUTE FUNCTION {name}()
+    """)
+
+def upgrade() -> None:
+    op.create_table('library_stats',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'name')
+    )
+    for table in STAT_SOURCES:
+        for operation in OPERATIONS:
+            create_trigger(table, operation)
+    # Existing data is counted by `flask reconcile-stats`, run once after upgrading
+
+def downgrade() -> None:
+    for table in STAT_SOURCES:
+        for operation in OPERATIONS:
+            name = f'library_stats_{table}_{operation.lower()}'
+            op.execute(f'DROP TRIGGER IF EXISTS {name} ON {table}')
+            op.execute(f'DROP FUNCTION IF EXISTS {name}()')
+    op.drop_table('library_stats')
@@ -0,0 +1,64 @@
+"""Count media_rankings library stats by the ranking's own user_id
+
+Revision ID: library_stats_ranking_owner
+Revises: media_rankings_user_id
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'library_stats_ranking_owner'
+down_revision = 'media_rankings_user_id'
+branch_labels = None
+depends_on = None
+
+OPERATIONS = ('INSERT', 'UPDATE', 'DELETE')
+
+# Must match app.models.library_stat.STAT_SOURCES['media_rankings']
+RANKING_NAMES = (
+    "ARRAY['rankings.status.' || coalesce(r.status, 'none'), "
+    "CASE WHEN r.status = 'completed' AND r.combined_score IS NOT NULL "
+    "THEN 'scores.' || least(greatest(floor(r.combined_score), 0), 9)::int END]"
+)
+
+def replace_function(operation: str, user: str, join: str) -> None:
+    # The triggers stay in place; only the functions they execute change
+    name = f'library_stats_media_rankings_{operation.lower()}'
+    changes = []
+    if operation in ('INSERT', 'UPDATE'):
+        changes.append(f'SELECT {user} AS user_id, 1 AS delta, {RANKING_NAMES} AS names FROM new_rows AS r {join}')
+    if operation in ('UPDATE', 'DELETE'):
+        changes.append(f'SELECT {user} AS user_id, -1 AS delta, {RANKING_NAMES} AS names FROM old_rows AS r {join}')
+    changes_sql = ' UNION ALL '.join(changes)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock_shared(hashtextextended('library_stats.' || user_id, 0))
+            FROM (SELECT DISTINCT user_id FROM ({changes_sql}) AS changes ORDER BY user_id) AS locked;
+            INSERT INTO library_stats (user_id, name, count)
+            SELECT changes.user_id, counter.name, sum(changes.delta)
+            FROM ({changes_sql}) AS changes
+            CROSS JOIN unnest(changes.names) AS counter(name)
+            JOIN users ON users.id = changes.user_id
+            WHERE counter.name IS NOT NULL
+            GROUP BY changes.user_id, counter.name
+            HAVING sum(changes.delta) <> 0
+            ORDER BY changes.user_id, counter.name
+            ON CONFLICT (user_id, name) DO UPDATE SET count = library_stats.count + excluded.count;
+            RETURN NULL;
+        END
+        $$
+    """)
+
+def upgrade() -> None:
+    # Rankings deleted along with their session (ON DELETE CASCADE) can't be joined to it any
+    # more, so their counters were never decremented; media_rankings.user_id survives the cascade
+    for operation in OPERATIONS:
+        replace_function(operation, 'r.user_id', '')
+    # Counters left too high by earlier session deletes are fixed by `flask reconcile-stats`
+
+def downgrade() -> None:
+    for operation in OPERATIONS:
+        replace_function(operation, 's.user_id', 'JOIN ranking_sessions AS s ON s.id = r.ranking_session_id')
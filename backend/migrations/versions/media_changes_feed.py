@@ -0,0 +1,26 @@
+"""Add media_rankings.updated_at and changes-feed indexes
+
+Revision ID: media_changes_feed
+Revises: user_data_version
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'media_changes_feed'
+down_revision = 'user_data_version'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('media_rankings', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.execute('UPDATE media_rankings SET updated_at = created_at WHERE created_at IS NOT NULL')
+    op.create_index('idx_media_rankings_updated', 'media_rankings', ['updated_at', 'id'])
+    op.create_index('idx_media_items_user_updated', 'media_items', ['user_id', 'updated_at', 'id'])
+
+def downgrade() -> None:
+    op.drop_index('idx_media_items_user_updated', table_name='media_items')
+    op.drop_index('idx_media_rankings_updated', table_name='media_rankings')
+    op.drop_column('media_rankings', 'updated_at')
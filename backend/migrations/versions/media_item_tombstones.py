@@ -0,0 +1,31 @@
+"""Add media_item_tombstones for hard-deleted items in the changes feed
+
+Revision ID: media_item_tombstones
+Revises: idempotency_keys
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'media_item_tombstones'
+down_revision = 'idempotency_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('media_item_tombstones',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('media_item_id', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Must match MediaItemTombstone.__table_args__
+    op.create_index('idx_media_item_tombstones_user_updated', 'media_item_tombstones', ['user_id', 'updated_at', 'id'])
+
+def downgrade() -> None:
+    op.drop_index('idx_media_item_tombstones_user_updated', table_name='media_item_tombstones')
+    op.drop_table('media_item_tombstones')
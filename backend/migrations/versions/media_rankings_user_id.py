@@ -0,0 +1,59 @@
+"""Add media_rankings.user_id for a user-scoped changes feed
+
+Revision ID: media_rankings_user_id
+Revises: idempotency_claim_token
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'media_rankings_user_id'
+down_revision = 'idempotency_claim_token'
+branch_labels = None
+depends_on = None
+
+# Must match app.models.media_ranking.MEDIA_RANKINGS_USER_DDL
+MEDIA_RANKINGS_USER_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION media_rankings_set_user_id() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.user_id := (SELECT user_id FROM ranking_sessions WHERE id = NEW.ranking_session_id);
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER media_rankings_set_user_id BEFORE INSERT ON media_rankings
+    FOR EACH ROW WHEN (NEW.user_id IS NULL) EXECUTE FUNCTION media_rankings_set_user_id()
+    """,
+]
+
+def upgrade() -> None:
+    op.add_column('media_rankings', sa.Column('user_id', sa.BigInteger(), nullable=True))
+    # Rows inserted while the backfill runs get user_id from the trigger
+    for statement in MEDIA_RANKINGS_USER_DDL:
+        op.execute(statement)
+    op.execute(
+        'UPDATE media_rankings SET user_id = ranking_sessions.user_id FROM ranking_sessions '
+        'WHERE ranking_sessions.id = media_rankings.ranking_session_id AND media_rankings.user_id IS NULL'
+    )
+    op.alter_column('media_rankings', 'user_id', nullable=False)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_media_rankings_user_updated', 'media_rankings', ['user_id', 'updated_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('idx_media_rankings_updated', table_name='media_rankings', postgresql_concurrently=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_media_rankings_updated', 'media_rankings', ['updated_at', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('idx_media_rankings_user_updated', table_name='media_rankings', postgresql_concurrently=True)
+    op.execute('DROP TRIGGER IF EXISTS media_rankings_set_user_id ON media_rankings')
+    op.execute('DROP FUNCTION IF EXISTS media_rankings_set_user_id()')
+    op.drop_column('media_rankings', 'user_id')
@@ -0,0 +1,42 @@
+"""Add GIN indexes for media search
+
+Revision ID: media_search
+Revises: ranking_session_list
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'media_search'
+down_revision = 'ranking_session_list'
+branch_labels = None
+depends_on = None
+
+# Must match app.models.media_item.search_vector exactly, or searches will not use the index
+SEARCH_VECTOR = (
+    "to_tsvector('simple'::regconfig, regexp_replace(lower(coalesce(filename, '') || ' ' || "
+    "coalesce(description, '')), '[^[:alnum:]]+', ' ', 'g'))"
+)
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_media_items_search', 'media_items', [sa.text(SEARCH_VECTOR)],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_media_items_tags', 'media_items', ['tags_json'],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_media_rankings_tags', 'media_rankings', ['tags_json'],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_media_rankings_tags', table_name='media_rankings', postgresql_concurrently=True)
+        op.drop_index('idx_media_items_tags', table_name='media_items', postgresql_concurrently=True)
+        op.drop_index('idx_media_items_search', table_name='media_items', postgresql_concurrently=True)
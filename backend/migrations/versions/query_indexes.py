@@ -0,0 +1,79 @@
+"""Sync drifted media columns and add indexes for the hot read paths
+
+Revision ID: query_indexes
+Revises: media_changes_feed
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'query_indexes'
+down_revision = 'media_changes_feed'
+branch_labels = None
+depends_on = None
+
+# Columns the models gained without a migration. Databases created with db.create_all()
+# already have them, hence IF NOT EXISTS.
+DRIFTED_COLUMNS = (
+    ('media_items', 'duration', 'INTEGER'),
+    ('media_items', 'thumbnail_url', 'TEXT'),
+    ('media_items', 'ai_status', 'VARCHAR(20)'),
+    ('media_items', 'latest_ranking_id', 'BIGINT'),
+    ('media_rankings', 'analysis_type', 'VARCHAR(32)'),
+    ('media_rankings', 'status', 'VARCHAR(20)'),
+    ('media_rankings', 'error_message', 'TEXT'),
+    ('media_rankings', 'analyzed_at', 'TIMESTAMP WITH TIME ZONE'),
+)
+
+def upgrade() -> None:
+    for table, column, type_ in DRIFTED_COLUMNS:
+        op.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {type_}')
+    op.execute("UPDATE media_items SET ai_status = 'pending' WHERE ai_status IS NULL")
+    op.execute("UPDATE media_rankings SET status = 'completed' WHERE status IS NULL")
+    op.execute('ALTER TABLE media_items DROP CONSTRAINT IF EXISTS media_items_latest_ranking_id_fkey')
+    op.create_foreign_key(
+        'media_items_latest_ranking_id_fkey', 'media_items', 'media_rankings',
+        ['latest_ranking_id'], ['id'], ondelete='SET NULL'
+    )
+
+    # Build indexes without blocking writes to large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_media_items_user_live_created', 'media_items',
+            ['user_id', sa.text('creation_time DESC NULLS LAST'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_deleted IS false'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_media_items_latest_ranking', 'media_items', ['latest_ranking_id'],
+            postgresql_where=sa.text('latest_ranking_id IS NOT NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_ranking_sessions_user_completed', 'ranking_sessions', ['user_id', 'completed_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_media_rankings_media_item', 'media_rankings', ['media_item_id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'idx_media_rankings_recent_calls', 'media_rankings', [sa.text('analyzed_at DESC NULLS LAST')],
+            postgresql_where=sa.text('latency_ms IS NOT NULL'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_media_rankings_recent_calls', table_name='media_rankings', postgresql_concurrently=True)
+        op.drop_index('idx_media_rankings_media_item', table_name='media_rankings', postgresql_concurrently=True)
+        op.drop_index('idx_ranking_sessions_user_completed', table_name='ranking_sessions', postgresql_concurrently=True)
+        op.drop_index('idx_media_items_latest_ranking', table_name='media_items', postgresql_concurrently=True)
+        op.drop_index('idx_media_items_user_live_created', table_name='media_items', postgresql_concurrently=True)
+    # The drifted columns belong to the baseline models, so they are left in place
+    op.drop_constraint('media_items_latest_ranking_id_fkey', 'media_items', type_='foreignkey')
+    op.create_foreign_key(
+        'media_items_latest_ranking_id_fkey', 'media_items', 'media_rankings', ['latest_ranking_id'], ['id']
+    )
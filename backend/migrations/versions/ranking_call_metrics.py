@@ -0,0 +1,27 @@
+"""Add LLM call metrics to media_rankings
+
+Revision ID: ranking_call_metrics
+Revises: initial_migration
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'ranking_call_metrics'
+down_revision = 'initial_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('media_rankings', sa.Column('latency_ms', sa.Integer(), nullable=True))
+    op.add_column('media_rankings', sa.Column('input_tokens', sa.Integer(), nullable=True))
+    op.add_column('media_rankings', sa.Column('output_tokens', sa.Integer(), nullable=True))
+    op.add_column('media_rankings', sa.Column('image_bytes', sa.BigInteger(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('media_rankings', 'image_bytes')
+    op.drop_column('media_rankings', 'output_tokens')
+    op.drop_column('media_rankings', 'input_tokens')
+    op.drop_column('media_rankings', 'latency_ms')
@@ -0,0 +1,27 @@
+"""Index ranking sessions for the keyset-paginated session list
+
+Revision ID: ranking_session_list
+Revises: query_indexes
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'ranking_session_list'
+down_revision = 'query_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_ranking_sessions_user_initiated', 'ranking_sessions',
+            ['user_id', sa.text('initiated_at DESC NULLS LAST'), sa.text('id DESC')],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_ranking_sessions_user_initiated', table_name='ranking_sessions', postgresql_concurrently=True)
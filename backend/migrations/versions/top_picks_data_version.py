@@ -0,0 +1,22 @@
+"""Add user_top_picks.data_version
+
+Revision ID: top_picks_data_version
+Revises: media_item_tombstones
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'top_picks_data_version'
+down_revision = 'media_item_tombstones'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing rows stay NULL, so they are recomputed on their next read
+    op.add_column('user_top_picks', sa.Column('data_version', sa.BigInteger(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('user_top_picks', 'data_version')
@@ -0,0 +1,21 @@
+"""Add users.data_version change counter
+
+Revision ID: user_data_version
+Revises: user_top_picks
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'user_data_version'
+down_revision = 'user_top_picks'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('data_version', sa.BigInteger(), server_default='0', nullable=False))
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,29 @@
+"""Add user_score_sketches t-digests
+
+Revision ID: user_score_sketches
+Revises: library_stats
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'user_score_sketches'
+down_revision = 'library_stats'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('user_score_sketches',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('axis', sa.String(length=20), nullable=False),
+        sa.Column('digest', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'axis')
+    )
+    # Existing scores are added by `flask rebuild-score-sketches`, run once after upgrading
+
+def downgrade() -> None:
+    op.drop_table('user_score_sketches')
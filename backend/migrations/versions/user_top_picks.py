@@ -0,0 +1,30 @@
+"""Add user_top_picks materialized results
+
+Revision ID: user_top_picks
+Revises: ranking_call_metrics
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'user_top_picks'
+down_revision = 'ranking_call_metrics'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('user_top_picks',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('ranking_session_id', sa.BigInteger(), nullable=True),
+        sa.Column('photos', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['ranking_session_id'], ['ranking_sessions.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+def downgrade() -> None:
+    op.drop_table('user_top_picks')
@@ -1,6 +1,7 @@
 import pytest
 from app import create_app
 from app.extensions import db
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 @pytest.fixture(scope='session')
 def app():
@@ -17,4 +18,20 @@ def app():
 @pytest.fixture(scope='function')
 def test_client(app):
     with app.test_client() as client:
-        yield client 
\ No newline at end of file
+        yield client
+
+@pytest.fixture(scope='function')
+def pg_app():
+    """App bound to DATABASE_URL, with every test wrapped in a rolled-back transaction."""
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        session_factory = sessionmaker(bind=connection)
+        sess = scoped_session(session_factory)
+        db.session = sess
+        yield app
+        transaction.rollback()
+        connection.close()
+        sess.remove()
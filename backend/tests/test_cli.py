@@ -0,0 +1,157 @@
+import json
+from app.extensions import db
+from app.models import User, MediaItem, MediaRanking, RankingSession
+from app.services.llm_ranking_service import LLMBasedRankingService
+from app.services.rescore_service import RescoreCheckpoint
+from app.cli import rescore_command, backfill_latest_rankings_command, export_media_command
+from datetime import datetime, timedelta
+import uuid
+
+def create_user_with_items(count):
+    user = User(email=f'cli-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    items = [
+        MediaItem(user_id=user.id, google_media_id=f'cli-{uuid.uuid4()}', base_url=f'http://example.com/{i}')
+        for i in range(count)
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return user, items
+
+def fake_score_item(self, payload):
+    if payload['baseUrl'].endswith('/2'):
+        raise Exception('download failed')
+    return {
+        'scores': {'technical': 7.0, 'aesthetic': 6.0, 'overall': 6.5},
+        'latency_ms': 1200, 'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 250000
+    }
+
+def test_rescore_writes_tagged_rankings_and_resumes(pg_app, tmp_path, mocker):
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+    user, items = create_user_with_items(5)
+    state_file = str(tmp_path / 'state.json')
+    runner = pg_app.test_cli_runner()
+
+    # Interrupted run: only the first two items
+    result = runner.invoke(rescore_command, [
+        '--analysis-type', 'v2', '--state-file', state_file, '--batch-size', '2', '--limit', '2', '--rate', '0'
+    ])
+    assert result.exit_code == 0, result.output
+    assert 'items/s' in result.output and 'ETA' in result.output
+    assert json.load(open(state_file))['processed'] == 2
+
+    # Resume picks up at the persisted cursor
+    result = runner.invoke(rescore_command, [
+        '--analysis-type', 'v2', '--state-file', state_file, '--batch-size', '2', '--rate', '0'
+    ])
+    assert result.exit_code == 0, result.output
+
+    item_ids = [item.id for item in items]
+    rankings = MediaRanking.query.filter(MediaRanking.media_item_id.in_(item_ids)).all()
+    assert sorted(r.media_item_id for r in rankings) == item_ids
+    assert all(r.analysis_type == 'v2' for r in rankings)
+    failed = [r for r in rankings if r.status == 'failed']
+    assert len(failed) == 1 and failed[0].error_message == 'download failed'
+    session = db.session.get(RankingSession, rankings[0].ranking_session_id)
+    assert session.status == 'completed' and session.completed_at is not None
+
+    # Completing the session points each item at its new ranking
+    db.session.expire_all()
+    by_item = {r.media_item_id: r for r in rankings}
+    for item in MediaItem.query.filter(MediaItem.id.in_(item_ids)):
+        if by_item[item.id].status == 'failed':
+            assert item.ai_status == 'failed' and item.latest_ranking_id is None
+        else:
+            assert item.ai_status == 'analyzed' and item.latest_ranking_id == by_item[item.id].id
+
+def test_rescore_resume_skips_batches_committed_after_the_checkpoint(pg_app, tmp_path, mocker):
+    score_item = mocker.patch.object(LLMBasedRankingService, 'score_item', side_effect=lambda payload: fake_score_item(None, payload))
+    user, items = create_user_with_items(4)
+    other_user, other_items = create_user_with_items(2)
+    state_file = str(tmp_path / 'state.json')
+    runner = pg_app.test_cli_runner()
+    args = ['--analysis-type', 'v3', '--state-file', state_file, '--batch-size', '2', '--rate', '0']
+
+    # Crash after the first batch is committed but before its checkpoint is written
+    real_save, saves = RescoreCheckpoint.save, []
+    def save(checkpoint):
+        saves.append(checkpoint.cursor)
+        if len(saves) == 2:
+            raise RuntimeError('killed')
+        real_save(checkpoint)
+    mocker.patch.object(RescoreCheckpoint, 'save', save)
+    result = runner.invoke(rescore_command, args)
+    assert isinstance(result.exception, RuntimeError)
+    assert json.load(open(state_file))['cursor'] == 0 and score_item.call_count == 2
+
+    # Another run of the same analysis type (e.g. with another state file) scores other items meanwhile
+    other = RankingSession(user_id=other_user.id, method='rescore:v3', status='pending')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add_all([MediaRanking(ranking_session_id=other.id, media_item_id=item.id, combined_score=5,
+                                     status='completed') for item in other_items])
+    db.session.commit()
+
+    result = runner.invoke(rescore_command, args)
+    assert result.exit_code == 0, result.output
+    item_ids = [item.id for item in items + other_items]
+    rankings = MediaRanking.query.filter(MediaRanking.media_item_id.in_(item_ids),
+                                         MediaRanking.ranking_session_id != other.id).all()
+    # The committed batch is not scored again, and the other run's rankings are not taken as progress
+    assert sorted(r.media_item_id for r in rankings) == item_ids
+    assert score_item.call_count == 6
+    assert len({r.ranking_session_id for r in rankings}) == 2
+
+def test_rescore_rejects_checkpoint_of_other_analysis_type(pg_app, tmp_path):
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'analysis_type': 'v1', 'cursor': 10}))
+    result = pg_app.test_cli_runner().invoke(rescore_command, ['--analysis-type', 'v2', '--state-file', str(state_file)])
+    assert result.exit_code != 0
+    assert 'v1' in result.output
+
+def test_backfill_latest_rankings(pg_app):
+    user, items = create_user_with_items(3)
+    now = datetime.utcnow()
+    older = RankingSession(user_id=user.id, status='completed', completed_at=now - timedelta(days=1))
+    newer = RankingSession(user_id=user.id, status='completed', completed_at=now)
+    db.session.add_all([older, newer])
+    db.session.flush()
+    old_ranking = MediaRanking(ranking_session_id=older.id, media_item_id=items[0].id, combined_score=5, status='completed')
+    new_ranking = MediaRanking(ranking_session_id=newer.id, media_item_id=items[0].id, combined_score=8, status='completed')
+    only_old = MediaRanking(ranking_session_id=older.id, media_item_id=items[1].id, combined_score=6, status='completed')
+    failed = MediaRanking(ranking_session_id=newer.id, media_item_id=items[2].id, status='failed')
+    db.session.add_all([new_ranking, old_ranking, only_old, failed])
+    db.session.commit()
+
+    result = pg_app.test_cli_runner().invoke(backfill_latest_rankings_command, ['--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Done: 3 media items updated' in result.output
+    db.session.expire_all()
+    assert (items[0].latest_ranking_id, items[0].ai_status) == (new_ranking.id, 'analyzed')
+    assert (items[1].latest_ranking_id, items[1].ai_status) == (only_old.id, 'analyzed')
+    assert (items[2].latest_ranking_id, items[2].ai_status) == (None, 'failed')
+
+    # Already up to date: nothing to change
+    result = pg_app.test_cli_runner().invoke(backfill_latest_rankings_command, [])
+    assert 'Done: 0 media items updated' in result.output
+
+def test_export_media_writes_file(pg_app, tmp_path):
+    user, items = create_user_with_items(3)
+    session = RankingSession(user_id=user.id, status='completed')
+    db.session.add(session)
+    db.session.flush()
+    db.session.add(MediaRanking(ranking_session_id=session.id, media_item_id=items[0].id, combined_score=8, status='completed'))
+    db.session.commit()
+
+    output = tmp_path / 'export.ndjson'
+    result = pg_app.test_cli_runner().invoke(
+        export_media_command, ['--user-id', str(user.id), '--output', str(output), '--chunk-size', '2']
+    )
+    assert result.exit_code == 0, result.output
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(row['id'], row['ranking_combined_score']) for row in rows] == [(items[0].id, 8.0), (items[1].id, None), (items[2].id, None)]
+
+    result = pg_app.test_cli_runner().invoke(export_media_command, ['--format', 'csv', '--user-id', str(user.id)])
+    assert result.exit_code == 0, result.output
+    assert len(result.output.splitlines()) == 4
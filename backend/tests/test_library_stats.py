@@ -0,0 +1,114 @@
+import uuid
+from unittest import mock
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, LibraryStat
+from app.services.llm_ranking_service import LLMBasedRankingService
+from app.services.media_bulk_service import MediaBulkService
+from app.services.media_ingest_service import MediaIngestService
+from app.services.ranking_session_service import RankingSessionService
+from app.services.library_stats_service import LibraryStatsService, ranking_stat_names
+
+def create_user():
+    user = User(email=f'stats-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def fake_score_item(self, payload):
+    if payload['baseUrl'].endswith('/3'):
+        raise Exception('download failed')
+    overall = 9.5 if payload['baseUrl'].endswith('/0') else 6.25
+    return {'scores': {'technical': 7.0, 'aesthetic': 6.0, 'overall': overall}, 'latency_ms': 1000,
+            'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 1000}
+
+def test_ranking_stat_names_bucket_scores():
+    assert ranking_stat_names('completed', 0) == ['rankings.status.completed', 'scores.0']
+    assert ranking_stat_names('completed', 6.99) == ['rankings.status.completed', 'scores.6']
+    assert ranking_stat_names('completed', 10) == ['rankings.status.completed', 'scores.9']
+    assert ranking_stat_names('failed', None) == ['rankings.status.failed']
+    assert ranking_stat_names('pending', 5) == ['rankings.status.pending']
+
+def test_counters_follow_every_write_and_reconcile_fixes_drift(pg_app, mocker):
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+    user = create_user()
+    other = create_user()
+    service = LibraryStatsService()
+    items = MediaIngestService().upsert(user.id, [{'id': f's{i}', 'baseUrl': f'http://example.com/{i}'} for i in range(5)])
+    MediaIngestService().upsert(other.id, [{'id': 'o0', 'baseUrl': 'http://example.com/o'}])
+    item_ids = [item.id for item in items]
+    assert service.counters(user.id) == service.compute_counters(user.id) == {
+        'items.live': 5, 'items.ai_status.pending': 5, 'items.unranked': 5,
+    }
+
+    sessions = RankingSessionService(LLMBasedRankingService())
+    session = sessions.create(user.id, item_ids[:4], 'ai_ranking', 'default')
+    assert service.counters(user.id)['rankings.status.pending'] == 4
+    sessions.rank(session)
+    MediaBulkService().apply(user.id, 'soft_delete', item_ids[1:2])
+    MediaBulkService().apply(user.id, 'hard_delete', item_ids[4:])
+    # Picking a deleted item again restores it
+    MediaIngestService().upsert(user.id, [{'id': 's1', 'baseUrl': 'http://example.com/1'}])
+    MediaBulkService().apply(user.id, 'soft_delete', item_ids[2:3])
+
+    counters = service.counters(user.id)
+    assert counters == service.compute_counters(user.id)
+    assert counters == {
+        'items.live': 3, 'items.deleted': 1, 'items.ai_status.analyzed': 2, 'items.ai_status.failed': 1,
+        'items.ranked': 2, 'items.unranked': 1, 'sessions.status.completed': 1,
+        'rankings.status.completed': 3, 'rankings.status.failed': 1, 'scores.9': 1, 'scores.6': 2,
+    }
+    summary = service.summary(user.id)
+    assert summary['items'] == {
+        'live': 3, 'deleted': 1, 'ranked': 2, 'unranked': 1, 'by_ai_status': {'analyzed': 2, 'failed': 1},
+    }
+    assert summary['sessions'] == {'total': 1, 'by_status': {'completed': 1}}
+    assert summary['rankings'] == {'total': 4, 'by_status': {'completed': 3, 'failed': 1}}
+    assert [bucket['count'] for bucket in summary['score_histogram']] == [0, 0, 0, 0, 0, 0, 2, 0, 0, 1]
+    with mock.patch.object(db.session.get_bind().dialect, 'name', 'sqlite'):
+        assert service.summary(user.id) == summary
+
+    # Counters edited behind the triggers' back are put right by reconciliation
+    db.session.query(LibraryStat).filter_by(user_id=user.id, name='items.live').update({'count': 40})
+    db.session.add(LibraryStat(user_id=user.id, name='items.ai_status.stale', count=2))
+    db.session.query(LibraryStat).filter_by(user_id=user.id, name='scores.9').delete()
+    db.session.expire_all()
+    version = db.session.get(User, user.id).data_version
+    result = service.reconcile([user.id, other.id])
+    assert result == {'users': 2, 'corrected': 3}
+    assert service.counters(user.id) == counters
+    # Corrections invalidate the stats endpoint's ETag; a clean check does not
+    db.session.expire_all()
+    assert db.session.get(User, user.id).data_version == version + 1
+    assert service.reconcile([user.id]) == {'users': 1, 'corrected': 0}
+    db.session.expire_all()
+    assert db.session.get(User, user.id).data_version == version + 1
+
+    # Deleting the user takes their counters along
+    db.session.delete(db.session.get(User, user.id))
+    db.session.flush()
+    assert db.session.query(LibraryStat).filter_by(user_id=user.id).count() == 0
+    assert service.counters(other.id) == {'items.live': 1, 'items.ai_status.pending': 1, 'items.unranked': 1}
+
+def test_counters_follow_rankings_deleted_by_cascade(pg_app, mocker):
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+    user = create_user()
+    service = LibraryStatsService()
+    items = MediaIngestService().upsert(user.id, [{'id': f'c{i}', 'baseUrl': f'http://example.com/{i}'} for i in range(3)])
+    item_ids = [item.id for item in items]
+    sessions = RankingSessionService(LLMBasedRankingService())
+    session = sessions.create(user.id, item_ids, 'ai_ranking', 'default')
+    sessions.rank(session)
+    assert service.counters(user.id)['rankings.status.completed'] == 3
+
+    # Hard-deleting a ranked item takes its ranking along (media_items ON DELETE CASCADE)
+    MediaBulkService().apply(user.id, 'hard_delete', item_ids[:1])
+    counters = service.counters(user.id)
+    assert counters == service.compute_counters(user.id)
+    assert (counters['rankings.status.completed'], counters['scores.6']) == (2, 2) and 'scores.9' not in counters
+
+    # So does deleting the session, after which its rankings can no longer be joined to it
+    db.session.delete(db.session.get(RankingSession, session.id))
+    db.session.flush()
+    counters = service.counters(user.id)
+    assert counters == service.compute_counters(user.id)
+    assert not any(name.startswith(('rankings.', 'scores.', 'sessions.')) for name in counters)
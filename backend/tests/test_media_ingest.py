@@ -0,0 +1,83 @@
+import io
+import json
+import uuid
+import pytest
+from app.extensions import db
+from app.models import User, MediaItem
+from app.services.media_ingest_service import MediaIngestService
+from app.services.json_stream import iter_json_array, iter_ndjson
+
+def create_user():
+    user = User(email=f'ingest-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def test_upsert_chunks_and_dedupes(pg_app):
+    user = create_user()
+    service = MediaIngestService(chunk_size=2)
+    items = [{'id': f'g{i}', 'baseUrl': f'http://example.com/{i}'} for i in range(5)]
+    items.append({'id': 'g1', 'baseUrl': 'http://example.com/1-dup'})
+    stored = service.upsert(user.id, items)
+    assert [item.google_media_id for item in stored] == ['g0', 'g1', 'g2', 'g3', 'g4']
+    assert stored[1].base_url == 'http://example.com/1-dup'
+    assert MediaItem.query.filter_by(user_id=user.id).count() == 5
+
+def test_portable_fallback_matches_upsert(pg_app):
+    user = create_user()
+    service = MediaIngestService()
+    first = service.upsert(user.id, [{'id': 'p0', 'baseUrl': 'http://example.com/0'}])
+    rows = [
+        service.normalize(user.id, {'id': 'p0', 'baseUrl': 'http://example.com/0-new', 'filename': 'a.jpg'}),
+        service.normalize(user.id, {'id': 'p1', 'baseUrl': 'http://example.com/1'}),
+    ]
+    stored = service._upsert_chunk_portable(rows)
+    assert stored[0].id == first[0].id
+    assert stored[0].base_url == 'http://example.com/0-new' and stored[0].filename == 'a.jpg'
+    assert stored[1].id is not None
+
+def test_iter_json_array_across_read_boundaries():
+    items = [{'id': f'é{i}', 'nested': {'n': [i, 1.5, None]}} for i in range(20)] + [12345, 'x']
+    body = json.dumps(items, ensure_ascii=False).encode('utf-8')
+    assert list(iter_json_array(io.BytesIO(body), read_size=7)) == items
+    assert list(iter_json_array(io.BytesIO(b' [ ] '))) == []
+
+    ndjson = '\n'.join(json.dumps(item) for item in items[:3]).encode('utf-8') + b'\n\n'
+    assert list(iter_ndjson(io.BytesIO(ndjson), read_size=5)) == items[:3]
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(b'{"id": 1}')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(b'[{"id": 1}, {"id":')))
+    # Rejected like the non-streaming parser rejects them, wherever the reads split the body
+    for body, message in ((b'[1, ]', 'Trailing comma'), (b'[1] x', 'after JSON array'), (b'[] ]', 'after JSON array')):
+        for read_size in (1, 64):
+            with pytest.raises(ValueError, match=message):
+                list(iter_json_array(io.BytesIO(body), read_size=read_size))
+    assert list(iter_json_array(io.BytesIO(b'[1]' + b' ' * 1000 + b'\n'), read_size=3)) == [1]
+
+def test_iter_json_array_bounds_buffering():
+    # Tokens that a read can cut anywhere: escapes, literals, exponents, negative numbers
+    items = [{'a': 'xé\ny', 'b': [True, False, None, -1.5e3, 12]}, -0.25, 'tail']
+    body = json.dumps(items).encode('utf-8')
+    for read_size in range(1, 12):
+        assert list(iter_json_array(io.BytesIO(body), read_size=read_size)) == items
+
+    class CountingStream(io.BytesIO):
+        reads = 0
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    # A malformed element fails at once instead of pulling in the rest of the body
+    stream = CountingStream(b'[{"id": 1 "x": 2}, ' + b'{"id": 3}, ' * 10000 + b'{}]')
+    with pytest.raises(ValueError, match='Malformed'):
+        list(iter_json_array(stream, read_size=64))
+    assert stream.reads == 1
+
+    big = json.dumps([{'id': 'x' * 5000}]).encode('utf-8')
+    assert len(list(iter_json_array(io.BytesIO(big), read_size=64, max_element_size=6000))) == 1
+    with pytest.raises(ValueError, match='larger than'):
+        list(iter_json_array(io.BytesIO(big), read_size=64, max_element_size=1000))
+    with pytest.raises(ValueError, match='longer than'):
+        list(iter_ndjson(io.BytesIO(b'{"id": "' + b'x' * 5000 + b'"}\n'), read_size=64, max_element_size=1000))
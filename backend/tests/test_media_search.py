@@ -0,0 +1,91 @@
+import uuid
+import pytest
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking
+from app.services.media_search_service import InvertedIndex, MediaSearchService, tokenize
+
+def create_library():
+    user = User(email=f'search-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    texts = [
+        ('IMG_2041.JPG', 'Sunset over the beach at Goa', ['beach']),
+        ('beach-day.jpg', 'Kids building sandcastles', None),
+        ('Café_au_lait.png', 'Morning coffee, café in Paris', ['food']),
+        ('DSC0001.jpg', None, None),
+        ('sunset2.jpg', 'Another SUNSET, another beach', ['sunset', 'beach']),
+    ]
+    items = [
+        MediaItem(user_id=user.id, google_media_id=f'search-{i}', base_url=f'http://example.com/{i}',
+                  filename=filename, description=description, tags_json=tags)
+        for i, (filename, description, tags) in enumerate(texts)
+    ]
+    db.session.add_all(items)
+    session = RankingSession(user_id=user.id, status='completed')
+    db.session.add(session)
+    db.session.flush()
+    ranking = MediaRanking(ranking_session_id=session.id, media_item_id=items[3].id, combined_score=7,
+                           tags_json=['portrait', 'beach'], status='completed')
+    db.session.add(ranking)
+    db.session.flush()
+    items[3].latest_ranking_id = ranking.id
+    db.session.flush()
+    return user, items
+
+def test_tokenize_matches_postgres_words(pg_app):
+    text = 'IMG_2041.JPG Café-au-lait, ÉTÉ 2024!'
+    vector = db.session.execute(db.text(
+        "SELECT to_tsvector('simple'::regconfig, regexp_replace(lower(:text), '[^[:alnum:]]+', ' ', 'g'))::text"
+    ), {'text': text}).scalar_one()
+    words = {lexeme.split(':')[0].strip("'") for lexeme in vector.split()}
+    assert set(tokenize(text)) == words == {'img', '2041', 'jpg', 'café', 'au', 'lait', 'été', '2024'}
+
+@pytest.mark.parametrize('query, tags', [
+    ('beach', []),
+    ('sunset beach', []),
+    ('CAFÉ', []),
+    ('img 2041', []),
+    ('portrait', []),
+    (None, ['beach']),
+    ('sunset', ['beach']),
+    ('nothing', []),
+])
+def test_in_process_fallback_matches_postgres(pg_app, query, tags):
+    user, items = create_library()
+    service = MediaSearchService()
+    words = list(dict.fromkeys(tokenize(query)))
+    postgres = service._search_postgres(user.id, words, tags, 100, None)
+    fallback = service._search_in_process(user.id, words, tags, 100, None)
+    assert {item_id for item_id, _ in postgres} == {item_id for item_id, _ in fallback}
+
+def test_keyset_pages_and_index_cache(pg_app):
+    user, items = create_library()
+    service = MediaSearchService()
+    for method in (service._search_postgres, service._search_in_process):
+        seen, position = [], None
+        while True:
+            page = method(user.id, ['beach'], [], 2, position)
+            seen.extend(page)
+            if len(page) < 2:
+                break
+            position = page[-1][1], page[-1][0]
+        assert len({item_id for item_id, _ in seen}) == len(seen) == 4
+        assert [score for _, score in seen] == sorted((score for _, score in seen), reverse=True)
+
+    # The fallback index is rebuilt only when the user's data changes
+    index = service._index(user.id)
+    assert service._index(user.id) is index
+    User.bump_data_version(user.id)
+    assert service._index(user.id) is not index
+
+def test_inverted_index_scores():
+    index = InvertedIndex([
+        (1, 'beach.jpg', 'beach beach', None, None),
+        (2, 'x.jpg', 'a long description with the word beach in it', None, None),
+        (3, 'y.jpg', None, ['beach'], None),
+    ])
+    scores = index.search(['beach'], [])
+    assert scores[1] > scores[2] > 0 and scores[3] == 1.0
+    assert index.search([], ['beach']) == {3: 0.0}
+    with pytest.raises(ValueError):
+        MediaSearchService().search(1, ' ,. ', [], 10)
@@ -0,0 +1,226 @@
+"""
+Query-plan regression suite: every statement a route issues is run through EXPLAIN against a
+seeded database, and the test fails if the plan sequentially scans one of the large tables.
+"""
+import json
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+from app.extensions import db
+from app.services.llm_ranking_service import LLMBasedRankingService
+
+LARGE_TABLES = {'media_items', 'media_rankings', 'ranking_sessions'}
+USERS = 50
+ITEMS_PER_USER = 400
+SESSIONS_PER_USER = 40
+
+SEED_SQL = [
+    f"""
+    INSERT INTO users (email, display_name, data_version)
+    SELECT 'plan-' || u || '@example.com', 'Plan User ' || u, 0 FROM generate_series(1, {USERS}) AS u
+    """,
+    f"""
+    INSERT INTO media_items (user_id, google_media_id, base_url, creation_time, is_deleted, ai_status, updated_at)
+    SELECT users.id, 'plan-' || users.id || '-' || i, 'http://example.com/' || users.id || '/' || i,
+           now() - (i || ' minutes')::interval, i % 50 = 0, CASE WHEN i % 2 = 0 THEN 'analyzed' ELSE 'pending' END,
+           now() - interval '1 day' + (i || ' seconds')::interval
+    FROM users CROSS JOIN generate_series(1, {ITEMS_PER_USER}) AS i
+    WHERE users.email LIKE 'plan-%'
+    """,
+    f"""
+    INSERT INTO ranking_sessions (user_id, method, status, completed_at)
+    SELECT users.id, 'ai_ranking', 'completed', now() - (s || ' hours')::interval
+    FROM users CROSS JOIN generate_series(1, {SESSIONS_PER_USER}) AS s
+    WHERE users.email LIKE 'plan-%'
+    """,
+    f"""
+    INSERT INTO media_rankings (ranking_session_id, media_item_id, combined_score, analysis_type, status,
+                                analyzed_at, latency_ms, updated_at)
+    SELECT sessions.id, media_items.id, (media_items.id % 1000) / 100.0, 'default', 'completed',
+           now() - interval '1 hour', 1500, now() - interval '1 day'
+    FROM media_items
+    JOIN LATERAL (
+        SELECT id FROM ranking_sessions
+        WHERE ranking_sessions.user_id = media_items.user_id
+        ORDER BY id LIMIT 1 OFFSET (media_items.id % {SESSIONS_PER_USER})
+    ) AS sessions ON true
+    WHERE media_items.google_media_id LIKE 'plan-%'
+    """,
+    """
+    UPDATE media_items SET latest_ranking_id = media_rankings.id
+    FROM media_rankings WHERE media_rankings.media_item_id = media_items.id
+    """,
+    "SELECT gin_clean_pending_list('idx_media_rankings_tags'::regclass)",
+    "SELECT gin_clean_pending_list('idx_media_items_tags'::regclass)",
+    "SELECT gin_clean_pending_list('idx_media_items_search'::regclass)",
+    'ANALYZE users', 'ANALYZE media_items', 'ANALYZE ranking_sessions', 'ANALYZE media_rankings',
+]
+
+
+@pytest.fixture
+def seeded(pg_app):
+    for statement in SEED_SQL:
+        db.session.execute(text(statement))
+    user_id = db.session.execute(text("SELECT id FROM users WHERE email = 'plan-1@example.com'")).scalar_one()
+    item_ids = db.session.execute(text(
+        'SELECT id FROM media_items WHERE user_id = :user_id AND NOT is_deleted ORDER BY id LIMIT 5'
+    ), {'user_id': user_id}).scalars().all()
+    session_id = db.session.execute(text(
+        'SELECT id FROM ranking_sessions WHERE user_id = :user_id ORDER BY id LIMIT 1'
+    ), {'user_id': user_id}).scalar_one()
+    token = create_access_token(identity=user_id)
+    return {
+        'client': pg_app.test_client(),
+        'headers': {'Authorization': f'Bearer {token}'},
+        'item_ids': item_ids,
+        'session_id': session_id,
+    }
+
+
+def capture_statements(fn):
+    """Run fn and return its result with the single-row statements it sent to the database."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return result, statements
+
+
+def explain(statement, parameters=None):
+    """Return the root node of a statement's JSON plan."""
+    cursor = db.session.connection().connection.cursor()
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+    return cursor.fetchone()[0][0]['Plan']
+
+
+def sequential_scans(plan):
+    """Yield the large tables a JSON plan scans sequentially."""
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in LARGE_TABLES:
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from sequential_scans(child)
+
+
+def fake_score_item(self, item):
+    return {'scores': {'technical': 6.0, 'aesthetic': 7.0, 'overall': 6.5}, 'latency_ms': 1000,
+            'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 1000}
+
+
+def list_two_pages(client, headers, seeded):
+    page = client.get('/api/media/items?limit=50', headers=headers).get_json()
+    return client.get(f"/api/media/items?limit=50&cursor={page['next_cursor']}", headers=headers)
+
+
+def sync_two_pages(client, headers, seeded):
+    page = client.get('/api/sync/changes?limit=50', headers=headers).get_json()
+    return client.get(f"/api/sync/changes?limit=50&since={page['next_cursor']}", headers=headers)
+
+
+def sessions_two_pages(client, headers, seeded):
+    page = client.get('/api/ranking/sessions?limit=10', headers=headers).get_json()
+    return client.get(f"/api/ranking/sessions?limit=10&cursor={page['next_cursor']}", headers=headers)
+
+
+def session_rankings_two_pages(client, headers, seeded):
+    url = f"/api/ranking/sessions/{seeded['session_id']}/rankings"
+    page = client.get(f'{url}?limit=3&embed=media_item', headers=headers).get_json()
+    return client.get(f"{url}?limit=3&min_score=1&tags=beach&cursor={page['next_cursor']}", headers=headers)
+
+
+def bulk_operations(client, headers, seeded):
+    for operation in ('add_tags', 'remove_tags', 'soft_delete', 'restore', 'hard_delete'):
+        response = client.post('/api/media/items/bulk', json={'operation': operation, 'ids': seeded['item_ids'], 'tags': ['x']},
+                               headers=headers)
+        assert response.status_code == 200, response.get_json()
+    return response
+
+
+def create_and_rank(client, headers, seeded):
+    session = client.post('/api/ranking/sessions', json={'media_item_ids': seeded['item_ids']}, headers=headers).get_json()
+    return client.post(f"/api/ranking/sessions/{session['id']}/rank", headers=headers)
+
+
+def export_all(client, headers, seeded):
+    # Read the streamed body so every chunk's query runs while statements are captured
+    response = client.get('/api/media/export', headers=headers)
+    response.get_data()
+    return response
+
+
+ROUTES = {
+    'media_list': list_two_pages,
+    'media_list_filtered': lambda client, headers, seeded: client.get(
+        '/api/media/items?ai_status=analyzed&embed=latest_ranking&fields=base_url', headers=headers),
+    'media_multi_get': lambda client, headers, seeded: client.get(
+        f"/api/media/items/batch?ids={','.join(map(str, seeded['item_ids']))}", headers=headers),
+    'media_get': lambda client, headers, seeded: client.get(
+        f"/api/media/items/{seeded['item_ids'][0]}", headers=headers),
+    'media_update': lambda client, headers, seeded: client.put(
+        f"/api/media/items/{seeded['item_ids'][0]}", json={'filename': 'x.jpg'}, headers=headers),
+    'media_delete': lambda client, headers, seeded: client.delete(
+        f"/api/media/items/{seeded['item_ids'][0]}", headers=headers),
+    'media_batch_upsert': lambda client, headers, seeded: client.post(
+        '/api/media/items/batch', json=[{'id': f'new-{i}', 'baseUrl': 'http://example.com/new'} for i in range(3)],
+        headers=headers),
+    'media_search': lambda client, headers, seeded: client.get(
+        '/api/media/search?q=plan+beach&tags=sunset&embed=latest_ranking', headers=headers),
+    'media_timeline': lambda client, headers, seeded: client.get('/api/media/timeline?granularity=day', headers=headers),
+    'media_list_range': lambda client, headers, seeded: client.get(
+        '/api/media/items?created_from=2020-01-01T00:00:00Z&created_to=2030-01-01T00:00:00Z', headers=headers),
+    'media_bulk': bulk_operations,
+    'media_export': export_all,
+    'media_stats': lambda client, headers, seeded: client.get('/api/media/stats', headers=headers),
+    'top_picks': lambda client, headers, seeded: client.get('/api/photos/top-picks', headers=headers),
+    'sessions_list': sessions_two_pages,
+    'session_get': lambda client, headers, seeded: client.get(
+        f"/api/ranking/sessions/{seeded['session_id']}", headers=headers),
+    'session_rankings': session_rankings_two_pages,
+    'session_estimate': lambda client, headers, seeded: client.post(
+        '/api/ranking/sessions/estimate', json={'media_item_ids': seeded['item_ids']}, headers=headers),
+    'session_create_and_rank': create_and_rank,
+    'changes_feed': sync_two_pages,
+}
+
+
+@pytest.mark.parametrize('route', sorted(ROUTES))
+def test_route_queries_use_indexes(seeded, route, mocker):
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+    response, statements = capture_statements(lambda: ROUTES[route](seeded['client'], seeded['headers'], seeded))
+    assert response.status_code < 400, response.get_json()
+    assert statements, f'{route} issued no queries'
+    failures = []
+    for statement, parameters in statements:
+        plan = explain(statement, parameters)
+        scanned = sorted(set(sequential_scans(plan)))
+        if scanned:
+            failures.append(f"Seq Scan on {', '.join(scanned)}:\n{statement}\n{json.dumps(plan, indent=1)}")
+    assert not failures, '\n\n'.join(failures)
+
+
+def test_detects_sequential_scans(seeded):
+    plan = explain("SELECT id FROM media_items WHERE filename = 'x.jpg'")
+    assert list(sequential_scans(plan)) == ['media_items']
+
+
+def indexes_used(plan):
+    """Yield the names of the indexes a JSON plan reads."""
+    if 'Index Name' in plan:
+        yield plan['Index Name']
+    for child in plan.get('Plans', []):
+        yield from indexes_used(child)
+
+
+def test_changes_feed_reads_only_the_users_rankings(seeded):
+    _, statements = capture_statements(lambda: sync_two_pages(seeded['client'], seeded['headers'], seeded))
+    ranking_statements = [(s, p) for s, p in statements if 'FROM media_rankings' in s]
+    assert ranking_statements
+    for statement, parameters in ranking_statements:
+        # A per-user index range, not a walk of every user's changes filtered afterwards
+        assert 'idx_media_rankings_user_updated' in set(indexes_used(explain(statement, parameters))), statement
@@ -0,0 +1,135 @@
+import time
+import threading
+import pytest
+import requests
+from cohere.error import CohereAPIError
+from app.services.resilience import (
+    CallCancelledError, CircuitBreaker, CircuitOpenError, LatencyTracker, hedged_call, is_dependency_failure
+)
+from app.services.coalesce import SingleFlight
+
+def failing():
+    raise ConnectionError('down')
+
+def test_circuit_breaker_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.snapshot()['state'] == 'open'
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.snapshot() == {
+        'state': 'closed', 'consecutive_failures': 0, 'retry_in_seconds': 0.0, 'hedges': 0, 'hedges_skipped': 0
+    }
+
+def test_client_errors_do_not_trip_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=1, is_failure=is_dependency_failure)
+    response = requests.Response()
+    response.status_code = 403
+
+    def forbidden():
+        raise requests.HTTPError(response=response)
+
+    with pytest.raises(requests.HTTPError):
+        breaker.call(forbidden)
+    assert breaker.snapshot()['state'] == 'closed'
+
+    def rejected():
+        raise CohereAPIError('invalid image', http_status=400)
+
+    with pytest.raises(CohereAPIError):
+        breaker.call(rejected)
+    assert breaker.snapshot()['state'] == 'closed'
+
+    def unavailable():
+        raise CohereAPIError('unavailable', http_status=503)
+
+    with pytest.raises(CohereAPIError):
+        breaker.call(unavailable)
+    assert breaker.snapshot()['state'] == 'open'
+
+def test_hedged_call_returns_faster_second_attempt():
+    attempts = []
+    threads = []
+    primary_cancelled = threading.Event()
+
+    def slow_then_fast(cancelled):
+        attempts.append(1)
+        threads.append(threading.current_thread())
+        if len(attempts) == 1:
+            cancelled.wait(0.5)
+            primary_cancelled.set()
+            raise CallCancelledError('hedge won')
+        time.sleep(0.01)
+        return len(attempts)
+
+    breaker = CircuitBreaker('test')
+    started = time.monotonic()
+    assert hedged_call(slow_then_fast, hedge_after=0.05, breaker=breaker) == 2
+    assert time.monotonic() - started < 0.4
+    # The primary attempt runs in the caller's thread and is cancelled once the hedge wins
+    assert threads[0] is threading.current_thread() and threads[1] is not threads[0]
+    assert primary_cancelled.is_set()
+    assert breaker.snapshot()['hedges'] == 1
+
+def test_hedged_call_skips_hedge_when_executor_is_saturated(mocker):
+    mocker.patch('app.services.resilience._hedge_slots', threading.BoundedSemaphore(1))
+    hedge_cancelled = threading.Event()
+    attempts = []
+
+    def slow(cancelled):
+        attempts.append(1)
+        if len(attempts) == 2:
+            # The losing hedge is told to stop once the primary attempt wins
+            if cancelled.wait(1):
+                hedge_cancelled.set()
+            raise CallCancelledError('primary won')
+        time.sleep(0.2)
+        return 'primary'
+
+    breaker = CircuitBreaker('test')
+    outer = threading.Thread(target=lambda: hedged_call(slow, hedge_after=0.02, breaker=breaker))
+    outer.start()
+    time.sleep(0.1)
+    # The only hedge slot is taken by the first call's hedge, so this call runs unhedged
+    assert hedged_call(lambda cancelled: time.sleep(0.05) or 'second', hedge_after=0.01, breaker=breaker) == 'second'
+    outer.join()
+    time.sleep(0.05)
+    assert hedge_cancelled.is_set()
+    assert (breaker.snapshot()['hedges'], breaker.snapshot()['hedges_skipped']) == (1, 1)
+
+def test_latency_tracker_needs_min_samples():
+    tracker = LatencyTracker(window=10, min_samples=3)
+    tracker.record(1.0)
+    assert tracker.percentile(0.95) is None
+    for seconds in (2.0, 3.0, 4.0):
+        tracker.record(seconds)
+    assert tracker.percentile(0.95) == 4.0
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(1)
+        return 'result'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do('key', slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['result'] * 5
+    assert len(calls) == 1
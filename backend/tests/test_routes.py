@@ -3,8 +3,13 @@ from flask import Flask
 from app import create_app
 from app.extensions import db
 from app.models.user import User
+from app.models import MediaItem, RankingSession, MediaRanking, UserTopPicks
 from sqlalchemy.orm import scoped_session, sessionmaker
+import json
 import uuid
+from datetime import datetime
+from app.config import Config
+
 
 @pytest.fixture(scope='function')
 def test_client():
@@ -22,10 +27,13 @@ def test_client():
         connection.close()
         sess.remove()
 
+
 def test_health_check(test_client):
     response = test_client.get('/api/health')
     assert response.status_code == 200
-    assert response.json == {'status': 'healthy'}
+    assert response.json['status'] == 'healthy'
+    assert isinstance(response.json['circuit_breakers'], dict)
+
 
 # --- Auth Endpoints ---
 def test_register_and_login(test_client):
@@ -54,25 +62,30 @@ def test_register_and_login(test_client):
     assert 'access_token' in data
     # The backend does not return a refresh_token, so we do not check for it.
 
+
 @pytest.mark.skip(reason="Backend does not return refresh_token; skipping refresh token test.")
 def test_refresh_token(test_client):
     pass
 
+
 def test_login_invalid_credentials(test_client):
     payload = {'email': 'notexist@example.com', 'password': 'wrongpass'}
     response = test_client.post('/api/auth/login', json=payload)
     assert response.status_code == 401
 
+
 def test_register_missing_fields(test_client):
     payload = {'email': 'missing@example.com'}
     response = test_client.post('/api/auth/register', json=payload)
     assert response.status_code == 400
 
+
 def test_forgot_password(test_client):
     payload = {'email': 'testuser@example.com'}
     response = test_client.post('/api/auth/forgot-password', json=payload)
     assert response.status_code in (200, 202)
 
+
 def test_reset_password_invalid_token(test_client):
     payload = {'token': 'invalidtoken', 'password': 'NewPass123'}
     response = test_client.post('/api/auth/reset-password', json=payload)
@@ -83,6 +96,7 @@ def test_reset_password_invalid_token(test_client):
 
 # More tests for refresh, verify, forgot/reset password, etc. will be added next.
 
+
 def get_jwt_token(client, email, password, name="Test User"):  # Helper for tests
     client.post('/api/auth/register', json={
         'email': email,
@@ -101,6 +115,7 @@ def get_jwt_token(client, email, password, name="Test User"):  # Helper for test
     })
     return resp.get_json().get('access_token')
 
+
 def test_media_item_crud(test_client):
     token = get_jwt_token(test_client, 'mediauser@example.com', 'MediaPass123')
     headers = {'Authorization': f'Bearer {token}'}
@@ -127,7 +142,7 @@ def test_media_item_crud(test_client):
     # List
     resp = test_client.get('/api/media/items', headers=headers)
     assert resp.status_code == 200
-    items = resp.get_json()
+    items = resp.get_json()['items']
     assert any(i['id'] == item_id for i in items)
 
     # Get by ID
@@ -152,6 +167,7 @@ def test_media_item_crud(test_client):
     resp = test_client.get(f'/api/media/items/{item_id}', headers=headers)
     assert resp.status_code == 404
 
+
 def test_media_item_edge_cases(test_client):
     token = get_jwt_token(test_client, 'edgeuser@example.com', 'EdgePass123')
     headers = {'Authorization': f'Bearer {token}'}
@@ -171,4 +187,849 @@ def test_media_item_edge_cases(test_client):
 
     # Delete non-existent item
     resp = test_client.delete('/api/media/items/999999', headers=headers)
-    assert resp.status_code == 404 
\ No newline at end of file
+    assert resp.status_code == 404 
+
+
+def test_estimate_ranking_session(test_client):
+    token = get_jwt_token(test_client, 'estimateuser@example.com', 'EstimatePass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [
+        {'id': f'estimate-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'}
+        for i in range(4)
+    ]
+    resp = test_client.post('/api/media/items/batch', json=payload, headers=headers)
+    assert resp.status_code == 201
+    item_ids = [item['id'] for item in resp.get_json()]
+
+    # One item already scored with the default analysis type, with recorded call metrics
+    user = User.query.filter_by(email='estimateuser@example.com').first()
+    session = RankingSession(user_id=user.id, status='completed')
+    db.session.add(session)
+    db.session.flush()
+    db.session.add(MediaRanking(
+        ranking_session_id=session.id, media_item_id=item_ids[0], combined_score=7.5,
+        analysis_type='default', status='completed', analyzed_at=datetime.utcnow(),
+        latency_ms=2000, input_tokens=1000, output_tokens=100, image_bytes=500000
+    ))
+    db.session.commit()
+
+    resp = test_client.post('/api/ranking/sessions/estimate', json={
+        'media_item_ids': item_ids + [999999999]
+    }, headers=headers)
+    assert resp.status_code == 200
+    estimate = resp.get_json()
+    assert estimate['item_count'] == 4
+    assert estimate['unknown_item_ids'] == [999999999]
+    assert estimate['cached_items'] == 1
+    assert estimate['expected_llm_calls'] == 3
+    assert estimate['bytes_to_download'] > 0
+    assert estimate['wall_time_seconds'] > 0
+    assert estimate['input_tokens'] > 0 and estimate['estimated_cost_usd'] >= 0
+    assert estimate['within_limit'] is True
+    assert estimate['suggested_batches'] == [4]
+
+    resp = test_client.post('/api/ranking/sessions/estimate', json={}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_create_ranking_session_bulk_and_ownership(test_client):
+    from app.api import routes
+    token = get_jwt_token(test_client, 'sessionuser@example.com', 'SessionPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'session-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    other_token = get_jwt_token(test_client, 'sessionother@example.com', 'SessionPass123')
+    other_item = test_client.post('/api/media/items/batch', json=[{'id': 'other', 'baseUrl': 'http://example.com/o.jpg'}],
+                                  headers={'Authorization': f'Bearer {other_token}'}).get_json()[0]
+
+    resp = test_client.post('/api/ranking/sessions', json={'media_item_ids': item_ids + [other_item['id']]}, headers=headers)
+    assert resp.status_code == 404
+    assert resp.get_json()['media_item_ids'] == [other_item['id']]
+    assert RankingSession.query.count() == 0
+
+    resp = test_client.post('/api/ranking/sessions', json={'media_items': [{'id': i} for i in item_ids + item_ids[:1]]}, headers=headers)
+    assert resp.status_code == 201
+    session = resp.get_json()
+    assert session['status'] == 'pending' and session['item_count'] == 3
+    rankings = MediaRanking.query.filter_by(ranking_session_id=session['id']).all()
+    assert sorted(r.media_item_id for r in rankings) == sorted(item_ids)
+    assert {(r.status, r.analysis_type) for r in rankings} == {('pending', Config.RANKING_ANALYSIS_TYPE)}
+
+    max_items = routes.ranking_session_service.max_items
+    routes.ranking_session_service.max_items = 2
+    try:
+        resp = test_client.post('/api/ranking/sessions', json={'media_item_ids': item_ids}, headers=headers)
+        assert resp.status_code == 400
+    finally:
+        routes.ranking_session_service.max_items = max_items
+    resp = test_client.post('/api/ranking/sessions', json={}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_rank_media_items_bulk_write_back(test_client, mocker):
+    from app.services.llm_ranking_service import LLMBasedRankingService
+    from app.services.score_sketch_service import ScoreSketchService
+    token = get_jwt_token(test_client, 'rankuser@example.com', 'RankPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'rank-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+
+    # The first item already has a score for the default analysis type
+    user = User.query.filter_by(email='rankuser@example.com').first()
+    previous = RankingSession(user_id=user.id, status='completed', completed_at=datetime.utcnow())
+    db.session.add(previous)
+    db.session.flush()
+    db.session.add(MediaRanking(ranking_session_id=previous.id, media_item_id=item_ids[0], combined_score=9.5,
+                                llm_reasoning={'overall': 9.5}, analysis_type=Config.RANKING_ANALYSIS_TYPE, status='completed'))
+    ScoreSketchService.add(user.id, [{'status': 'completed', 'combined_score': 9.5}])
+    db.session.commit()
+
+    def fake_score_item(self, item):
+        if item['id'] == item_ids[2]:
+            raise RuntimeError('LLM unavailable')
+        return {'scores': {'technical': 6.0, 'aesthetic': 7.0, 'overall': 6.5}, 'latency_ms': 1200,
+                'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 1000}
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+
+    session_id = test_client.post('/api/ranking/sessions', json={'media_item_ids': item_ids}, headers=headers).get_json()['id']
+    resp = test_client.post(f'/api/ranking/sessions/{session_id}/rank', headers=headers)
+    assert resp.status_code == 200
+    result = resp.get_json()
+    assert (result['ranked'], result['cached'], result['failed']) == (1, 1, 1)
+    assert result['status'] == 'completed' and result['completed_at'] is not None
+
+    db.session.expire_all()
+    rankings = {r.media_item_id: r for r in MediaRanking.query.filter_by(ranking_session_id=session_id)}
+    assert float(rankings[item_ids[0]].combined_score) == 9.5 and rankings[item_ids[0]].latency_ms is None
+    assert float(rankings[item_ids[1]].combined_score) == 6.5 and rankings[item_ids[1]].llm_reasoning['technical'] == 6.0
+    assert rankings[item_ids[1]].latency_ms == 1200 and rankings[item_ids[1]].analyzed_at is not None
+    assert rankings[item_ids[2]].status == 'failed' and 'LLM unavailable' in rankings[item_ids[2]].error_message
+
+    photos = test_client.get('/api/photos/top-picks', headers=headers).get_json()['photos']
+    assert [photo['combined_score'] for photo in photos] == [9.5, 6.5]
+    # The earlier score and the one fresh score are the user's whole distribution; the cached copy is not added again
+    assert [photo['percentile'] for photo in photos] == [0.75, 0.25]
+
+    resp = test_client.get('/api/media/items?embed=latest_ranking&fields=ai_status', headers=headers)
+    embedded = {item['id']: item for item in resp.get_json()['items']}
+    assert embedded[item_ids[0]]['ai_status'] == 'analyzed'
+    assert embedded[item_ids[0]]['latest_ranking']['combined_score'] == 9.5
+    assert embedded[item_ids[0]]['latest_ranking']['ranking_session_id'] == session_id
+    assert embedded[item_ids[1]]['latest_ranking']['technical_score'] == 6.0
+    assert embedded[item_ids[1]]['latest_ranking']['percentiles'] == {'technical': 0.5, 'aesthetic': 0.5, 'combined': 0.25}
+    assert embedded[item_ids[2]]['ai_status'] == 'failed' and embedded[item_ids[2]]['latest_ranking'] is None
+    assert test_client.get('/api/media/items?embed=owner', headers=headers).status_code == 400
+
+    resp = test_client.post('/api/ranking/sessions/999999999/rank', headers=headers)
+    assert resp.status_code == 404
+
+
+def test_ranking_sessions_paginated_with_progress(test_client):
+    token = get_jwt_token(test_client, 'sessionlist@example.com', 'SessionPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'list-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+
+    user = User.query.filter_by(email='sessionlist@example.com').first()
+    sessions = [RankingSession(user_id=user.id, initiated_at=datetime(2024, 1, day), status='completed') for day in (1, 2, 3)]
+    db.session.add_all(sessions)
+    db.session.flush()
+    # The newest session: two scored items and one failure
+    db.session.add_all([
+        MediaRanking(ranking_session_id=sessions[2].id, media_item_id=item_ids[0], combined_score=7.5, status='completed'),
+        MediaRanking(ranking_session_id=sessions[2].id, media_item_id=item_ids[1], combined_score=8.25, status='completed'),
+        MediaRanking(ranking_session_id=sessions[2].id, media_item_id=item_ids[2], status='failed'),
+        MediaRanking(ranking_session_id=sessions[1].id, media_item_id=item_ids[0], status='pending'),
+    ])
+    db.session.commit()
+
+    resp = test_client.get('/api/ranking/sessions?limit=2', headers=headers)
+    assert resp.status_code == 200
+    page = resp.get_json()
+    assert [s['id'] for s in page['sessions']] == [sessions[2].id, sessions[1].id]
+    newest, middle = page['sessions']
+    assert (newest['total'], newest['completed'], newest['failed'], newest['best_score']) == (3, 2, 1, 8.25)
+    assert (middle['total'], middle['completed'], middle['failed'], middle['best_score']) == (1, 0, 0, None)
+
+    page = test_client.get(f"/api/ranking/sessions?limit=2&cursor={page['next_cursor']}", headers=headers).get_json()
+    assert [s['id'] for s in page['sessions']] == [sessions[0].id]
+    assert page['sessions'][0]['total'] == 0 and page['next_cursor'] is None
+    assert test_client.get('/api/ranking/sessions?cursor=bogus', headers=headers).status_code == 400
+
+
+def test_session_rankings_keyset_pages(test_client):
+    token = get_jwt_token(test_client, 'sessionrankings@example.com', 'RankingsPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'ranked-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(6)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+
+    user = User.query.filter_by(email='sessionrankings@example.com').first()
+    session = RankingSession(user_id=user.id, status='completed')
+    db.session.add(session)
+    db.session.flush()
+    # Two items tie on 8.0; the last item is unscored
+    scores = [9.0, 8.0, 8.0, 6.5, 3.0, None]
+    tags = [['beach', 'sunset'], ['beach'], ['city'], ['beach', 'sunset'], ['beach'], None]
+    db.session.add_all([
+        MediaRanking(ranking_session_id=session.id, media_item_id=item_id, combined_score=score, tags_json=item_tags,
+                     status='completed' if score is not None else 'failed')
+        for item_id, score, item_tags in zip(item_ids, scores, tags)
+    ])
+    db.session.commit()
+    url = f'/api/ranking/sessions/{session.id}/rankings'
+
+    seen = []
+    cursor = None
+    while True:
+        resp = test_client.get(f"{url}?limit=2" + (f"&cursor={cursor}" if cursor else ''), headers=headers)
+        assert resp.status_code == 200
+        page = resp.get_json()
+        seen.extend(page['rankings'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert [ranking['combined_score'] for ranking in seen] == [9.0, 8.0, 8.0, 6.5, 3.0]
+    assert seen[1]['id'] > seen[2]['id']
+
+    resp = test_client.get(f'{url}?min_score=6.5&tags=beach,sunset&embed=media_item', headers=headers)
+    rankings = resp.get_json()['rankings']
+    assert [ranking['combined_score'] for ranking in rankings] == [9.0, 6.5]
+    assert rankings[0]['media_item']['id'] == item_ids[0]
+    assert rankings[0]['media_item']['base_url'] == 'http://example.com/0.jpg'
+
+    # Deleted items drop out of the list
+    test_client.delete(f'/api/media/items/{item_ids[0]}', headers=headers)
+    assert test_client.get(f'{url}?limit=1', headers=headers).get_json()['rankings'][0]['combined_score'] == 8.0
+
+    assert test_client.get(f'{url}?min_score=abc', headers=headers).status_code == 400
+    assert test_client.get(f'{url}?cursor=bogus', headers=headers).status_code == 400
+    assert test_client.get('/api/ranking/sessions/999999999/rankings', headers=headers).status_code == 404
+
+
+def test_search_media_items(test_client):
+    token = get_jwt_token(test_client, 'searchuser@example.com', 'SearchPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [
+        {'id': f'search-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg', 'filename': filename,
+         'description': description}
+        for i, (filename, description) in enumerate([
+            ('beach.jpg', 'Sunset on the beach'),
+            ('IMG_0001.jpg', 'Beach volleyball'),
+            ('city.jpg', 'Night skyline'),
+        ])
+    ]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    db.session.get(MediaItem, item_ids[2]).tags_json = ['beach', 'travel']
+    db.session.commit()
+
+    resp = test_client.get('/api/media/search?q=beach&limit=2&fields=filename', headers=headers)
+    assert resp.status_code == 200
+    page = resp.get_json()
+    # The tag match outranks the text matches
+    assert page['items'][0]['id'] == item_ids[2] and page['items'][0]['search_score'] >= 1.0
+    assert set(page['items'][0]) == {'id', 'filename', 'search_score'}
+    rest = test_client.get(f"/api/media/search?q=beach&limit=2&cursor={page['next_cursor']}", headers=headers).get_json()
+    assert rest['next_cursor'] is None
+    assert {item['id'] for item in page['items'] + rest['items']} == set(item_ids)
+
+    # Every word must be in the text, unless one of them is a tag
+    resp = test_client.get('/api/media/search?q=sunset+BEACH', headers=headers)
+    assert [item['id'] for item in resp.get_json()['items']] == [item_ids[2], item_ids[0]]
+    assert [item['id'] for item in test_client.get('/api/media/search?tags=travel', headers=headers).get_json()['items']] == [item_ids[2]]
+    assert test_client.get('/api/media/search?q=volleyball&tags=travel', headers=headers).get_json()['items'] == []
+    assert test_client.get('/api/media/search', headers=headers).status_code == 400
+
+
+def test_media_timeline_and_range_listing(test_client):
+    token = get_jwt_token(test_client, 'timelineuser@example.com', 'TimelinePass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    times = ['2024-01-05T10:00:00Z', '2024-01-20T10:00:00Z', '2024-03-02T10:00:00Z']
+    payload = [{'id': f'timeline-{uuid.uuid4()}', 'baseUrl': 'http://example.com/t.jpg', 'creationTime': time} for time in times]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+
+    resp = test_client.get('/api/media/timeline', headers=headers)
+    assert resp.status_code == 200
+    timeline = resp.get_json()
+    assert timeline['granularity'] == 'month'
+    assert [(b['start'][:10], b['count']) for b in timeline['buckets']] == [('2024-03-01', 1), ('2024-01-01', 2)]
+
+    # Jump into January
+    resp = test_client.get('/api/media/items?created_from=2024-01-01T00:00:00Z&created_to=2024-02-01T00:00:00Z&limit=1', headers=headers)
+    page = resp.get_json()
+    assert [item['id'] for item in page['items']] == [item_ids[1]]
+    resp = test_client.get(f"/api/media/items?created_from=2024-01-01T00:00:00Z&created_to=2024-02-01T00:00:00Z&cursor={page['next_cursor']}", headers=headers)
+    assert [item['id'] for item in resp.get_json()['items']] == [item_ids[0]]
+
+    # Ingest invalidates the cached histogram
+    test_client.post('/api/media/items/batch', json=[{'id': f'timeline-{uuid.uuid4()}', 'baseUrl': 'http://example.com/u.jpg', 'creationTime': '2024-03-09T00:00:00Z'}], headers=headers)
+    timeline = test_client.get('/api/media/timeline?granularity=year', headers=headers).get_json()
+    assert timeline['buckets'] == [{'start': '2024-01-01T00:00:00+00:00', 'count': 4}]
+    assert test_client.get('/api/media/timeline?granularity=week', headers=headers).status_code == 400
+    assert test_client.get('/api/media/items?created_from=yesterday', headers=headers).status_code == 400
+
+
+def test_bulk_media_operations(test_client):
+    token = get_jwt_token(test_client, 'bulkuser@example.com', 'BulkPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'bulk-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(4)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    other_token = get_jwt_token(test_client, 'bulkother@example.com', 'BulkPass123')
+    other_item = test_client.post('/api/media/items/batch', json=[{'id': f'bulk-{uuid.uuid4()}', 'baseUrl': 'http://example.com/o.jpg'}],
+                                  headers={'Authorization': f'Bearer {other_token}'}).get_json()[0]
+    db.session.get(MediaItem, item_ids[0]).tags_json = ['keep', 'old']
+    db.session.commit()
+
+    def bulk(operation, ids, tags=None):
+        resp = test_client.post('/api/media/items/bulk', json={'operation': operation, 'ids': ids, 'tags': tags}, headers=headers)
+        return resp.status_code, resp.get_json()
+
+    # Other users' items are never touched
+    status, result = bulk('soft_delete', item_ids[:2] + [other_item['id']])
+    assert status == 200 and (result['requested'], result['affected']) == (3, 2)
+    assert bulk('soft_delete', item_ids[:2])[1]['affected'] == 0
+    assert {item['id'] for item in test_client.get('/api/media/items', headers=headers).get_json()['items']} == set(item_ids[2:])
+    assert bulk('restore', item_ids)[1]['affected'] == 2
+    db.session.expire_all()
+    assert db.session.get(MediaItem, other_item['id']).is_deleted is False
+
+    assert bulk('add_tags', item_ids[:2], ['new', 'keep', 'new'])[1]['affected'] == 2
+    assert bulk('add_tags', item_ids[:2], ['keep'])[1]['affected'] == 0
+    db.session.expire_all()
+    assert db.session.get(MediaItem, item_ids[0]).tags_json == ['keep', 'old', 'new']
+    assert db.session.get(MediaItem, item_ids[1]).tags_json == ['new', 'keep']
+    assert bulk('remove_tags', item_ids, ['keep', 'missing'])[1]['affected'] == 2
+    db.session.expire_all()
+    assert db.session.get(MediaItem, item_ids[0]).tags_json == ['old', 'new']
+    assert db.session.get(MediaItem, item_ids[1]).tags_json == ['new']
+
+    assert bulk('hard_delete', [item_ids[3], other_item['id']])[1]['affected'] == 1
+    db.session.expire_all()
+    assert db.session.get(MediaItem, item_ids[3]) is None
+
+    assert bulk('rename', item_ids)[0] == 400
+    assert bulk('add_tags', item_ids)[0] == 400
+    assert bulk('soft_delete', [])[0] == 400
+    assert bulk('soft_delete', ['x'])[0] == 400
+
+
+def test_multi_get_media_items(test_client):
+    token = get_jwt_token(test_client, 'multiget@example.com', 'MultiGetPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'multi-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    created = test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()
+    other_token = get_jwt_token(test_client, 'multigetother@example.com', 'MultiGetPass123')
+    other = test_client.post('/api/media/items/batch', json=[{'id': 'theirs', 'baseUrl': 'http://example.com/t.jpg'}],
+                             headers={'Authorization': f'Bearer {other_token}'}).get_json()[0]
+
+    ids = [created[2]['id'], other['id'], created[0]['id']]
+    resp = test_client.get(f"/api/media/items/batch?ids={','.join(map(str, ids))}&fields=base_url", headers=headers)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body['items'] == [
+        {'id': created[2]['id'], 'base_url': 'http://example.com/2.jpg'},
+        {'id': other['id'], 'not_found': True},
+        {'id': created[0]['id'], 'base_url': 'http://example.com/0.jpg'},
+    ]
+    assert body['not_found'] == [other['id']]
+
+    google_ids = [created[1]['google_media_id'], 'missing']
+    body = test_client.get(f"/api/media/items/batch?google_media_ids={','.join(google_ids)}", headers=headers).get_json()
+    assert body['items'][0] == created[1]
+    assert body['items'][1] == {'google_media_id': 'missing', 'not_found': True}
+
+    assert test_client.get('/api/media/items/batch', headers=headers).status_code == 400
+    assert test_client.get('/api/media/items/batch?ids=1&google_media_ids=x', headers=headers).status_code == 400
+    assert test_client.get('/api/media/items/batch?ids=abc', headers=headers).status_code == 400
+    too_many = ','.join(str(i) for i in range(Config.MEDIA_MULTI_GET_MAX_IDS + 1))
+    assert test_client.get(f'/api/media/items/batch?ids={too_many}', headers=headers).status_code == 400
+
+
+def test_changes_feed_with_tombstones(test_client):
+    from datetime import timedelta
+    from app.api.pagination import decode_cursor, encode_cursor
+    from sqlalchemy import func, update
+    from app.api import routes
+    token = get_jwt_token(test_client, 'syncuser@example.com', 'SyncPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'sync-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    created = test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()
+    ids = [item['id'] for item in created]
+
+    def touch(model, row_ids, minutes):
+        # Everything in the test shares one transaction (and now()), so move rows forward explicitly
+        db.session.execute(update(model).where(model.id.in_(row_ids))
+                           .values(updated_at=func.now() + timedelta(minutes=minutes)))
+        db.session.commit()
+
+    settle = routes.change_feed_service.settle
+    routes.change_feed_service.settle = timedelta(hours=-1)
+    try:
+        first = test_client.get('/api/sync/changes?limit=2', headers=headers).get_json()
+        assert first['has_more'] is True and len(first['media_items']) == 2
+        rest = test_client.get(f"/api/sync/changes?limit=2&since={first['next_cursor']}", headers=headers).get_json()
+        assert rest['has_more'] is False
+        assert sorted(item['id'] for item in first['media_items'] + rest['media_items']) == sorted(ids)
+        cursor = rest['next_cursor']
+
+        empty = test_client.get(f'/api/sync/changes?since={cursor}', headers=headers).get_json()
+        assert (empty['media_items'], empty['deleted_media_item_ids'], empty['rankings']) == ([], [], [])
+        assert empty['next_cursor'] == cursor
+
+        test_client.put(f'/api/media/items/{ids[0]}', json={'filename': 'renamed.jpg'}, headers=headers)
+        test_client.delete(f'/api/media/items/{ids[1]}', headers=headers)
+        touch(MediaItem, ids[:2], 1)
+        user = User.query.filter_by(email='syncuser@example.com').first()
+        session = RankingSession(user_id=user.id, status='completed')
+        db.session.add(session)
+        db.session.flush()
+        ranking = MediaRanking(ranking_session_id=session.id, media_item_id=ids[2], combined_score=7, status='completed')
+        db.session.add(ranking)
+        db.session.commit()
+        touch(MediaRanking, [ranking.id], 1)
+
+        delta = test_client.get(f'/api/sync/changes?since={cursor}', headers=headers).get_json()
+        assert [(item['id'], item['filename']) for item in delta['media_items']] == [(ids[0], 'renamed.jpg')]
+        assert delta['deleted_media_item_ids'] == [ids[1]]
+        assert [r['id'] for r in delta['rankings']] == [ranking.id]
+        assert test_client.get(f'/api/media/items/{ids[1]}', headers=headers).status_code == 404
+
+        # Picking the deleted item again restores it
+        restored = test_client.post('/api/media/items/batch', json=payload[1:2], headers=headers).get_json()
+        assert restored[0]['id'] == ids[1] and restored[0]['is_deleted'] is False
+        touch(MediaItem, [ids[1]], 2)
+        delta = test_client.get(f"/api/sync/changes?since={delta['next_cursor']}", headers=headers).get_json()
+        assert [item['id'] for item in delta['media_items']] == [ids[1]] and delta['deleted_media_item_ids'] == []
+
+        # Permanently deleted items leave a tombstone, also found from cursors issued before tombstones existed
+        bulk = {'operation': 'hard_delete', 'ids': [ids[2]]}
+        assert test_client.post('/api/media/items/bulk', json=bulk, headers=headers).get_json()['affected'] == 1
+        delta = test_client.get(f"/api/sync/changes?since={delta['next_cursor']}", headers=headers).get_json()
+        assert (delta['media_items'], delta['deleted_media_item_ids']) == ([], [ids[2]])
+        legacy = encode_cursor(decode_cursor(cursor, 6)[:4])
+        assert ids[2] in test_client.get(f'/api/sync/changes?since={legacy}', headers=headers).get_json()['deleted_media_item_ids']
+    finally:
+        routes.change_feed_service.settle = settle
+
+    # Rows newer than the settle window are held back
+    assert test_client.get('/api/sync/changes', headers=headers).get_json()['media_items'] == []
+    assert test_client.get('/api/sync/changes?since=bogus', headers=headers).status_code == 400
+
+
+def test_changes_feed_waits_for_open_transactions(test_client):
+    from datetime import timedelta
+    from sqlalchemy import func, text, update
+    from app.services.change_feed_service import ChangeFeedService
+    token = get_jwt_token(test_client, 'syncwait@example.com', 'SyncPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'wait-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(2)]
+    ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    user_id = User.query.filter_by(email='syncwait@example.com').first().id
+    feed = ChangeFeedService()
+    feed.settle = timedelta(hours=-1)
+
+    # Another transaction starts, so anything it commits later is stamped after its start
+    other = db.engine.connect()
+    try:
+        other.begin()
+        other.execute(text('SELECT 1'))
+        db.session.execute(update(MediaItem).where(MediaItem.id == ids[1])
+                           .values(updated_at=func.now() + timedelta(minutes=1)))
+        db.session.commit()
+        held = feed.changes(user_id, (None, 0), (None, 0), 10)
+        assert [item['id'] for item in held['media_items']] == [ids[0]]
+    finally:
+        other.close()
+    # pg_stat_activity is read once per transaction, and the whole test runs in one
+    db.session.execute(text('SELECT pg_stat_clear_snapshot()'))
+    released = feed.changes(user_id, held['media_position'], (None, 0), 10)
+    assert [item['id'] for item in released['media_items']] == [ids[1]]
+
+
+def test_batch_create_media_items_upserts(test_client):
+    token = get_jwt_token(test_client, 'batchuser@example.com', 'BatchPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    ids = [f'batch-{uuid.uuid4()}' for _ in range(3)]
+    payload = [
+        {'id': ids[0], 'baseUrl': 'http://example.com/0.jpg', 'mimeType': 'image/jpeg',
+         'creationTime': '2024-05-01T10:00:00Z'},
+        {'google_media_id': ids[1], 'base_url': 'http://example.com/1.jpg'},
+        {'id': 'missing-base-url'},
+    ]
+    resp = test_client.post('/api/media/items/batch', json=payload, headers=headers)
+    assert resp.status_code == 201
+    created = resp.get_json()
+    assert [item['google_media_id'] for item in created] == ids[:2]
+    assert created[0]['mime_type'] == 'image/jpeg'
+    assert created[0]['creation_time'].startswith('2024-05-01T10:00:00')
+
+    # Re-import: existing rows are updated in place, new rows inserted, request order kept
+    payload = [
+        {'id': ids[2], 'baseUrl': 'http://example.com/2.jpg'},
+        {'id': ids[0], 'baseUrl': 'http://example.com/0-new.jpg', 'filename': 'zero.jpg'},
+    ]
+    resp = test_client.post('/api/media/items/batch', json=payload, headers=headers)
+    assert resp.status_code == 201
+    stored = resp.get_json()
+    assert [item['google_media_id'] for item in stored] == [ids[2], ids[0]]
+    assert stored[1]['id'] == created[0]['id']
+    assert stored[1]['base_url'] == 'http://example.com/0-new.jpg'
+    assert stored[1]['filename'] == 'zero.jpg'
+
+    resp = test_client.post('/api/media/items/batch', json={'id': 'x'}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_batch_create_media_items_streaming(test_client):
+    token = get_jwt_token(test_client, 'streamuser@example.com', 'StreamPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    chunk_size = Config.MEDIA_STREAM_CHUNK_SIZE
+    Config.MEDIA_STREAM_CHUNK_SIZE = 2
+    try:
+        items = [{'id': f'stream-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(5)]
+        items[3] = {'id': 'no-base-url'}
+        resp = test_client.post('/api/media/items/batch?stream=true', data=json.dumps(items),
+                                headers=headers, content_type='application/json')
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        assert [line.get('chunk') for line in lines[:-1]] == [1, 2, 3]
+        assert [line['stored'] for line in lines[:-1]] == [2, 1, 1]
+        assert lines[-1] == {'done': True, 'stored': 4, 'failed_chunks': 0}
+
+        ndjson = '\n'.join(json.dumps(item) for item in items[:2])
+        resp = test_client.post('/api/media/items/batch', data=ndjson, headers=headers,
+                                content_type='application/x-ndjson')
+        lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        assert [item['google_media_id'] for item in lines[0]['items']] == [items[0]['id'], items[1]['id']]
+
+        resp = test_client.post('/api/media/items/batch?stream=true', data='{"not": "an array"}',
+                                headers=headers, content_type='application/json')
+        assert resp.status_code == 400
+    finally:
+        Config.MEDIA_STREAM_CHUNK_SIZE = chunk_size
+
+
+def test_media_items_keyset_pagination_and_fields(test_client):
+    token = get_jwt_token(test_client, 'pageuser@example.com', 'PagePass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [
+        {'id': f'page-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg',
+         # Two items share a timestamp and one has none, to exercise the tie-breaker and NULLS LAST
+         'creationTime': None if i == 4 else f'2024-01-0{min(i, 2) + 1}T00:00:00Z'}
+        for i in range(5)
+    ]
+    resp = test_client.post('/api/media/items/batch', json=payload, headers=headers)
+    created = resp.get_json()
+    MediaItem.query.filter_by(id=created[0]['id']).update({'is_deleted': True, 'ai_status': 'analyzed'})
+    db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        url = '/api/media/items?limit=2&fields=google_media_id,creation_time'
+        if cursor:
+            url += f'&cursor={cursor}'
+        resp = test_client.get(url, headers=headers)
+        assert resp.status_code == 200
+        page = resp.get_json()
+        assert all(set(item) == {'id', 'google_media_id', 'creation_time'} for item in page['items'])
+        seen.extend(page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    expected = sorted(created[1:4], key=lambda item: (item['creation_time'], item['id']), reverse=True) + [created[4]]
+    assert [item['id'] for item in seen] == [item['id'] for item in expected]
+
+    resp = test_client.get('/api/media/items?is_deleted=true&ai_status=analyzed', headers=headers)
+    assert [item['id'] for item in resp.get_json()['items']] == [created[0]['id']]
+
+    assert test_client.get('/api/media/items?fields=nope', headers=headers).status_code == 400
+    assert test_client.get('/api/media/items?cursor=garbage', headers=headers).status_code == 400
+    assert test_client.get('/api/media/items?limit=0', headers=headers).status_code == 400
+
+
+def test_top_picks_materialized_and_invalidated(test_client):
+    token = get_jwt_token(test_client, 'picksuser@example.com', 'PicksPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    resp = test_client.get('/api/photos/top-picks', headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json() == {'photos': []}
+
+    payload = [{'id': f'picks-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    items = test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()
+    user = User.query.filter_by(email='picksuser@example.com').first()
+    session = RankingSession(user_id=user.id, status='completed', completed_at=datetime.utcnow())
+    db.session.add(session)
+    db.session.flush()
+    for item, score in zip(items, (5.0, 9.0, 7.0)):
+        db.session.add(MediaRanking(ranking_session_id=session.id, media_item_id=item['id'], combined_score=score))
+    db.session.commit()
+    # Picks computed before the session completed are stale until something refreshes them
+    db.session.query(UserTopPicks).filter_by(user_id=user.id).delete()
+    db.session.commit()
+
+    resp = test_client.get('/api/photos/top-picks', headers=headers)
+    photos = resp.get_json()['photos']
+    assert [photo['combined_score'] for photo in photos] == [9.0, 7.0, 5.0]
+    assert db.session.get(UserTopPicks, user.id).ranking_session_id == session.id
+
+    # Deleting an item drops the materialized result; the next read recomputes without it
+    resp = test_client.delete(f"/api/media/items/{items[1]['id']}", headers=headers)
+    assert resp.status_code == 200
+    assert db.session.get(UserTopPicks, user.id) is None
+    resp = test_client.get('/api/photos/top-picks', headers=headers)
+    assert [photo['combined_score'] for photo in resp.get_json()['photos']] == [7.0, 5.0]
+
+    # Databases without ON CONFLICT replace the row instead of upserting it
+    from unittest import mock
+    from app.api.routes import top_picks_service
+    from app.services.top_picks_service import TopPicksService
+    with mock.patch.object(db.session.get_bind().dialect, 'name', 'sqlite'), \
+            mock.patch.object(TopPicksService, '_store_portable', wraps=TopPicksService._store_portable) as store:
+        top_picks_service.refresh(user.id)
+        top_picks_service.refresh(user.id)
+    db.session.commit()
+    assert store.call_count == 2
+    assert [photo['combined_score'] for photo in db.session.get(UserTopPicks, user.id).photos] == [7.0, 5.0]
+    assert db.session.get(UserTopPicks, user.id).data_version == db.session.get(User, user.id).data_version
+
+
+def test_top_picks_computed_during_a_change_are_not_kept(test_client, mocker):
+    from app.services.top_picks_service import TopPicksService
+    token = get_jwt_token(test_client, 'picksrace@example.com', 'PicksPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'race-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(2)]
+    items = test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()
+    user = User.query.filter_by(email='picksrace@example.com').first()
+    session = RankingSession(user_id=user.id, status='completed', completed_at=datetime.utcnow())
+    db.session.add(session)
+    db.session.flush()
+    for item, score in zip(items, (5.0, 9.0)):
+        db.session.add(MediaRanking(ranking_session_id=session.id, media_item_id=item['id'], combined_score=score))
+    db.session.commit()
+
+    service = TopPicksService()
+    compute = TopPicksService.compute
+    def compute_then_delete(self, user_id):
+        result = compute(self, user_id)
+        # Another request deletes an item and commits between the compute and the upsert
+        MediaItem.query.filter_by(id=items[1]['id']).update({'is_deleted': True})
+        TopPicksService.invalidate(user_id)
+        User.bump_data_version(user_id)
+        db.session.commit()
+        return result
+    mocker.patch.object(TopPicksService, 'compute', compute_then_delete)
+    assert [photo['combined_score'] for photo in service.get(user.id)] == [9.0, 5.0]
+    mocker.stopall()
+    # The picks were stored under the version read before the change, so they are recomputed
+    assert [photo['combined_score'] for photo in service.get(user.id)] == [5.0]
+
+
+def test_conditional_get_with_etag(test_client):
+    token = get_jwt_token(test_client, 'etaguser@example.com', 'EtagPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    for url in ('/api/media/items', '/api/ranking/sessions', '/api/photos/top-picks'):
+        resp = test_client.get(url, headers=headers)
+        assert resp.status_code == 200
+        etag = resp.headers['ETag']
+        assert etag.startswith('W/')
+        resp = test_client.get(url, headers={**headers, 'If-None-Match': etag})
+        assert resp.status_code == 304
+        assert resp.get_data() == b''
+
+    etag = test_client.get('/api/media/items', headers=headers).headers['ETag']
+    # Different query strings get different tags
+    assert test_client.get('/api/media/items?limit=5', headers=headers).headers['ETag'] != etag
+    # Any change to the user's media invalidates the tag
+    test_client.post('/api/media/items/batch', json=[{'id': f'etag-{uuid.uuid4()}', 'baseUrl': 'http://example.com/e.jpg'}], headers=headers)
+    resp = test_client.get('/api/media/items', headers={**headers, 'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert len(resp.get_json()['items']) == 1
+
+
+def test_export_media_items_streams_one_row_per_ranking(test_client):
+    token = get_jwt_token(test_client, 'exportuser@example.com', 'ExportPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'export-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg', 'filename': f'é{i}.jpg'} for i in range(3)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    user_id = db.session.get(MediaItem, item_ids[0]).user_id
+    ranking_session = RankingSession(user_id=user_id, status='completed')
+    db.session.add(ranking_session)
+    db.session.flush()
+    db.session.add_all([
+        MediaRanking(ranking_session_id=ranking_session.id, media_item_id=item_ids[0], combined_score=7.5,
+                     status='completed', tags_json=['a', 'b']),
+        MediaRanking(ranking_session_id=ranking_session.id, media_item_id=item_ids[0], combined_score=6, status='completed'),
+        MediaRanking(ranking_session_id=ranking_session.id, media_item_id=item_ids[1], status='failed'),
+    ])
+    db.session.get(MediaItem, item_ids[2]).is_deleted = True
+    db.session.commit()
+    other_token = get_jwt_token(test_client, 'exportother@example.com', 'ExportPass123')
+    test_client.post('/api/media/items/batch', json=[{'id': f'export-{uuid.uuid4()}', 'baseUrl': 'http://example.com/o.jpg'}],
+                     headers={'Authorization': f'Bearer {other_token}'})
+
+    resp = test_client.get('/api/media/export', headers=headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    assert 'attachment' in resp.headers['Content-Disposition']
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [(row['id'], row['ranking_combined_score']) for row in rows] == [(item_ids[0], 7.5), (item_ids[0], 6.0), (item_ids[1], None)]
+    assert rows[0]['filename'] == 'é0.jpg' and rows[0]['ranking_tags_json'] == ['a', 'b']
+    assert rows[2]['ranking_status'] == 'failed'
+
+    resp = test_client.get('/api/media/export?format=csv', headers=headers)
+    assert resp.status_code == 200 and resp.mimetype == 'text/csv'
+    lines = resp.get_data(as_text=True).splitlines()
+    assert lines[0].startswith('id,user_id,google_media_id') and len(lines) == 4
+    assert '"[""a"", ""b""]"' in lines[1]
+
+    assert test_client.get('/api/media/export?format=xml', headers=headers).status_code == 400
+
+
+def test_media_stats(test_client):
+    token = get_jwt_token(test_client, 'statsuser@example.com', 'StatsPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'stats-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(3)]
+    item_ids = [item['id'] for item in test_client.post('/api/media/items/batch', json=payload, headers=headers).get_json()]
+    test_client.delete(f'/api/media/items/{item_ids[0]}', headers=headers)
+
+    resp = test_client.get('/api/media/stats', headers=headers)
+    assert resp.status_code == 200
+    stats = resp.get_json()
+    assert stats['items'] == {'live': 2, 'deleted': 1, 'ranked': 0, 'unranked': 2, 'by_ai_status': {'pending': 2}}
+    assert stats['sessions'] == {'total': 0, 'by_status': {}}
+    assert len(stats['score_histogram']) == 10
+    assert test_client.get('/api/media/stats', headers={**headers, 'If-None-Match': resp.headers['ETag']}).status_code == 304
+
+
+def test_idempotency_key_replays_writes(test_client, mocker):
+    from app.services.llm_ranking_service import LLMBasedRankingService
+    token = get_jwt_token(test_client, 'idemuser@example.com', 'IdemPass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'idem-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(2)]
+    first = test_client.post('/api/media/items/batch', json=payload, headers={**headers, 'Idempotency-Key': 'batch-1'})
+    again = test_client.post('/api/media/items/batch', json=payload, headers={**headers, 'Idempotency-Key': 'batch-1'})
+    assert first.status_code == again.status_code == 201
+    assert again.get_json() == first.get_json() and again.headers['Idempotent-Replayed'] == 'true'
+    item_ids = [item['id'] for item in first.get_json()]
+
+    create = {'media_item_ids': item_ids}
+    session = test_client.post('/api/ranking/sessions', json=create, headers={**headers, 'Idempotency-Key': 'session-1'})
+    repeat = test_client.post('/api/ranking/sessions', json=create, headers={**headers, 'Idempotency-Key': 'session-1'})
+    assert repeat.get_json()['id'] == session.get_json()['id']
+    assert RankingSession.query.filter_by(user_id=User.query.filter_by(email='idemuser@example.com').one().id).count() == 1
+    # The same key with a different body is a client error, not a replay
+    other = test_client.post('/api/ranking/sessions', json={'media_item_ids': item_ids[:1]},
+                             headers={**headers, 'Idempotency-Key': 'session-1'})
+    assert other.status_code == 422
+    assert test_client.post('/api/ranking/sessions?method=manual', json=create,
+                            headers={**headers, 'Idempotency-Key': 'session-1'}).status_code == 422
+    assert test_client.post('/api/ranking/sessions', json=create,
+                            headers={**headers, 'Idempotency-Key': 'k' * 256}).status_code == 400
+
+    score_item = mocker.patch.object(LLMBasedRankingService, 'score_item', return_value={
+        'scores': {'technical': 6.0, 'aesthetic': 7.0, 'overall': 6.5}, 'latency_ms': 1200,
+        'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 1000})
+    rank_url = f"/api/ranking/sessions/{session.get_json()['id']}/rank"
+    ranked = test_client.post(rank_url, headers={**headers, 'Idempotency-Key': 'rank-1'})
+    replayed = test_client.post(rank_url, headers={**headers, 'Idempotency-Key': 'rank-1'})
+    assert ranked.get_json()['ranked'] == replayed.get_json()['ranked'] == 2
+    assert score_item.call_count == 2
+
+
+def test_idempotency_key_in_progress_and_failures(test_client, mocker):
+    from app.api.idempotency import idempotency_service
+    from app.api import routes
+    from app.models import IdempotencyKey
+    from app.services.idempotency_service import IdempotencyService
+    token = get_jwt_token(test_client, 'idemwait@example.com', 'IdemPass123')
+    headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'busy', 'Content-Type': 'application/json'}
+    user_id = User.query.filter_by(email='idemwait@example.com').one().id
+    body = json.dumps({'media_item_ids': []}).encode('utf-8')
+    fingerprint = IdempotencyService.fingerprint('POST', '/api/ranking/sessions?', body)
+    mocker.patch.object(idempotency_service, 'wait_seconds', 0)
+
+    # Another worker holds the key: the duplicate is turned away instead of running
+    token, stored = idempotency_service.begin(user_id, 'busy', fingerprint)
+    assert token and stored is None
+    resp = test_client.post('/api/ranking/sessions', data=body, headers=headers)
+    assert resp.status_code == 409 and resp.headers['Retry-After'] == '1'
+    # Once it finishes, its response is replayed
+    assert idempotency_service.complete(user_id, 'busy', token, 201, 'application/json', b'{"id": 1}')
+    resp = test_client.post('/api/ranking/sessions', data=body, headers=headers)
+    assert resp.status_code == 201 and resp.get_json() == {'id': 1}
+
+    # A claim whose worker died is taken over once its lease runs out
+    db.session.query(IdempotencyKey).filter_by(user_id=user_id, key='busy').update({
+        'status': 'in_progress', 'locked_until': datetime(2020, 1, 1)})
+    db.session.commit()
+    resp = test_client.post('/api/ranking/sessions', data=body, headers=headers)
+    # The request ran this time: an empty session is rejected by the view itself
+    assert resp.status_code == 400 and 'Idempotent-Replayed' not in resp.headers
+    # The dead worker's claim token no longer holds the key: it can neither overwrite nor release it
+    assert idempotency_service.complete(user_id, 'busy', token, 201, 'application/json', b'{"id": 2}') is False
+    idempotency_service.release(user_id, 'busy', token)
+    resp = test_client.post('/api/ranking/sessions', data=body, headers=headers)
+    assert resp.status_code == 400 and resp.headers['Idempotent-Replayed'] == 'true'
+
+    # A running request keeps renewing its claim, so it is never taken over mid-way
+    token, _ = idempotency_service.begin(user_id, 'renewed', fingerprint)
+    db.session.query(IdempotencyKey).filter_by(user_id=user_id, key='renewed').update({'locked_until': datetime(2020, 1, 1)})
+    assert idempotency_service.renew(db.session.connection(), user_id, 'renewed', token)
+    locked_until = db.session.query(IdempotencyKey.locked_until).filter_by(user_id=user_id, key='renewed').scalar()
+    assert locked_until.replace(tzinfo=None) > datetime.utcnow()
+    assert not idempotency_service.renew(db.session.connection(), user_id, 'renewed', 'stale-token')
+
+    # Ranking can take minutes: a retry while it runs is told to come back rather than kept waiting
+    rank_path = '/api/ranking/sessions/1/rank'
+    idempotency_service.begin(user_id, 'ranking', IdempotencyService.fingerprint('POST', rank_path + '?', body))
+    mocker.patch.object(idempotency_service, 'wait_seconds', 30)
+    resp = test_client.post(rank_path, data=body, headers={**headers, 'Idempotency-Key': 'ranking'})
+    assert resp.status_code == 202 and resp.headers['Retry-After'] == '5'
+    assert resp.get_json()['status'] == 'in_progress'
+
+    # Server errors release the key, so a retry runs again
+    mocker.patch.object(routes.ranking_session_service, 'create', side_effect=RuntimeError('database down'))
+    assert test_client.post('/api/ranking/sessions', data=body, headers={**headers, 'Idempotency-Key': 'flaky'}).status_code == 500
+    assert db.session.query(IdempotencyKey).filter_by(user_id=user_id, key='flaky').count() == 0
+
+
+def test_list_endpoints_negotiate_msgpack_and_compression(test_client):
+    msgpack = pytest.importorskip('msgpack')
+    import gzip
+    token = get_jwt_token(test_client, 'wireuser@example.com', 'WirePass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'wire-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg', 'filename': f'IMG_{i}.jpg'}
+               for i in range(20)]
+    test_client.post('/api/media/items/batch', json=payload, headers=headers)
+
+    as_json = test_client.get('/api/media/items', headers=headers)
+    as_msgpack = test_client.get('/api/media/items', headers={**headers, 'Accept': 'application/msgpack'})
+    assert as_msgpack.mimetype == 'application/msgpack' and 'Accept' in as_msgpack.headers['Vary']
+    assert msgpack.unpackb(as_msgpack.data) == as_json.get_json()
+    assert len(as_msgpack.data) < len(as_json.data)
+    # Each representation has its own ETag
+    assert as_msgpack.headers['ETag'] != as_json.headers['ETag']
+    assert test_client.get('/api/media/items', headers={**headers, 'Accept': 'application/msgpack',
+                                                        'If-None-Match': as_msgpack.headers['ETag']}).status_code == 304
+
+    gzipped = test_client.get('/api/media/items', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in gzipped.headers['Vary']
+    assert gzip.decompress(gzipped.data) == as_json.data
+    # Bodies under COMPRESSION_MIN_SIZE are sent as is
+    small = test_client.get('/api/media/items?limit=1', headers={**headers, 'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.get_json()['items']
+
+
+def test_brotli_preferred_when_accepted(test_client):
+    brotli = pytest.importorskip('brotli')
+    token = get_jwt_token(test_client, 'wireuser@example.com', 'WirePass123')
+    headers = {'Authorization': f'Bearer {token}'}
+    payload = [{'id': f'br-{uuid.uuid4()}', 'baseUrl': f'http://example.com/{i}.jpg'} for i in range(20)]
+    test_client.post('/api/media/items/batch', json=payload, headers=headers)
+    plain = test_client.get('/api/media/items', headers=headers)
+    resp = test_client.get('/api/media/items', headers={**headers, 'Accept-Encoding': 'gzip, deflate, br'})
+    assert resp.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(resp.data) == plain.data
+    resp = test_client.get('/api/media/items', headers={**headers, 'Accept-Encoding': 'br;q=0.5, gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
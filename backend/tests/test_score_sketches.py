@@ -0,0 +1,90 @@
+import random
+import uuid
+import pytest
+from app.extensions import db
+from app.models import User, UserScoreSketch
+from app.services.llm_ranking_service import LLMBasedRankingService
+from app.services.media_ingest_service import MediaIngestService
+from app.services.ranking_session_service import RankingSessionService
+from app.services.score_sketch_service import ScoreSketchService, percentiles
+from app.services.tdigest import TDigest
+
+def exact_cdf(values, value):
+    return (sum(v < value for v in values) + sum(v == value for v in values) / 2) / len(values)
+
+def test_tdigest_quantiles_and_cdf_are_close():
+    rng = random.Random(7)
+    values = [round(min(max(rng.gauss(6, 1.5), 0), 10), 2) for _ in range(20000)]
+    digest = TDigest()
+    digest.update(values)
+    ordered = sorted(values)
+    for q in (0.01, 0.05, 0.5, 0.95, 0.99):
+        assert digest.quantile(q) == pytest.approx(ordered[int(q * len(ordered))], abs=0.1)
+    for value in (2.0, 5.5, 6.0, 8.5, 9.75):
+        assert digest.cdf(value) == pytest.approx(exact_cdf(values, value), abs=0.01)
+    assert len(digest.to_bytes()) < 1500
+
+def test_tdigest_cdf_at_extremes_of_continuous_data():
+    rng = random.Random(11)
+    values = [rng.uniform(0, 10) for _ in range(100000)]
+    digest = TDigest()
+    digest.update(values)
+    # The lowest score is at the bottom of the library, not the top
+    assert digest.cdf(min(values)) == 0.0
+    assert digest.cdf(max(values)) == 1.0
+    assert digest.cdf(0.05) == pytest.approx(exact_cdf(values, 0.05), abs=0.001)
+
+def test_tdigest_merge_and_round_trip():
+    rng = random.Random(3)
+    values = [rng.uniform(0, 10) for _ in range(5000)]
+    left, right, whole = TDigest(), TDigest(), TDigest()
+    left.update(values[:1000])
+    right.update(values[1000:])
+    whole.update(values)
+    left.merge(right)
+    restored = TDigest.from_bytes(left.to_bytes())
+    assert (restored.count, restored.min, restored.max) == (5000, min(values), max(values))
+    for q in (0.05, 0.5, 0.95):
+        assert restored.quantile(q) == pytest.approx(whole.quantile(q), abs=0.1)
+    # Ties count half, so a library of equal scores puts every photo at the median
+    ties = TDigest()
+    ties.update([6.25] * 9 + [8.0])
+    assert (ties.cdf(6.25), ties.cdf(8.0), ties.cdf(1.0), ties.cdf(9.0)) == (0.45, 0.95, 0.0, 1.0)
+    assert TDigest().cdf(5) is None
+    with pytest.raises(ValueError):
+        TDigest.from_bytes(b'\x02')
+
+def fake_score_item(self, payload):
+    index = int(payload['baseUrl'].rsplit('/', 1)[1])
+    return {'scores': {'technical': 5.0, 'aesthetic': index % 10, 'overall': index / 2}, 'latency_ms': 1000,
+            'input_tokens': 900, 'output_tokens': 80, 'image_bytes': 1000}
+
+def test_sketches_follow_ranking_and_rebuild(pg_app, mocker):
+    mocker.patch.object(LLMBasedRankingService, 'score_item', fake_score_item)
+    user = User(email=f'sketch-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    items = MediaIngestService().upsert(user.id, [{'id': f'k{i}', 'baseUrl': f'http://example.com/{i}'} for i in range(20)])
+    sessions = RankingSessionService(LLMBasedRankingService())
+    sessions.rank(sessions.create(user.id, [item.id for item in items], 'ai_ranking', 'default'))
+
+    service = ScoreSketchService()
+    digests = service.digests(user.id)
+    assert sorted(digests) == ['aesthetic', 'combined', 'technical']
+    assert digests['combined'].count == 20
+    # Combined scores are 0, 0.5, ... 9.5: 9.5 is the best and 0 the worst
+    assert percentiles(digests, {'combined_score': 9.5})['combined'] == 0.975
+    assert percentiles(digests, {'combined_score': 0})['combined'] == 0.025
+    assert percentiles(digests, {'combined_score': None}) == {'technical': None, 'aesthetic': None, 'combined': None}
+    # Re-ranking the same items copies the cached scores, which are already in the sketches
+    counts = sessions.rank(sessions.create(user.id, [item.id for item in items[:5]], 'ai_ranking', 'default'))
+    assert counts['cached'] == 5
+    assert service.digests(user.id)['combined'].count == 20
+    stored = {sketch.axis: sketch.digest for sketch in db.session.query(UserScoreSketch).filter_by(user_id=user.id)}
+
+    db.session.query(UserScoreSketch).filter_by(user_id=user.id).delete()
+    assert service.rebuild([user.id]) == 1
+    rebuilt = {sketch.axis: sketch.digest for sketch in db.session.query(UserScoreSketch).filter_by(user_id=user.id)}
+    assert rebuilt == stored
+    # The rebuild bumps data_version, so cached digests are reloaded
+    assert service.digests(user.id)['combined'].count == 20
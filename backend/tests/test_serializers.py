@@ -0,0 +1,40 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from sqlalchemy import select
+from app.extensions import db
+from app.models import User, MediaItem, RankingSession, MediaRanking
+from app.models.serializers import select_columns, serialize_rows
+
+def test_compiled_serializers_match_to_dict(pg_app):
+    user = User(email=f'serialize-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    item = MediaItem(user_id=user.id, google_media_id='s1', base_url='http://example.com/s1',
+                     creation_time=datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), tags_json=['a'])
+    session = RankingSession(user_id=user.id, method='ai_ranking')
+    db.session.add_all([item, session])
+    db.session.flush()
+    ranking = MediaRanking(ranking_session_id=session.id, media_item_id=item.id,
+                           combined_score=Decimal('7.25'), llm_reasoning={'overall': 7.25})
+    db.session.add(ranking)
+    db.session.flush()
+
+    for model, obj in ((MediaItem, item), (RankingSession, session), (MediaRanking, ranking)):
+        db.session.refresh(obj)
+        rows = db.session.execute(select(*select_columns(model, model.API_FIELDS)).where(model.id == obj.id)).all()
+        assert serialize_rows(model, model.API_FIELDS, rows) == [obj.to_dict()]
+
+    # Trailing columns beyond the requested fields are ignored
+    rows = db.session.execute(select(MediaItem.id, MediaItem.base_url, MediaItem.creation_time).where(MediaItem.id == item.id)).all()
+    assert serialize_rows(MediaItem, ['id', 'base_url'], rows) == [{'id': item.id, 'base_url': 'http://example.com/s1'}]
+
+def test_json_provider_matches_default_encoding(pg_app):
+    payload = {'when': datetime(2024, 1, 2, 3, 4, 5), 'amount': Decimal('1.50'), 1: 'x', 'nested': [None, True, 'é']}
+    with pg_app.test_request_context():
+        response = pg_app.json.response(payload)
+    assert json.loads(response.get_data()) == {
+        'when': 'Tue, 02 Jan 2024 03:04:05 GMT', 'amount': '1.50', '1': 'x', 'nested': [None, True, 'é']
+    }
+    assert response.mimetype == 'application/json'
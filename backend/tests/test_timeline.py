@@ -0,0 +1,53 @@
+import uuid
+from unittest import mock
+from datetime import datetime, timezone
+from app.extensions import db
+from app.models import User, MediaItem
+from app.services.timeline_service import TimelineService, truncate
+
+def create_items(user_id, times):
+    db.session.add_all([
+        MediaItem(user_id=user_id, google_media_id=f'timeline-{uuid.uuid4()}', base_url='http://example.com/t',
+                  creation_time=time)
+        for time in times
+    ])
+    db.session.flush()
+
+def test_truncate_in_utc():
+    local = datetime(2024, 3, 1, 1, 30, tzinfo=timezone.utc).astimezone()
+    assert truncate(datetime(2024, 3, 1, 1, 30, tzinfo=timezone.utc), 'day') == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert truncate(local, 'month') == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert truncate(datetime(2024, 7, 9, 23, 59), 'year') == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def test_fallback_matches_postgres_and_cache_follows_data_version(pg_app):
+    user = User(email=f'timeline-{uuid.uuid4()}@example.com')
+    db.session.add(user)
+    db.session.flush()
+    create_items(user.id, [
+        datetime(2023, 12, 31, 23, 59, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 0, 0, tzinfo=timezone.utc),
+        datetime(2024, 1, 15, 12, 0, tzinfo=timezone.utc),
+        datetime(2024, 2, 3, 8, 0, tzinfo=timezone.utc),
+        None,
+    ])
+    service = TimelineService()
+    for granularity in ('day', 'month', 'year'):
+        postgres = service._compute(user.id, granularity, None, None)
+        with mock.patch.object(db.session.get_bind().dialect, 'name', 'sqlite'):
+            fallback = service._compute(user.id, granularity, None, None)
+        assert postgres == fallback
+    histogram = service.histogram(user.id, 'month')
+    assert histogram['buckets'] == [
+        {'start': '2024-02-01T00:00:00+00:00', 'count': 1},
+        {'start': '2024-01-01T00:00:00+00:00', 'count': 2},
+        {'start': '2023-12-01T00:00:00+00:00', 'count': 1},
+    ]
+    assert (histogram['total'], histogram['undated']) == (5, 1)
+    ranged = service.histogram(user.id, 'day', datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 2, 1, tzinfo=timezone.utc))
+    assert [bucket['count'] for bucket in ranged['buckets']] == [1, 1] and ranged['undated'] == 0
+
+    # Cached until the user's data changes
+    create_items(user.id, [datetime(2024, 2, 4, tzinfo=timezone.utc)])
+    assert service.histogram(user.id, 'month') is histogram
+    User.bump_data_version(user.id)
+    assert service.histogram(user.id, 'month')['buckets'][0] == {'start': '2024-02-01T00:00:00+00:00', 'count': 2}